@@ -13,7 +13,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any, Optional
 from pydantic import BaseModel
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.services.ai_service import get_ai_service
 from app.services.strategic_audit_service import get_audit_service
 from app.services.neural_empathy_service import get_empathy_service
@@ -54,7 +54,7 @@ class VoiceSessionRequest(BaseModel):
 
 @router.post("/strategic-audit/run")
 async def run_strategic_audit(
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     🔍 Run complete strategic audit
@@ -136,7 +136,7 @@ async def analyze_conversation_sentiment(
 @router.get("/empathy/at-risk")
 async def get_at_risk_customers(
     threshold: int = 70,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     ⚠️ Get list of customers with high stress levels
@@ -162,7 +162,7 @@ async def get_at_risk_customers(
 async def get_strategic_priorities(
     user_id: Optional[str] = None,
     top_n: int = 10,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     🧭 Get today's strategic priorities
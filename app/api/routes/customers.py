@@ -4,12 +4,18 @@ RESTful endpoints for customer management
 """
 
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
+from app.api.dependencies import get_current_org_id
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.pagination import InvalidCursor, set_page_headers
+from app.models.customer import CustomerSource, CustomerStatus
 from app.services.crm_service import CRMService, get_crm_service
+from app.services.import_service import ImportFileTooLarge, crm_writer, customer_importer, import_manager
 from app.services.ai_service import get_ai_service
 
 router = APIRouter(prefix="/api/customers", tags=["customers"])
@@ -38,6 +44,24 @@ class CustomerUpdate(BaseModel):
     metadata: Optional[dict] = None
 
 
+class CustomerBulkItem(BaseModel):
+    name: str
+    email: Optional[EmailStr] = None
+    phone: Optional[str] = None
+    company: Optional[str] = None
+    position: Optional[str] = None
+    website: Optional[str] = None
+    city: Optional[str] = None
+    country: Optional[str] = None
+    status: Optional[CustomerStatus] = None
+    source: Optional[CustomerSource] = None
+    tags: Optional[List[str]] = None
+
+
+class CustomerBulkUpsert(BaseModel):
+    rows: List[CustomerBulkItem] = Field(..., min_length=1, max_length=settings.BULK_API_MAX_ROWS)
+
+
 class CustomerResponse(BaseModel):
     id: int
     name: str
@@ -102,34 +126,143 @@ async def create_customer(
         raise HTTPException(status_code=500, detail=f"Error creating customer: {str(e)}")
 
 
+@router.post("/bulk")
+async def bulk_upsert_customers(
+    payload: CustomerBulkUpsert,
+    organization_id: int = Depends(get_current_org_id),
+    db: AsyncSession = Depends(get_db),
+    crm: CRMService = Depends(get_crm_service)
+):
+    """
+    Insert or update many of your organization's customers at once, matched by email
+    
+    - **rows**: Customers; only fields present in a row are written on update
+    
+    Rows that fail are reported in **errors** (by index) without affecting
+    the rest; **ids** follows the input order.
+    """
+    def to_row(item: CustomerBulkItem) -> dict:
+        row = item.model_dump(exclude_unset=True)
+        if row.get("email"):
+            row["email"] = row["email"].lower()
+        if row.get("tags") is not None:
+            row["tags"] = ",".join(row["tags"])
+        return row
+    
+    try:
+        result = await crm.bulk_upsert_customers(db, [to_row(item) for item in payload.rows], organization_id)
+        return result.to_dict(include_ids=True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error upserting customers: {str(e)}")
+
+
+@router.post("/import", status_code=202)
+async def import_customers(
+    request: Request,
+    filename: Optional[str] = Query(None, description="Original file name for raw-body uploads"),
+    organization_id: int = Depends(get_current_org_id),
+    crm: CRMService = Depends(get_crm_service)
+):
+    """
+    Import customers from a CSV or XLSX file in the background
+    
+    - Send multipart/form-data with a **file** field, or the raw file as the
+      body (Content-Type text/csv or the XLSX type) plus **filename**
+    - Columns are matched by header (name, email, phone, company, ...)
+    - Rows are normalized (E.164 phones, lower-case emails), validated,
+      deduplicated within the file and upserted by email within your organization
+    
+    Returns the job; poll **GET /import/{job_id}** and download rejected
+    rows from **GET /import/{job_id}/errors**.
+    """
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            try:
+                upload = form.get("file")
+                if upload is None or not hasattr(upload, "read"):
+                    raise HTTPException(status_code=400, detail="Missing 'file' field")
+                
+                async def chunks():
+                    while chunk := await upload.read(1024 * 1024):
+                        yield chunk
+                
+                job = await import_manager.receive(
+                    chunks(), filename or upload.filename, organization_id=organization_id
+                )
+            finally:
+                await form.close()
+        else:
+            job = await import_manager.receive(
+                request.stream(), filename or "upload.csv", organization_id=organization_id
+            )
+    except ImportFileTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    import_manager.start(job, crm_writer(crm, organization_id), customer_importer())
+    return job.to_dict()
+
+
+@router.get("/import/{job_id}")
+async def get_import_job(job_id: str, organization_id: int = Depends(get_current_org_id)):
+    """Progress and counts of one of your organization's import jobs"""
+    job = await import_manager.get(job_id, organization_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+
+@router.get("/import/{job_id}/errors")
+async def download_import_errors(job_id: str, organization_id: int = Depends(get_current_org_id)):
+    """Rejected rows as CSV: file row number, reason and the original cells"""
+    if await import_manager.get(job_id, organization_id) is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    path = import_manager.error_file(job_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="No error file for this import on this server")
+    return FileResponse(path, media_type="text/csv", filename=f"import-{job_id}-errors.csv")
+
+
 @router.get("/", response_model=List[CustomerResponse])
 async def list_customers(
+    request: Request,
+    response: Response,
     query: Optional[str] = Query(None, description="Search query"),
     status: Optional[str] = Query(None, description="Filter by status"),
     tags: Optional[List[str]] = Query(None, description="Filter by tags"),
     limit: int = Query(50, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0, description="Deprecated - use cursor"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    sort: Optional[str] = Query(None, pattern="^(relevance|created_at|name)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
     db: AsyncSession = Depends(get_db),
     crm: CRMService = Depends(get_crm_service)
 ):
     """
     List customers with optional filters
     
-    - **query**: Search in name, email, phone, company
+    - **query**: Full-text search over name, company and email; email/phone fragments match fuzzily
     - **status**: Filter by customer status
     - **tags**: Filter by tags
     - **limit**: Maximum results (1-100)
-    - **offset**: Pagination offset
+    - **cursor**: Continue after the previous page (see X-Next-Cursor / Link headers)
+    - **sort** / **order**: relevance (default with a query), created_at or name; asc or desc
+    - **offset**: Legacy offset paging, ignored when a cursor is given
     """
     try:
-        customers = await crm.search_customers(
+        page = await crm.search_customers(
             db=db,
             query=query,
             status=status,
             tags=tags,
             limit=limit,
-            offset=offset
+            offset=offset,
+            cursor=cursor,
+            sort=sort,
+            descending=order == "desc"
         )
+        set_page_headers(request, response, page)
         
         return [
             CustomerResponse(
@@ -144,8 +277,10 @@ async def list_customers(
                 created_at=c.created_at.isoformat(),
                 updated_at=c.updated_at.isoformat()
             )
-            for c in customers
+            for c in page.items
         ]
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listing customers: {str(e)}")
 
@@ -256,7 +391,10 @@ async def get_lifetime_value(
     crm: CRMService = Depends(get_crm_service)
 ):
     """Calculate customer lifetime value"""
-    clv = await crm.get_customer_lifetime_value(db, customer_id)
+    try:
+        clv = await crm.get_customer_lifetime_value(db, customer_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating lifetime value: {str(e)}")
     return {
         "customer_id": customer_id,
         "lifetime_value": clv,
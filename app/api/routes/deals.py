@@ -5,11 +5,15 @@ RESTful endpoints for deal/pipeline management
 
 from typing import List, Optional
 from datetime import datetime, date
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from app.core.database import get_db
+from app.api.dependencies import get_current_org_id
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.core.pagination import InvalidCursor, set_page_headers
+from app.models.deal import DealPriority, DealStage
 from app.services.crm_service import CRMService, get_crm_service
 
 router = APIRouter(prefix="/api/deals", tags=["deals"])
@@ -42,31 +46,75 @@ class DealUpdate(BaseModel):
     status: Optional[str] = None
 
 
+class DealBulkItem(BaseModel):
+    id: Optional[int] = None  # existing deal to update; omit to insert
+    title: str
+    customer_id: int
+    amount: float = 0.0
+    currency: Optional[str] = None
+    stage: Optional[DealStage] = None
+    priority: Optional[DealPriority] = None
+    probability: Optional[int] = Field(None, ge=0, le=100)
+    expected_close_date: Optional[datetime] = None
+    description: Optional[str] = None
+
+
+class DealBulkUpsert(BaseModel):
+    rows: List[DealBulkItem] = Field(..., min_length=1, max_length=settings.BULK_API_MAX_ROWS)
+
+
 class DealResponse(BaseModel):
     id: int
     title: str
     customer_id: int
     value: float
-    currency: str
-    stage: str
+    currency: Optional[str]
+    stage: Optional[str]
     status: str
     probability: float
     expected_close_date: Optional[str]
     description: Optional[str]
-    tags: List[str]
+    tags: List[str] = []  # deals carry no tags; kept for API compatibility
     created_at: str
-    updated_at: str
+    updated_at: Optional[str]
     closed_at: Optional[str]
     
     class Config:
         from_attributes = True
 
 
+def deal_to_response(deal) -> DealResponse:
+    """Deal model -> API shape: value is the amount, status follows from the stage"""
+    if deal.is_won:
+        status = "won"
+    elif deal.is_lost:
+        status = "lost"
+    else:
+        status = "active"
+    
+    return DealResponse(
+        id=deal.id,
+        title=deal.title,
+        customer_id=deal.customer_id,
+        value=deal.amount or 0.0,
+        currency=deal.currency,
+        stage=deal.stage.value if isinstance(deal.stage, DealStage) else deal.stage,
+        status=status,
+        probability=deal.probability or 0,
+        expected_close_date=deal.expected_close_date.isoformat() if deal.expected_close_date else None,
+        description=deal.description,
+        created_at=deal.created_at.isoformat(),
+        updated_at=deal.updated_at.isoformat() if deal.updated_at else None,
+        closed_at=deal.actual_close_date.isoformat() if deal.actual_close_date else None
+    )
+
+
 # ==================== ENDPOINTS ====================
 
 @router.post("/", response_model=DealResponse, status_code=201)
 async def create_deal(
     deal: DealCreate,
+    organization_id: int = Depends(get_current_org_id),
     db: AsyncSession = Depends(get_db),
     crm: CRMService = Depends(get_crm_service)
 ):
@@ -87,6 +135,7 @@ async def create_deal(
             title=deal.title,
             customer_id=deal.customer_id,
             value=deal.value,
+            organization_id=organization_id,
             currency=deal.currency,
             stage=deal.stage,
             probability=deal.probability,
@@ -96,26 +145,73 @@ async def create_deal(
             metadata=deal.metadata
         )
         
-        return DealResponse(
-            id=new_deal.id,
-            title=new_deal.title,
-            customer_id=new_deal.customer_id,
-            value=new_deal.value,
-            currency=new_deal.currency,
-            stage=new_deal.stage,
-            status=new_deal.status,
-            probability=new_deal.probability,
-            expected_close_date=new_deal.expected_close_date.isoformat() if new_deal.expected_close_date else None,
-            description=new_deal.description,
-            tags=new_deal.tags,
-            created_at=new_deal.created_at.isoformat(),
-            updated_at=new_deal.updated_at.isoformat(),
-            closed_at=new_deal.closed_at.isoformat() if new_deal.closed_at else None
-        )
+        return deal_to_response(new_deal)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating deal: {str(e)}")
 
 
+@router.post("/bulk")
+async def bulk_upsert_deals(
+    payload: DealBulkUpsert,
+    organization_id: int = Depends(get_current_org_id),
+    db: AsyncSession = Depends(get_db),
+    crm: CRMService = Depends(get_crm_service)
+):
+    """
+    Insert many of your organization's deals at once; rows with an existing **id** are updated
+    
+    Rows that fail (e.g. a customer_id or id outside your organization) are
+    reported in **errors** by index without affecting the rest; **ids**
+    follows the input order.
+    """
+    try:
+        result = await crm.bulk_upsert_deals(
+            db, [item.model_dump(exclude_unset=True) for item in payload.rows], organization_id
+        )
+        return result.to_dict(include_ids=True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error upserting deals: {str(e)}")
+
+
+@router.get("/", response_model=List[DealResponse])
+async def list_deals(
+    request: Request,
+    response: Response,
+    stage: Optional[str] = Query(None, description="Filter by stage"),
+    customer_id: Optional[int] = Query(None, description="Filter by customer"),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    sort: str = Query("created_at", pattern="^(created_at|amount)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    db: AsyncSession = Depends(get_read_db),
+    crm: CRMService = Depends(get_crm_service)
+):
+    """
+    List deals (cursor-paginated)
+    
+    - **stage** / **customer_id**: Filters
+    - **limit**: Maximum results (1-100)
+    - **cursor**: Continue after the previous page (see X-Next-Cursor / Link headers)
+    - **sort** / **order**: created_at or amount, asc or desc
+    """
+    try:
+        page = await crm.list_deals(
+            db=db,
+            stage=stage,
+            customer_id=customer_id,
+            limit=limit,
+            cursor=cursor,
+            sort=sort,
+            descending=order == "desc"
+        )
+        set_page_headers(request, response, page)
+        return [deal_to_response(deal) for deal in page.items]
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error listing deals: {str(e)}")
+
+
 @router.patch("/{deal_id}/stage")
 async def update_deal_stage(
     deal_id: int,
@@ -139,27 +235,24 @@ async def update_deal_stage(
     if not deal:
         raise HTTPException(status_code=404, detail="Deal not found")
     
-    return DealResponse(
-        id=deal.id,
-        title=deal.title,
-        customer_id=deal.customer_id,
-        value=deal.value,
-        currency=deal.currency,
-        stage=deal.stage,
-        status=deal.status,
-        probability=deal.probability,
-        expected_close_date=deal.expected_close_date.isoformat() if deal.expected_close_date else None,
-        description=deal.description,
-        tags=deal.tags,
-        created_at=deal.created_at.isoformat(),
-        updated_at=deal.updated_at.isoformat(),
-        closed_at=deal.closed_at.isoformat() if deal.closed_at else None
-    )
+    return deal_to_response(deal)
+
+
+@router.delete("/{deal_id}", status_code=204)
+async def delete_deal(
+    deal_id: int,
+    db: AsyncSession = Depends(get_db),
+    crm: CRMService = Depends(get_crm_service)
+):
+    """Delete deal"""
+    success = await crm.delete_deal(db, deal_id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Deal not found")
 
 
 @router.get("/pipeline/stats")
 async def get_pipeline_stats(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     crm: CRMService = Depends(get_crm_service)
 ):
     """
@@ -171,8 +264,10 @@ async def get_pipeline_stats(
     - Win rate
     - Average probability
     """
-    stats = await crm.get_pipeline_stats(db)
-    return stats
+    try:
+        return await crm.get_pipeline_stats(db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching pipeline stats: {str(e)}")
 
 
 @router.get("/{deal_id}/insights")
@@ -0,0 +1,55 @@
+"""
+Metrics API Routes
+Operational metrics for tuning caches and capacity
+Mounted once, by app.main: admin-only unless METRICS_PUBLIC is set
+"""
+
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+
+from app.core import pool_metrics
+from app.core.cache import cache_manager
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+# ==================== ENDPOINTS ====================
+
+@router.get("/cache")
+async def get_cache_metrics():
+    """
+    Cache effectiveness per key prefix
+    
+    Returns:
+    - Hits, misses, sets and errors per prefix
+    - Serialized bytes written per prefix
+    - Get/set latency percentiles
+    - Tier and Redis server stats
+    """
+    return {
+        "prefixes": cache_manager.metrics.snapshot(),
+        "server": await cache_manager.get_stats()
+    }
+
+
+@router.get("/db")
+async def get_db_pool_metrics(top: int = Query(10, ge=1, le=100)):
+    """
+    Connection pool telemetry per engine (primary, replica-N)
+    
+    Returns:
+    - Live pool status (size, checked out, overflow)
+    - Checkout wait and connection hold time percentiles
+    - Timeouts, overflow checkouts and high-water marks
+    - Call sites holding connections longest in total
+    """
+    return pool_metrics.snapshot(top)
+
+
+@router.get("/prometheus", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(
+        cache_manager.metrics.to_prometheus() + pool_metrics.to_prometheus(),
+        media_type="text/plain; version=0.0.4"
+    )
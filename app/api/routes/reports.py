@@ -1,12 +1,18 @@
 """
 Reports API Routes
-PDF & Excel report generation
+PDF & Excel report generation, streaming CSV / NDJSON exports
 """
 
-from fastapi import APIRouter, Depends, Response
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
 
+from app.api.dependencies import get_current_org_id, get_current_user
+from app.core.db_replicas import request_consistency_key
+from app.models.user import User
+from app.services.export_service import EXPORT_MEDIA_TYPES, ExportBusy, export_datasets, exporter
 from app.services.report_service import ReportService, get_report_service
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
@@ -93,3 +99,57 @@ async def download_dashboard_report(
             "Content-Disposition": f"attachment; filename=dashboard_report_{period}.pdf"
         }
     )
+
+
+@router.get("/export/{dataset}")
+async def export_dataset(
+    dataset: str,
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    since: Optional[datetime] = Query(None, description="created_at >= since"),
+    until: Optional[datetime] = Query(None, description="created_at < until"),
+    after_id: Optional[int] = Query(None, description="Resume after this id"),
+    include_deleted: bool = Query(False, description="Include soft-deleted rows (admins only)"),
+    organization_id: int = Depends(get_current_org_id),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Stream your organization's rows of a table as CSV or NDJSON (customers, deals, messages)
+    
+    Rows are read through a server-side cursor and sent batch by batch, so
+    memory stays flat and the download starts at once. Rows come in id
+    order: if a download breaks, re-request with **after_id** set to the
+    last id received. Soft-deleted rows are skipped unless an admin sets
+    **include_deleted**. Other query parameters filter on the
+    dataset's columns, e.g. `?status=qualified` or `?customer_id=42&channel=whatsapp`.
+    """
+    spec = export_datasets().get(dataset)
+    if spec is None:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset '{dataset}'")
+    if include_deleted and not getattr(current_user, "is_superuser", False):
+        raise HTTPException(status_code=403, detail="Not enough privileges")
+    
+    reserved = {"format", "since", "until", "after_id", "include_deleted"}
+    filters = {k: v for k, v in request.query_params.items() if k not in reserved}
+    try:
+        stmt = spec.query(
+            organization_id, since=since, until=until, after_id=after_id, filters=filters, include_deleted=include_deleted
+        )
+        exporter.check_capacity()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExportBusy:
+        raise HTTPException(
+            status_code=429, detail="Too many exports running; retry shortly", headers={"Retry-After": "30"}
+        )
+    
+    filename = f"{dataset}-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        exporter.stream(spec, format, stmt, consistency_key=request_consistency_key(request), reserved=True),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",  # stop nginx buffering the stream
+        },
+    )
@@ -2,7 +2,7 @@
 Core Package - Configuration, Database, Security, Cache
 """
 from .config import settings
-from .database import engine, get_db
+from .database import engine, get_db, get_read_db
 from .security import get_current_user
 
-__all__ = ["settings", "engine", "get_db", "get_current_user"]
+__all__ = ["settings", "engine", "get_db", "get_read_db", "get_current_user"]
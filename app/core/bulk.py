@@ -0,0 +1,479 @@
+"""
+📦 OmniCRM Ultimate - Bulk Write Engine
+=======================================
+✅ Chunked INSERT ... ON CONFLICT DO UPDATE ... RETURNING id
+✅ PostgreSQL fast path: COPY into a staging table, then one upsert per chunk
+✅ SQLite / others: batched executemany ("insertmanyvalues") with RETURNING
+✅ Per-row errors: a failing chunk is bisected down to the offending rows
+✅ Streams sync or async row iterables; progress callbacks after each chunk
+✅ Reads the next chunk while the previous one is being written
+
+Rows are plain dicts keyed by column name. Each chunk runs in a SAVEPOINT,
+so a bad row never discards its neighbours, and is committed on its own
+(commit_every_chunk) so a 500k-row import keeps memory and lock time flat.
+"""
+
+import time
+import asyncio
+import inspect
+from dataclasses import dataclass, field
+from typing import (
+    Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple,
+    Union
+)
+import logging
+
+from sqlalchemy import Column, MetaData, Table, literal_column, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Row = Dict[str, Any]
+Rows = Union[Iterable[Row], AsyncIterable[Row]]
+
+# (input index, row with defaults applied, columns the caller supplied, conflict key)
+Entry = Tuple[int, Row, Tuple[str, ...], Optional[Tuple]]
+
+
+@dataclass
+class RowError:
+    """A row that could not be written; index is its position in the input"""
+
+    index: int
+    error: str
+    row: Optional[Row] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"index": self.index, "error": self.error, "row": self.row}
+
+
+@dataclass
+class BulkResult:
+    """Outcome of a bulk upsert (inserted/updated are None where the dialect can't tell)"""
+
+    total: int = 0
+    written: int = 0
+    inserted: Optional[int] = None
+    updated: Optional[int] = None
+    chunks: int = 0
+    ids: List[Optional[int]] = field(default_factory=list)
+    errors: List[RowError] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def failed(self) -> int:
+        return len(self.errors)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self, include_ids: bool = False, max_errors: int = 100) -> Dict[str, Any]:
+        data = {
+            "total": self.total,
+            "written": self.written,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second),
+            "errors": [e.to_dict() for e in self.errors[:max_errors]],
+        }
+        if include_ids:
+            data["ids"] = self.ids
+        return data
+
+
+# Rows read between yields to the event loop while filling a chunk
+YIELD_EVERY = 256
+
+
+async def iterate_chunks(rows: Rows, size: int) -> AsyncIterator[List[Row]]:
+    """
+    Group a sync or async row stream into lists of at most size rows
+
+    Yields to the event loop every YIELD_EVERY rows, so a CPU-bound source
+    (parsing, normalizing) neither stalls other requests nor the chunk
+    being written meanwhile.
+    """
+    chunk: List[Row] = []
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+            elif len(chunk) % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+    else:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+            elif len(chunk) % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+    if chunk:
+        yield chunk
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, DBAPIError) and error.orig is not None:
+        return str(error.orig).strip().splitlines()[0][:300]
+    return str(error).strip().splitlines()[0][:300]
+
+
+class BulkUpserter:
+    """
+    Insert-or-update rows of one table keyed by a unique constraint
+
+    conflict_columns must match a unique index (conflict_where for a
+    partial one). update_columns defaults to every supplied column except
+    the key and the primary key. Without conflict_columns rows are plain
+    inserts. update_where limits which existing rows a conflict may
+    update; a row whose conflict it leaves untouched is reported as an
+    error.
+
+    reject(db, rows) is awaited with each chunk's prepared rows and returns
+    {position in rows: reason} for rows to report as errors unwritten.
+    before_write(db, rows) and after_write(db, ids) are awaited around each
+    chunk's write, in its transaction: rows are the prepared rows about to
+    be written, ids those of the rows that were. Use them to keep derived
+    data (aggregates, counters) in step chunk by chunk.
+    """
+
+    def __init__(
+        self,
+        table: Any,
+        conflict_columns: Sequence[str] = (),
+        update_columns: Optional[Sequence[str]] = None,
+        conflict_where: Any = None,
+        update_where: Any = None,
+        chunk_size: Optional[int] = None,
+        use_copy: bool = True,
+        copy_min_rows: Optional[int] = None,
+        commit_every_chunk: bool = True,
+        collect_ids: bool = True,
+        progress: Optional[Callable[[BulkResult], Any]] = None,
+        reject: Optional[Callable[[AsyncSession, List[Row]], Awaitable[Dict[int, str]]]] = None,
+        before_write: Optional[Callable[[AsyncSession, List[Row]], Awaitable[Any]]] = None,
+        after_write: Optional[Callable[[AsyncSession, List[int]], Awaitable[Any]]] = None,
+    ):
+        self.table: Table = getattr(table, "__table__", table)
+        self.conflict_columns = list(conflict_columns)
+        self.update_columns = list(update_columns) if update_columns is not None else None
+        self.conflict_where = conflict_where
+        self.update_where = update_where
+        self.chunk_size = chunk_size or settings.BULK_CHUNK_SIZE
+        self.use_copy = use_copy
+        self.copy_min_rows = copy_min_rows if copy_min_rows is not None else settings.BULK_COPY_MIN_ROWS
+        self.commit_every_chunk = commit_every_chunk
+        self.collect_ids = collect_ids
+        self.progress = progress
+        self.reject = reject
+        self.before_write = before_write
+        self.after_write = after_write
+
+        self.pk = list(self.table.primary_key.columns)[0]
+        self.columns = {c.name: c for c in self.table.columns}
+        self._defaults = [
+            (name, col.default) for name, col in self.columns.items()
+            if col.default is not None and not col.primary_key
+            and (col.default.is_scalar or col.default.is_callable)
+        ]
+
+    # ==================== ROW PREPARATION ====================
+
+    def _prepare(self, row: Row) -> Row:
+        """
+        Validate keys and apply Python-side column defaults
+
+        Defaults are filled here (not by Core) so COPY gets them too; only
+        supplied columns are overwritten on conflict.
+        """
+        if not self.columns.keys() >= row.keys():
+            unknown = set(row) - set(self.columns)
+            raise ValueError(f"Unknown column(s): {', '.join(sorted(unknown))}")
+
+        prepared = dict(row)
+        for name, default in self._defaults:
+            if name not in prepared:
+                prepared[name] = default.arg if default.is_scalar else default.arg(None)
+        return prepared
+
+    def _key(self, row: Row) -> Optional[Tuple]:
+        if not self.conflict_columns:
+            return None
+        key = tuple(row.get(c) for c in self.conflict_columns)
+        return None if None in key else key
+
+    def _dedupe(self, entries: List[Entry]) -> Tuple[List[Entry], Dict[int, int]]:
+        """
+        Last row wins per conflict key - one statement may not update the
+        same row twice. Returns kept entries and {dropped index: kept index}.
+        """
+        if not self.conflict_columns:
+            return entries, {}
+
+        last: Dict[Tuple, int] = {}
+        for position, entry in enumerate(entries):
+            if entry[3] is not None:
+                last[entry[3]] = position
+        if len(last) == len(entries):
+            return entries, {}
+
+        kept, aliases = [], {}
+        for position, entry in enumerate(entries):
+            key = entry[3]
+            if key is not None and last[key] != position:
+                aliases[entry[0]] = entries[last[key]][0]
+            else:
+                kept.append(entry)
+        return kept, aliases
+
+    # ==================== STATEMENTS ====================
+
+    def _insert(self, dialect: str):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy import insert
+        return insert(self.table)
+
+    def _upsert(self, dialect: str, stmt, supplied: Sequence[str]):
+        if not self.conflict_columns or dialect not in ("postgresql", "sqlite"):
+            return stmt
+
+        update = self.update_columns
+        if update is None:
+            update = [c for c in supplied if c not in self.conflict_columns and c != self.pk.name]
+
+        # Always DO UPDATE (a no-op if need be): DO NOTHING returns no row
+        # for conflicts, which would break the row -> id mapping
+        set_ = {name: stmt.excluded[name] for name in update or self.conflict_columns[:1]}
+        for name, col in self.columns.items():
+            if update and name not in set_ and col.onupdate is not None:
+                if col.onupdate.is_scalar:
+                    set_[name] = col.onupdate.arg
+                elif col.onupdate.is_callable:
+                    set_[name] = col.onupdate.arg(None)
+
+        return stmt.on_conflict_do_update(
+            index_elements=self.conflict_columns,
+            index_where=self.conflict_where,
+            set_=set_,
+            where=self.update_where,
+        )
+
+    def _returning(self, dialect: str, stmt, sort_by_parameter_order: bool = True):
+        cols = [self.pk]
+        if dialect == "postgresql":
+            # xmax is 0 only for rows this statement inserted
+            cols.append(literal_column("(xmax = 0)").label("was_inserted"))
+        if sort_by_parameter_order:
+            return stmt.returning(*cols, sort_by_parameter_order=True)
+        return stmt.returning(*cols, *[self.table.c[c] for c in self.conflict_columns])
+
+    def _match_keys(self, dialect: str, records, keys: List[Optional[Tuple]]) -> List[Optional[Tuple]]:
+        """Map unordered RETURNING (pk, [was_inserted], *key) rows back to input keys"""
+        width = 2 if dialect == "postgresql" else 1
+        by_key = {tuple(r[width:]): tuple(r[:width]) for r in records}
+        return [by_key.get(key) for key in keys]
+
+    # ==================== WRITE PATHS ====================
+
+    async def _execute_many(self, db: AsyncSession, dialect: str, entries: List[Entry]) -> List[Tuple]:
+        """Batched executemany; rows are grouped by the columns supplied"""
+        groups: Dict[Tuple, List[int]] = {}
+        for position, (_, _, supplied, key) in enumerate(entries):
+            # Only PostgreSQL batches an ordered RETURNING; elsewhere keyed
+            # rows are matched back by key and the rest go in order
+            keyed = dialect != "postgresql" and key is not None
+            groups.setdefault((supplied, keyed), []).append(position)
+
+        returned: List[Optional[Tuple]] = [(None,)] * len(entries)
+        for (supplied, keyed), positions in groups.items():
+            stmt = self._upsert(dialect, self._insert(dialect), supplied)
+            rows = [entries[p][1] for p in positions]
+
+            if dialect != "postgresql" and not self.collect_ids:
+                await db.execute(stmt, rows)
+                continue
+            if keyed:
+                result = await db.execute(self._returning(dialect, stmt, sort_by_parameter_order=False), rows)
+                records = self._match_keys(dialect, result.all(), [entries[p][3] for p in positions])
+            else:
+                result = await db.execute(self._returning(dialect, stmt), rows)
+                records = [tuple(r) for r in result.all()]
+            for position, record in zip(positions, records):
+                returned[position] = record
+        return returned
+
+    async def _copy(self, db: AsyncSession, entries: List[Entry]) -> List[Tuple]:
+        """COPY rows into a temp table, then upsert from it in one statement"""
+        conn = await db.connection()
+        raw = (await conn.get_raw_connection()).driver_connection
+
+        rows = [entry[1] for entry in entries]
+        names = sorted(rows[0])
+        stage_name = f"_bulk_stage_{self.table.name}"
+        await raw.execute(
+            f'CREATE TEMP TABLE IF NOT EXISTS "{stage_name}" ON COMMIT DROP AS '
+            f'SELECT {", ".join(names)} FROM "{self.table.name}" WITH NO DATA'
+        )
+        await raw.execute(f'TRUNCATE "{stage_name}"')
+
+        dialect = conn.dialect
+        processors = [self.columns[n].type.bind_processor(dialect) for n in names]
+        records = [
+            tuple(p(row.get(n)) if p else row.get(n) for n, p in zip(names, processors))
+            for row in rows
+        ]
+        await raw.copy_records_to_table(stage_name, records=records, columns=names)
+
+        stage = Table(stage_name, MetaData(), *[Column(n, self.columns[n].type) for n in names])
+        stmt = self._insert("postgresql").from_select(names, select(*stage.c))
+        stmt = self._upsert("postgresql", stmt, entries[0][2])
+        stmt = self._returning("postgresql", stmt, sort_by_parameter_order=False)
+        result = await db.execute(stmt)
+
+        # INSERT ... SELECT returns in no particular order: map back by key
+        return self._match_keys("postgresql", result.all(), [entry[3] for entry in entries])
+
+    def _can_copy(self, db: AsyncSession, dialect: str, entries: List[Entry]) -> bool:
+        return (
+            self.use_copy and dialect == "postgresql" and db.get_bind().dialect.driver == "asyncpg"
+            and bool(self.conflict_columns) and len(entries) >= self.copy_min_rows
+            and len({entry[2] for entry in entries}) == 1
+            and all(entry[3] is not None for entry in entries)
+        )
+
+    async def _write(self, db: AsyncSession, dialect: str, entries: List[Entry],
+                     result: BulkResult, ids: Dict[int, Optional[int]]):
+        """Write rows in a savepoint; on failure bisect to isolate bad rows"""
+        try:
+            async with db.begin_nested():
+                if self._can_copy(db, dialect, entries):
+                    returned = await self._copy(db, entries)
+                else:
+                    returned = await self._execute_many(db, dialect, entries)
+        except Exception as e:
+            # Includes raw driver errors from COPY, which SQLAlchemy does not wrap
+            if len(entries) == 1:
+                index, row = entries[0][:2]
+                result.errors.append(RowError(index=index, error=_error_message(e), row=row))
+                return
+            middle = len(entries) // 2
+            await self._write(db, dialect, entries[:middle], result, ids)
+            await self._write(db, dialect, entries[middle:], result, ids)
+            return
+
+        for entry, record in zip(entries, returned):
+            index = entry[0]
+            if record is None and self.update_where is not None:
+                # The conflicting row exists but update_where excluded it
+                result.errors.append(RowError(index=index, error="Existing row may not be updated", row=entry[1]))
+                continue
+            result.written += 1
+            ids[index] = record[0] if record else None
+            if record and len(record) > 1 and record[1] is not None:
+                result.inserted = (result.inserted or 0) + (1 if record[1] else 0)
+                result.updated = (result.updated or 0) + (0 if record[1] else 1)
+
+    async def _write_chunk(self, db: AsyncSession, dialect: str, chunk: List[Row], offset: int,
+                           result: BulkResult, started: float):
+        entries: List[Entry] = []
+        for i, row in enumerate(chunk, start=offset):
+            try:
+                prepared = self._prepare(row)
+                entries.append((i, prepared, tuple(sorted(row)), self._key(prepared)))
+            except Exception as e:
+                result.errors.append(RowError(index=i, error=str(e), row=row))
+
+        if entries and self.reject is not None:
+            rejected = await self.reject(db, [entry[1] for entry in entries])
+            for position, reason in sorted(rejected.items()):
+                index, row = entries[position][:2]
+                result.errors.append(RowError(index=index, error=reason, row=row))
+            entries = [entry for position, entry in enumerate(entries) if position not in rejected]
+
+        kept, aliases = self._dedupe(entries)
+        ids: Dict[int, Optional[int]] = {}
+        if kept:
+            if self.before_write is not None:
+                await self.before_write(db, [entry[1] for entry in kept])
+            await self._write(db, dialect, kept, result, ids)
+            if self.after_write is not None:
+                await self.after_write(db, [i for i in ids.values() if i is not None])
+        if self.commit_every_chunk:
+            await db.commit()
+
+        for dropped, winner in aliases.items():
+            if winner in ids:
+                result.written += 1
+                ids[dropped] = ids[winner]
+        if self.collect_ids:
+            result.ids.extend(ids.get(i) for i in range(offset, offset + len(chunk)))
+
+        result.total = offset + len(chunk)
+        result.chunks += 1
+        result.elapsed = time.perf_counter() - started
+
+        if self.progress is not None:
+            outcome = self.progress(result)
+            if inspect.isawaitable(outcome):
+                await outcome
+
+    async def upsert(self, db: AsyncSession, rows: Rows) -> BulkResult:
+        """
+        Stream rows into the table; returns counts, ids (input order) and row errors
+
+        The next chunk is read while the previous one is written, so the
+        row source must not use db itself.
+        """
+        started = time.perf_counter()
+        dialect = db.get_bind().dialect.name
+        result = BulkResult()
+        offset = 0
+        writing: Optional[asyncio.Future] = None
+
+        try:
+            async for chunk in iterate_chunks(rows, self.chunk_size):
+                if writing is not None:
+                    await writing
+                writing = asyncio.ensure_future(
+                    self._write_chunk(db, dialect, chunk, offset, result, started)
+                )
+                offset += len(chunk)
+            if writing is not None:
+                await writing
+        except BaseException:
+            if writing is not None and not writing.done():
+                writing.cancel()
+                await asyncio.gather(writing, return_exceptions=True)
+            raise
+
+        result.errors.sort(key=lambda e: e.index)
+        result.elapsed = time.perf_counter() - started
+        logger.info(
+            f"📦 Bulk upsert into {self.table.name}: {result.written}/{result.total} rows, "
+            f"{result.failed} failed, {result.rows_per_second:,.0f} rows/s"
+        )
+        return result
+
+
+async def bulk_upsert(
+    db: AsyncSession,
+    table: Any,
+    rows: Rows,
+    conflict_columns: Sequence[str] = (),
+    **options
+) -> BulkResult:
+    """Shortcut for BulkUpserter(table, conflict_columns, **options).upsert(db, rows)"""
+    return await BulkUpserter(table, conflict_columns, **options).upsert(db, rows)
@@ -1,60 +1,325 @@
 """
 🚀 OmniCRM Ultimate - Advanced Redis Caching Layer
 ====================================================
+✅ Two-Tier Caching (in-process LRU + Redis)
+✅ In-Process Backend when Redis is unavailable (see app.core.cache_backends)
 ✅ Query Result Caching
+✅ Batched Multi-Get / Multi-Set (MGET + pipelining)
 ✅ API Response Caching
 ✅ Session Storage
 ✅ Rate Limiting
 ✅ Real-Time Pub/Sub
-✅ Cache Invalidation Strategies
-✅ Cache Warming
-✅ Performance Monitoring
+✅ Cache Invalidation Strategies (tag index + patterns)
+✅ Stampede Protection (single-flight + distributed locks)
+✅ Stale-While-Revalidate & Probabilistic Early Refresh
+✅ Negative Caching (NOT_FOUND entries for missing entities)
+✅ Cache Warming (see app.core.cache_warming)
+✅ Performance Monitoring (per-prefix counters & latency histograms)
 """
 
 import json
+import math
+import time
+import random
+import uuid
+import asyncio
+import fnmatch
 import hashlib
-import pickle
-from typing import Any, Optional, Callable, List
+from collections import OrderedDict
+from typing import Any, Optional, Callable, Awaitable, Dict, List, Tuple, Union
 from datetime import timedelta
 from functools import wraps
 import redis.asyncio as aioredis
 from app.core.config import settings
+from app.core.cache_codec import ValueSerializer, CacheCodecError
+from app.core.cache_metrics import CacheMetrics
+from app.core.cache_backends import CacheBackend, RedisBackend, MemoryBackend
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class _Miss:
+    """Sentinel marking a key absent from the cache (distinct from None)"""
+    
+    _instance = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+    
+    def __bool__(self) -> bool:
+        return False
+    
+    def __repr__(self) -> str:
+        return "MISS"
+
+
+MISS = _Miss()
+
+
+class _NotFound:
+    """Sentinel for a cached "entity does not exist" (distinct from a cached None)"""
+    
+    _instance = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+    
+    def __bool__(self) -> bool:
+        return False
+    
+    def __repr__(self) -> str:
+        return "NOT_FOUND"
+
+
+NOT_FOUND = _NotFound()
+
+
+class _LockUnavailable:
+    """acquire_lock() result when no backend can arbitrate (none configured, or it failed)"""
+    
+    def __bool__(self) -> bool:
+        return False
+    
+    def __repr__(self) -> str:
+        return "LOCK_UNAVAILABLE"
+
+
+LOCK_UNAVAILABLE = _LockUnavailable()
+
+# Wire form of NOT_FOUND, so negative entries survive any codec
+_NOT_FOUND_KEY = "__not_found__"
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache with per-entry TTL (L1 tier)
+    
+    Values are stored as live Python objects so reads skip the network
+    and deserialization entirely. Callers must treat returned values as
+    read-only, since the same object is handed to every reader.
+    """
+    
+    def __init__(self, max_entries: int = 10000, default_ttl: int = 30):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (hit, value); expired entries count as misses"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return False, None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, value
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        """Store value, evicting least recently used entries when full"""
+        ttl = min(ttl or self.default_ttl, self.default_ttl)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+    
+    def delete_pattern(self, pattern: str) -> int:
+        """Drop all entries matching a Redis-style glob pattern"""
+        matched = [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]
+        for key in matched:
+            del self._entries[key]
+        return len(matched)
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def get_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / max(total, 1) * 100, 2),
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_entries": self.max_entries
+        }
+
+
 class CacheManager:
-    """Production-grade Redis cache manager"""
+    """Production-grade cache manager (Redis, or in-process when Redis is absent)"""
+    
+    # Pub/Sub channel used to drop L1 entries on every worker
+    INVALIDATION_CHANNEL = "cache:invalidate"
+    
+    # Sets indexing cache keys by tag
+    TAG_PREFIX = "tag:"
     
     def __init__(self):
-        self.redis: Optional[aioredis.Redis] = None
+        self.backend: Optional[CacheBackend] = None
         self.default_ttl = 3600  # 1 hour
+        self.serializer = ValueSerializer()
+        self.metrics = CacheMetrics()
+        
+        # L1: in-process LRU in front of Redis (L2)
+        self.local: Optional[LocalCache] = None
+        if settings.CACHE_L1_ENABLED:
+            self.local = LocalCache(
+                max_entries=settings.CACHE_L1_MAX_ENTRIES,
+                default_ttl=settings.CACHE_L1_TTL
+            )
+        self.l2_hits = 0
+        self.l2_misses = 0
+        
+        # Stale-while-revalidate counters (see @cached)
+        self.stale_serves = 0
+        self.early_refreshes = 0
+        
+        # Identifies this worker so it can ignore its own invalidations
+        self._instance_id = uuid.uuid4().hex
+        self._invalidation_task: Optional[asyncio.Task] = None
+    
+    @property
+    def redis(self) -> Optional[aioredis.Redis]:
+        """Raw Redis client, or None when running on the memory backend"""
+        if isinstance(self.backend, RedisBackend):
+            return self.backend.client
+        return None
         
     async def connect(self):
-        """Initialize Redis connection pool"""
+        """Connect to Redis, falling back to the in-process backend"""
+        if settings.REDIS_URL:
+            try:
+                client = aioredis.from_url(
+                    settings.REDIS_URL,
+                    encoding="utf-8",
+                    decode_responses=False,  # Handle binary data
+                    max_connections=settings.REDIS_MAX_CONNECTIONS or 50,
+                    socket_timeout=5,
+                    socket_connect_timeout=5
+                )
+                
+                # Test connection
+                await client.ping()
+                self.backend = RedisBackend(client)
+                logger.info("✅ Redis cache connected successfully")
+                
+                if self.local:
+                    self._invalidation_task = asyncio.create_task(
+                        self._listen_for_invalidations()
+                    )
+                return
+                
+            except Exception as e:
+                logger.error(f"❌ Redis connection failed: {str(e)}")
+                self.backend = None
+        
+        if settings.CACHE_MEMORY_FALLBACK:
+            self.use_backend(MemoryBackend(max_memory_bytes=settings.CACHE_MEMORY_MAX_BYTES))
+            logger.info(
+                f"🧠 Using in-process cache backend "
+                f"({settings.CACHE_MEMORY_MAX_BYTES // (1024 * 1024)}MB limit)"
+            )
+    
+    def use_backend(self, backend: CacheBackend):
+        """Attach a backend directly (memory fallback, tests)"""
+        self.backend = backend
+        
+        # An in-process backend already is the fastest tier; an L1 copy in
+        # front of it would only double memory use
+        if isinstance(backend, MemoryBackend):
+            self.local = None
+    
+    async def disconnect(self):
+        """Close the backend connection"""
+        if self._invalidation_task:
+            self._invalidation_task.cancel()
+            self._invalidation_task = None
+        
+        if self.local:
+            self.local.clear()
+        
+        if self.backend:
+            await self.backend.close()
+            logger.info(f"🔌 Cache backend disconnected ({self.backend.name})")
+            self.backend = None
+    
+    async def _publish_invalidation(self, op: str, target: Union[str, List[str]]):
+        """Tell other workers to drop matching L1 entries"""
+        if not self.local or not self.backend.supports_pubsub:
+            return
+        
         try:
-            self.redis = await aioredis.from_url(
-                settings.REDIS_URL,
-                encoding="utf-8",
-                decode_responses=False,  # Handle binary data
-                max_connections=settings.REDIS_MAX_CONNECTIONS or 50,
-                socket_timeout=5,
-                socket_connect_timeout=5
+            await self.backend.publish(
+                self.INVALIDATION_CHANNEL,
+                json.dumps({"origin": self._instance_id, "op": op, "target": target})
             )
-            
-            # Test connection
-            await self.redis.ping()
-            logger.info("✅ Redis cache connected successfully")
-            
         except Exception as e:
-            logger.error(f"❌ Redis connection failed: {str(e)}")
-            self.redis = None
+            logger.error(f"❌ Cache invalidation publish error: {str(e)}")
     
-    async def disconnect(self):
-        """Close Redis connection"""
-        if self.redis:
-            await self.redis.close()
-            logger.info("🔌 Redis disconnected")
+    async def _listen_for_invalidations(self):
+        """Apply L1 invalidations published by other workers"""
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.backend.pubsub()
+                await pubsub.subscribe(self.INVALIDATION_CHANNEL)
+                
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    
+                    data = json.loads(message["data"])
+                    if data.get("origin") == self._instance_id:
+                        continue
+                    
+                    if data.get("op") == "pattern":
+                        self.local.delete_pattern(data["target"])
+                    elif data.get("op") == "keys":
+                        for key in data["target"]:
+                            self.local.delete(key)
+                    else:
+                        self.local.delete(data["target"])
+                        
+            except asyncio.CancelledError:
+                if pubsub:
+                    await pubsub.close()
+                raise
+            except Exception as e:
+                # Entries published while disconnected are missed, so drop
+                # everything rather than serve values of unknown freshness
+                logger.error(f"❌ Cache invalidation listener error: {str(e)}")
+                self.local.clear()
+                await asyncio.sleep(1)
+    
+    def _encode(self, value: Any) -> bytes:
+        if value is NOT_FOUND:
+            value = {_NOT_FOUND_KEY: 1}
+        return self.serializer.encode(value)
+    
+    def _decode(self, raw: bytes) -> Any:
+        value = self.serializer.decode(raw)
+        if isinstance(value, dict) and value.get(_NOT_FOUND_KEY) == 1:
+            return NOT_FOUND
+        return value
     
     def _generate_key(self, prefix: str, *args, **kwargs) -> str:
         """Generate cache key from function arguments"""
@@ -79,56 +344,232 @@ class CacheManager:
     
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
-        if not self.redis:
+        if not self.backend:
             return None
         
+        started = time.perf_counter()
+        if self.local:
+            hit, value = self.local.get(key)
+            if hit:
+                logger.debug(f"✅ Cache L1 HIT: {key}")
+                self.metrics.record_get(key, True, time.perf_counter() - started, tier="l1")
+                return value
+        
         try:
-            value = await self.redis.get(key)
+            # The remaining TTL comes back in the same round trip so the L1
+            # copy never outlives the backend entry
+            value, ttl = await self.backend.get_with_ttl(key)
+            
             if value:
+                try:
+                    result = self._decode(value)
+                except CacheCodecError as e:
+                    # Written by an older deploy or another format - drop it
+                    logger.warning(f"⚠️ Cache decode failed for {key}: {str(e)}")
+                    self.l2_misses += 1
+                    self.metrics.record_error(key)
+                    self.metrics.record_get(key, False, time.perf_counter() - started)
+                    await self.backend.delete(key)
+                    return None
+                
                 logger.debug(f"✅ Cache HIT: {key}")
-                return pickle.loads(value)
+                self.l2_hits += 1
+                self.metrics.record_get(key, True, time.perf_counter() - started)
+                
+                if self.local and ttl and ttl > 0:
+                    self.local.set(key, result, ttl)
+                
+                return result
             else:
                 logger.debug(f"❌ Cache MISS: {key}")
+                self.l2_misses += 1
+                self.metrics.record_get(key, False, time.perf_counter() - started)
                 return None
                 
         except Exception as e:
             logger.error(f"❌ Cache get error: {str(e)}")
+            self.metrics.record_error(key)
             return None
     
     async def set(
         self,
         key: str,
         value: Any,
-        ttl: Optional[int] = None
+        ttl: Optional[int] = None,
+        tags: Optional[List[str]] = None
     ) -> bool:
-        """Set value in cache with optional TTL"""
-        if not self.redis:
+        """Set value in cache with optional TTL and invalidation tags"""
+        if not self.backend:
             return False
         
+        started = time.perf_counter()
         try:
             ttl = ttl or self.default_ttl
-            serialized = pickle.dumps(value)
+            serialized = self._encode(value)
+            tag_keys = [self.TAG_PREFIX + tag for tag in tags] if tags else None
             
-            await self.redis.setex(
-                key,
-                ttl,
-                serialized
-            )
+            await self.backend.set(key, serialized, ttl, tags=tag_keys)
+            
+            self.metrics.record_set(key, len(serialized), time.perf_counter() - started)
+            
+            if self.local:
+                self.local.set(key, value, ttl)
+                await self._publish_invalidation("key", key)
             
             logger.debug(f"✅ Cache SET: {key} (TTL: {ttl}s)")
             return True
             
         except Exception as e:
             logger.error(f"❌ Cache set error: {str(e)}")
+            self.metrics.record_error(key)
+            return False
+    
+    async def set_not_found(self, key: str, ttl: Optional[int] = None) -> bool:
+        """
+        Cache that an entity does not exist, so repeated lookups skip the DB
+        
+        get() returns NOT_FOUND for the key until the short TTL lapses or
+        the entity's create path deletes the key.
+        """
+        return await self.set(key, NOT_FOUND, ttl or settings.CACHE_NEGATIVE_TTL)
+    
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        """
+        Get many values in one round trip
+        
+        Returns values in input order with MISS for absent keys, so callers
+        can load only the missing ones:
+        
+            values = await cache_manager.get_many([f"score:{i}" for i in ids])
+            missing = [i for i, v in zip(ids, values) if v is MISS]
+        """
+        if not keys:
+            return []
+        
+        results: List[Any] = [MISS] * len(keys)
+        if not self.backend:
+            return results
+        
+        started = time.perf_counter()
+        pending = []
+        for index, key in enumerate(keys):
+            if self.local:
+                hit, value = self.local.get(key)
+                if hit:
+                    results[index] = value
+                    self.metrics.record_get(key, True, time.perf_counter() - started, tier="l1")
+                    continue
+            pending.append(index)
+        
+        if not pending:
+            return results
+        
+        try:
+            pending_keys = [keys[i] for i in pending]
+            replies = await self.backend.mget_with_ttl(pending_keys)
+            # One round trip served every pending key; attribute it evenly
+            elapsed = (time.perf_counter() - started) / len(pending_keys)
+            
+            for index, key, (raw, ttl) in zip(pending, pending_keys, replies):
+                if raw is None:
+                    self.l2_misses += 1
+                    self.metrics.record_get(key, False, elapsed)
+                    continue
+                try:
+                    value = self._decode(raw)
+                except CacheCodecError as e:
+                    logger.warning(f"⚠️ Cache decode failed for {key}: {str(e)}")
+                    self.l2_misses += 1
+                    self.metrics.record_error(key)
+                    self.metrics.record_get(key, False, elapsed)
+                    continue
+                
+                self.l2_hits += 1
+                self.metrics.record_get(key, True, elapsed)
+                results[index] = value
+                if self.local and ttl and ttl > 0:
+                    self.local.set(key, value, ttl)
+            
+            return results
+            
+        except Exception as e:
+            logger.error(f"❌ Cache get_many error: {str(e)}")
+            for index in pending:
+                self.metrics.record_error(keys[index])
+            return results
+    
+    async def set_many(
+        self,
+        mapping: Dict[str, Any],
+        ttl: Optional[int] = None,
+        ttls: Optional[Dict[str, int]] = None
+    ) -> bool:
+        """Set many values in one pipelined round trip; ttls overrides ttl per key"""
+        if not self.backend or not mapping:
+            return False
+        
+        started = time.perf_counter()
+        try:
+            ttls = ttls or {}
+            sizes = {}
+            items = []
+            for key, value in mapping.items():
+                serialized = self._encode(value)
+                sizes[key] = len(serialized)
+                items.append((key, serialized, ttls.get(key) or ttl or self.default_ttl))
+            
+            await self.backend.set_many(items)
+            
+            elapsed = (time.perf_counter() - started) / len(mapping)
+            for key, nbytes in sizes.items():
+                self.metrics.record_set(key, nbytes, elapsed)
+            
+            if self.local:
+                for key, value in mapping.items():
+                    self.local.set(key, value, ttls.get(key) or ttl or self.default_ttl)
+                await self._publish_invalidation("keys", list(mapping))
+            
+            logger.debug(f"✅ Cache SET many: {len(mapping)} keys")
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Cache set_many error: {str(e)}")
+            for key in mapping:
+                self.metrics.record_error(key)
             return False
     
+    async def delete_many(self, keys: List[str]) -> int:
+        """Delete many keys with a single DEL"""
+        if not self.backend or not keys:
+            return 0
+        
+        try:
+            deleted = await self.backend.delete(*keys)
+            
+            if self.local:
+                for key in keys:
+                    self.local.delete(key)
+                await self._publish_invalidation("keys", list(keys))
+            
+            logger.debug(f"🗑️ Cache DELETE many: {deleted} keys")
+            return deleted
+            
+        except Exception as e:
+            logger.error(f"❌ Cache delete_many error: {str(e)}")
+            return 0
+    
     async def delete(self, key: str) -> bool:
         """Delete key from cache"""
-        if not self.redis:
+        if not self.backend:
             return False
         
         try:
-            await self.redis.delete(key)
+            await self.backend.delete(key)
+            
+            if self.local:
+                self.local.delete(key)
+                await self._publish_invalidation("key", key)
+            
             logger.debug(f"🗑️ Cache DELETE: {key}")
             return True
             
@@ -136,22 +577,44 @@ class CacheManager:
             logger.error(f"❌ Cache delete error: {str(e)}")
             return False
     
-    async def delete_pattern(self, pattern: str) -> int:
-        """Delete all keys matching pattern"""
-        if not self.redis:
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Delete every entry registered under any of the given tags"""
+        if not self.backend or not tags:
             return 0
         
         try:
-            keys = []
-            async for key in self.redis.scan_iter(match=pattern):
-                keys.append(key)
+            keys = await self.backend.invalidate_tags([self.TAG_PREFIX + tag for tag in tags])
             
-            if keys:
-                deleted = await self.redis.delete(*keys)
-                logger.info(f"🗑️ Cache DELETE pattern '{pattern}': {deleted} keys")
-                return deleted
+            if self.local and keys:
+                for key in keys:
+                    self.local.delete(key)
+                await self._publish_invalidation("keys", keys)
+            
+            logger.debug(f"🗑️ Cache INVALIDATE tags {list(tags)}: {len(keys)} keys")
+            return len(keys)
             
+        except Exception as e:
+            logger.error(f"❌ Cache invalidate tags error: {str(e)}")
             return 0
+    
+    async def delete_pattern(self, pattern: str) -> int:
+        """
+        Delete all keys matching pattern
+        
+        Scans the whole keyspace - prefer invalidate_tags() on hot write paths.
+        """
+        if not self.backend:
+            return 0
+        
+        if self.local:
+            self.local.delete_pattern(pattern)
+            await self._publish_invalidation("pattern", pattern)
+        
+        try:
+            deleted = await self.backend.delete_pattern(pattern)
+            if deleted:
+                logger.info(f"🗑️ Cache DELETE pattern '{pattern}': {deleted} keys")
+            return deleted
             
         except Exception as e:
             logger.error(f"❌ Cache delete pattern error: {str(e)}")
@@ -159,48 +622,77 @@ class CacheManager:
     
     async def exists(self, key: str) -> bool:
         """Check if key exists"""
-        if not self.redis:
+        if not self.backend:
             return False
         
         try:
-            return await self.redis.exists(key) > 0
+            return await self.backend.exists(key)
         except Exception as e:
             logger.error(f"❌ Cache exists error: {str(e)}")
             return False
     
     async def ttl(self, key: str) -> int:
         """Get remaining TTL in seconds"""
-        if not self.redis:
+        if not self.backend:
             return -1
         
         try:
-            return await self.redis.ttl(key)
+            return await self.backend.ttl(key)
         except Exception as e:
             logger.error(f"❌ Cache TTL error: {str(e)}")
             return -1
     
-    async def increment(self, key: str, amount: int = 1) -> int:
-        """Increment counter"""
-        if not self.redis:
+    async def increment(self, key: str, amount: int = 1, ttl: Optional[int] = None) -> int:
+        """Increment counter; ttl is applied when the counter is created"""
+        if not self.backend:
             return 0
         
         try:
-            return await self.redis.incrby(key, amount)
+            return await self.backend.incr(key, amount, ttl=ttl)
         except Exception as e:
             logger.error(f"❌ Cache increment error: {str(e)}")
             return 0
     
+    async def acquire_lock(self, key: str, ttl_ms: int) -> Union[str, None, _LockUnavailable]:
+        """
+        Try to take a short-lived lock
+        
+        Returns an owner token, None if another caller holds the lock, or
+        LOCK_UNAVAILABLE if there is no backend to ask (nobody else can be
+        holding it, so there is nothing to wait for).
+        """
+        if not self.backend:
+            return LOCK_UNAVAILABLE
+        
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.backend.acquire_lock(key, token, ttl_ms)
+            return token if acquired else None
+        except Exception as e:
+            logger.error(f"❌ Cache lock error: {str(e)}")
+            return LOCK_UNAVAILABLE
+    
+    async def release_lock(self, key: str, token: str) -> bool:
+        """Release a lock only if this caller still owns it"""
+        if not self.backend:
+            return False
+        
+        try:
+            return await self.backend.release_lock(key, token)
+        except Exception as e:
+            logger.error(f"❌ Cache unlock error: {str(e)}")
+            return False
+    
     async def get_stats(self) -> dict:
         """Get cache performance statistics"""
-        if not self.redis:
+        if not self.backend:
             return {}
         
         try:
-            info = await self.redis.info("stats")
+            info = await self.backend.info()
             
-            return {
-                "total_connections": info.get("total_connections_received", 0),
-                "total_commands": info.get("total_commands_processed", 0),
+            stats = {
+                "backend": self.backend.name,
                 "keyspace_hits": info.get("keyspace_hits", 0),
                 "keyspace_misses": info.get("keyspace_misses", 0),
                 "hit_rate": round(
@@ -209,9 +701,37 @@ class CacheManager:
                     2
                 ),
                 "used_memory_mb": round(info.get("used_memory", 0) / 1024 / 1024, 2),
-                "connected_clients": info.get("connected_clients", 0)
+                "tiers": {
+                    "l1": self.local.get_stats() if self.local else {"enabled": False},
+                    "l2": {
+                        "hits": self.l2_hits,
+                        "misses": self.l2_misses,
+                        "hit_rate": round(
+                            self.l2_hits / max(self.l2_hits + self.l2_misses, 1) * 100,
+                            2
+                        )
+                    }
+                },
+                "stale_serves": self.stale_serves,
+                "early_refreshes": self.early_refreshes,
+                "prefixes": self.metrics.snapshot()
             }
             
+            if isinstance(self.backend, MemoryBackend):
+                stats["memory"] = {
+                    "keys": info["keys"],
+                    "max_memory_mb": round(info["max_memory"] / 1024 / 1024, 2),
+                    "evictions": info["evictions"]
+                }
+            else:
+                stats.update({
+                    "total_connections": info.get("total_connections", 0),
+                    "total_commands": info.get("total_commands", 0),
+                    "connected_clients": info.get("connected_clients", 0)
+                })
+            
+            return stats
+            
         except Exception as e:
             logger.error(f"❌ Cache stats error: {str(e)}")
             return {}
@@ -221,56 +741,300 @@ class CacheManager:
 cache_manager = CacheManager()
 
 
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one execution
+    
+    The first caller starts the work as a separate task; everyone else
+    awaits that task. Cancelling one caller never cancels the shared work.
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        
+        return await asyncio.shield(task)
+    
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+# Per-process registry of in-flight cache fills
+_single_flight = SingleFlight()
+
+
+async def _wait_for_value(cache_key: str, timeout: float, interval: float = 0.05) -> Any:
+    """Poll the cache while another worker holds the fill lock"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    
+    while loop.time() < deadline:
+        await asyncio.sleep(interval)
+        value = await cache_manager.get(cache_key)
+        if value is not None:
+            return value
+        interval = min(interval * 2, 0.5)
+    
+    return None
+
+
+# Marker key identifying soft/hard TTL envelopes written by @cached
+_ENVELOPE_KEY = "__swr__"
+
+# Background refreshes kept referenced until they finish
+_background_refreshes: set = set()
+
+
+def _wrap_entry(value: Any, soft_ttl: int, delta: float) -> dict:
+    """Store a value together with its soft expiry and recompute cost"""
+    return {
+        _ENVELOPE_KEY: 1,
+        "value": value,
+        "soft_expires_at": time.time() + soft_ttl,
+        "delta": delta
+    }
+
+
+def _is_envelope(entry: Any) -> bool:
+    return isinstance(entry, dict) and entry.get(_ENVELOPE_KEY) == 1
+
+
+def _unwrap(entry: Any) -> Any:
+    """Cached entry -> value returned to @cached callers"""
+    if entry is NOT_FOUND:
+        return None
+    return entry["value"] if _is_envelope(entry) else entry
+
+
+def _should_refresh_early(entry: dict, beta: float) -> bool:
+    """
+    XFetch: refresh with rising probability as expiry approaches
+    
+    Expensive entries (large delta) start refreshing earlier.
+    See Vattani et al., "Optimal Probabilistic Cache Stampede Prevention".
+    """
+    if beta <= 0:
+        return False
+    
+    gap = -entry["delta"] * beta * math.log(1.0 - random.random())
+    return time.time() + gap >= entry["soft_expires_at"]
+
+
 # Decorator for caching function results
 def cached(
     prefix: str = "cache",
     ttl: Optional[int] = None,
-    key_builder: Optional[Callable] = None
+    key_builder: Optional[Callable] = None,
+    coalesce: bool = True,
+    distributed_lock: bool = False,
+    lock_timeout: int = 10,
+    stale_ttl: int = 0,
+    early_refresh_beta: float = 0.0,
+    tags: Optional[Union[List[str], Callable[..., List[str]]]] = None,
+    negative_ttl: int = 0,
+    refresher: Optional[Callable[..., Awaitable[Any]]] = None
 ):
     """
     Decorator to cache function results
     
+    On a miss, concurrent callers in this process share one execution
+    (coalesce=True). With distributed_lock=True a short Redis lock also
+    ensures only one worker recomputes; the others wait up to
+    lock_timeout seconds for the value and then compute it themselves.
+    If the lock can't be asked for at all (no backend, or it errored) the
+    caller computes straight away instead of waiting.
+    
+    With stale_ttl > 0, ttl becomes the soft TTL: for stale_ttl more
+    seconds the old value is returned immediately while a background
+    task refreshes it. early_refresh_beta > 0 enables XFetch-style
+    probabilistic refresh before the soft TTL (1.0 is the usual choice).
+    Background refreshes run after the triggering request has finished, so
+    a function taking a request-scoped session needs a refresher: called
+    with the same arguments instead of the function, it should recompute
+    the value on a session of its own.
+    
+    tags registers each entry in the tag index so writes can drop it with
+    cache_manager.invalidate_tags(); pass a list or a callable taking the
+    same arguments as the decorated function.
+    
+    With negative_ttl > 0 a None result is cached as NOT_FOUND for that
+    many seconds, so lookups of missing entities stop reaching the DB.
+    
     Usage:
         @cached(prefix="user", ttl=300)
         async def get_user(user_id: int):
             return await db.query(User).filter(User.id == user_id).first()
+        
+        async def reload_pipeline_stats(db, org_id: int):
+            async with get_read_db_context() as own_db:
+                return await load_pipeline_stats(own_db, org_id)
+        
+        @cached(prefix="pipeline_stats", ttl=60, stale_ttl=300, early_refresh_beta=1.0,
+                distributed_lock=True, refresher=reload_pipeline_stats)
+        async def get_pipeline_stats(db, org_id: int):
+            return await load_pipeline_stats(db, org_id)
+        
+        @cached(prefix="clv", ttl=600, tags=lambda customer_id: [f"customer:{customer_id}"])
+        async def get_customer_lifetime_value(customer_id: int):
+            ...
     """
+    use_envelope = stale_ttl > 0 or early_refresh_beta > 0
+    
     def decorator(func: Callable):
+        async def compute_and_store(cache_key: str, args, kwargs, compute: Callable = func) -> Any:
+            started = time.monotonic()
+            result = await compute(*args, **kwargs)
+            entry_tags = tags(*args, **kwargs) if callable(tags) else tags
+            
+            if result is None and negative_ttl > 0:
+                await cache_manager.set(cache_key, NOT_FOUND, negative_ttl, tags=entry_tags)
+            elif use_envelope:
+                soft_ttl = ttl or cache_manager.default_ttl
+                entry = _wrap_entry(result, soft_ttl, time.monotonic() - started)
+                await cache_manager.set(cache_key, entry, soft_ttl + stale_ttl, tags=entry_tags)
+            else:
+                await cache_manager.set(cache_key, result, ttl, tags=entry_tags)
+            
+            return result
+        
+        async def fill(cache_key: str, args, kwargs):
+            lock_key = f"lock:{cache_key}"
+            token = None
+            
+            if distributed_lock:
+                token = await cache_manager.acquire_lock(lock_key, lock_timeout * 1000)
+                if token is LOCK_UNAVAILABLE:
+                    token = None  # No lock to wait on: compute right away
+                elif token is None:
+                    value = await _wait_for_value(cache_key, lock_timeout)
+                    if value is not None:
+                        return _unwrap(value)
+                else:
+                    # Another worker may have filled the key while we waited
+                    value = await cache_manager.get(cache_key)
+                    if value is not None:
+                        await cache_manager.release_lock(lock_key, token)
+                        return _unwrap(value)
+            
+            try:
+                return await compute_and_store(cache_key, args, kwargs)
+            finally:
+                if token:
+                    await cache_manager.release_lock(lock_key, token)
+        
+        async def refresh(cache_key: str, args, kwargs):
+            """Recompute in the background; never blocks the caller"""
+            lock_key = f"lock:{cache_key}"
+            token = None
+            
+            try:
+                if distributed_lock:
+                    token = await cache_manager.acquire_lock(lock_key, lock_timeout * 1000)
+                    if token is None:
+                        return  # Another worker is already refreshing
+                    if token is LOCK_UNAVAILABLE:
+                        token = None
+                
+                await compute_and_store(cache_key, args, kwargs, refresher or func)
+                
+            except Exception as e:
+                logger.error(f"❌ Background cache refresh failed for {cache_key}: {str(e)}")
+            finally:
+                if token:
+                    await cache_manager.release_lock(lock_key, token)
+        
+        def schedule_refresh(cache_key: str, args, kwargs):
+            task = asyncio.ensure_future(
+                _single_flight.do(
+                    f"refresh:{cache_key}",
+                    lambda: refresh(cache_key, args, kwargs)
+                )
+            )
+            _background_refreshes.add(task)
+            task.add_done_callback(_background_refreshes.discard)
+        
+        def build_key(args, kwargs) -> str:
+            if key_builder:
+                return key_builder(*args, **kwargs)
+            return cache_manager._generate_key(prefix, *args, **kwargs)
+        
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # Build cache key
-            if key_builder:
-                cache_key = key_builder(*args, **kwargs)
-            else:
-                cache_key = cache_manager._generate_key(prefix, *args, **kwargs)
+            cache_key = build_key(args, kwargs)
             
             # Try to get from cache
             cached_result = await cache_manager.get(cache_key)
+            
+            if cached_result is NOT_FOUND:
+                return None
+            
+            if _is_envelope(cached_result):
+                if time.time() >= cached_result["soft_expires_at"]:
+                    cache_manager.stale_serves += 1
+                    schedule_refresh(cache_key, args, kwargs)
+                elif _should_refresh_early(cached_result, early_refresh_beta):
+                    cache_manager.early_refreshes += 1
+                    schedule_refresh(cache_key, args, kwargs)
+                return cached_result["value"]
+            
             if cached_result is not None:
                 return cached_result
             
-            # Execute function
-            result = await func(*args, **kwargs)
+            if coalesce:
+                return await _single_flight.do(
+                    cache_key,
+                    lambda: fill(cache_key, args, kwargs)
+                )
             
-            # Cache result
-            await cache_manager.set(cache_key, result, ttl)
-            
-            return result
+            return await fill(cache_key, args, kwargs)
+        
+        async def refresh_now(*args, **kwargs):
+            """Recompute and store the entry whatever its cached state (used by warmers)"""
+            cache_key = build_key(args, kwargs)
+            return await _single_flight.do(
+                f"refresh:{cache_key}",
+                lambda: compute_and_store(cache_key, args, kwargs)
+            )
         
+        wrapper.refresh = refresh_now
         return wrapper
     return decorator
 
 
 # Cache invalidation decorator
-def invalidate_cache(patterns: List[str]):
+def invalidate_cache(
+    patterns: Optional[List[str]] = None,
+    tags: Optional[Union[List[str], Callable[..., List[str]]]] = None
+):
     """
     Decorator to invalidate cache after function execution
     
+    Tags are resolved through the tag index in one round trip; patterns
+    fall back to a keyspace SCAN and should be avoided on hot paths.
+    
     Usage:
-        @invalidate_cache(["user:*", "team:*"])
+        @invalidate_cache(tags=lambda user_id, data: [f"user:{user_id}", "team"])
         async def update_user(user_id: int, data: dict):
             # Update user
             pass
+        
+        @invalidate_cache(["user:*", "team:*"])
+        async def rebuild_users():
+            pass
     """
     def decorator(func: Callable):
         @wraps(func)
@@ -278,8 +1042,13 @@ def invalidate_cache(patterns: List[str]):
             # Execute function
             result = await func(*args, **kwargs)
             
+            # Invalidate tagged entries
+            entry_tags = tags(*args, **kwargs) if callable(tags) else tags
+            if entry_tags:
+                await cache_manager.invalidate_tags(*entry_tags)
+            
             # Invalidate cache patterns
-            for pattern in patterns:
+            for pattern in patterns or []:
                 await cache_manager.delete_pattern(pattern)
             
             return result
@@ -288,58 +1057,50 @@ def invalidate_cache(patterns: List[str]):
     return decorator
 
 
-# Rate limiting using Redis
+# Rate limiting on any cache backend
 class RateLimiter:
-    """Redis-based rate limiter"""
+    """
+    Token-bucket rate limiter (Redis or in-process backend)
     
-    def __init__(self, redis: aioredis.Redis):
-        self.redis = redis
+    Each check is one atomic round trip (a Lua script on Redis), so limits
+    hold exactly under concurrency. A bucket holds max_requests tokens and
+    refills at max_requests per window_seconds.
+    """
+    
+    def __init__(self, backend: Union[CacheBackend, aioredis.Redis]):
+        # Accept a raw Redis client for existing callers
+        if not isinstance(backend, CacheBackend):
+            backend = RedisBackend(backend)
+        self.backend = backend
     
     async def is_allowed(
         self,
         key: str,
         max_requests: int,
-        window_seconds: int
+        window_seconds: int,
+        cost: int = 1
     ) -> tuple[bool, dict]:
         """
         Check if request is within rate limit
         
         Returns:
-            (allowed: bool, info: dict)
+            (allowed: bool, info: dict) - info["reset"] is the seconds until
+            the bucket is full again, or until the next request is allowed
+            when denied
         """
         try:
-            current = await self.redis.get(key)
-            
-            if current is None:
-                # First request in window
-                await self.redis.setex(key, window_seconds, 1)
-                return True, {
-                    "limit": max_requests,
-                    "remaining": max_requests - 1,
-                    "reset": window_seconds
-                }
-            
-            current_count = int(current)
+            allowed, remaining, reset = await self.backend.take_token(
+                key,
+                max_requests,
+                window_seconds,
+                cost
+            )
             
-            if current_count < max_requests:
-                # Within limit
-                await self.redis.incr(key)
-                ttl = await self.redis.ttl(key)
-                
-                return True, {
-                    "limit": max_requests,
-                    "remaining": max_requests - current_count - 1,
-                    "reset": ttl
-                }
-            else:
-                # Rate limit exceeded
-                ttl = await self.redis.ttl(key)
-                
-                return False, {
-                    "limit": max_requests,
-                    "remaining": 0,
-                    "reset": ttl
-                }
+            return allowed, {
+                "limit": max_requests,
+                "remaining": remaining,
+                "reset": reset
+            }
                 
         except Exception as e:
             logger.error(f"❌ Rate limiter error: {str(e)}")
@@ -347,6 +1108,141 @@ class RateLimiter:
             return True, {}
 
 
+class _LocalBucket:
+    """Per-worker slice of a shared rate limit bucket"""
+    
+    __slots__ = ("limit", "window", "tokens", "pending", "remaining", "reset", "last_used")
+    
+    def __init__(self, limit: int, window: int):
+        self.limit = limit
+        self.window = window
+        self.tokens = 0.0  # Local allowance; starts empty so the first check is exact
+        self.pending = 0  # Admitted locally, not yet debited from the shared bucket
+        self.remaining = limit  # Shared remaining as of the last exact check / sync
+        self.reset = 0
+        self.last_used = time.monotonic()
+
+
+class HybridRateLimiter:
+    """
+    Local token buckets in front of RateLimiter
+    
+    Requests are admitted from a per-worker allowance with no I/O. A
+    background task debits what was admitted from the shared bucket every
+    sync_interval seconds and resizes the allowance from the shared
+    remaining count. When the allowance is used up, requests fall through
+    to the exact check, so each worker over-admits by at most
+    local_fraction * limit requests per sync interval.
+    """
+    
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        local_fraction: float = 0.1,
+        sync_interval: float = 1.0
+    ):
+        self.limiter = limiter
+        self.local_fraction = local_fraction
+        self.sync_interval = sync_interval
+        self._buckets: Dict[str, _LocalBucket] = {}
+        self._sync_task: Optional[asyncio.Task] = None
+        self.local_admits = 0
+        self.exact_checks = 0
+    
+    def _allowance(self, bucket: _LocalBucket) -> float:
+        return min(bucket.limit * self.local_fraction, bucket.remaining)
+    
+    async def is_allowed(
+        self,
+        key: str,
+        max_requests: int,
+        window_seconds: int
+    ) -> tuple[bool, dict]:
+        """Same contract as RateLimiter.is_allowed"""
+        if self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._sync_loop())
+        
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.limit != max_requests or bucket.window != window_seconds:
+            bucket = self._buckets[key] = _LocalBucket(max_requests, window_seconds)
+        bucket.last_used = time.monotonic()
+        
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            bucket.pending += 1
+            self.local_admits += 1
+            return True, {
+                "limit": max_requests,
+                "remaining": max(bucket.remaining - bucket.pending, 0),
+                "reset": bucket.reset
+            }
+        
+        self.exact_checks += 1
+        allowed, info = await self.limiter.is_allowed(key, max_requests, window_seconds)
+        if info:
+            bucket.remaining = info["remaining"]
+            bucket.reset = info["reset"]
+            bucket.tokens = self._allowance(bucket)
+        return allowed, info
+    
+    async def _sync_bucket(self, key: str, bucket: _LocalBucket):
+        pending, bucket.pending = bucket.pending, 0
+        try:
+            _, remaining, reset = await self.limiter.backend.take_token(
+                key,
+                bucket.limit,
+                bucket.window,
+                pending,
+                drain=True
+            )
+        except Exception as e:
+            logger.error(f"❌ Rate limit sync error: {str(e)}")
+            # Keep the debt for the next sync and stop admitting locally
+            bucket.pending += pending
+            bucket.tokens = 0
+            return
+        
+        bucket.remaining = remaining
+        bucket.reset = reset
+        bucket.tokens = self._allowance(bucket)
+    
+    async def sync(self):
+        """Debit locally admitted requests from the shared buckets"""
+        now = time.monotonic()
+        pending = []
+        for key, bucket in list(self._buckets.items()):
+            if bucket.pending:
+                pending.append(self._sync_bucket(key, bucket))
+            elif now - bucket.last_used > bucket.window:
+                # Idle for a whole window: the shared bucket has refilled
+                del self._buckets[key]
+        
+        await asyncio.gather(*pending)
+    
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"❌ Rate limit sync loop error: {str(e)}")
+    
+    async def stop(self):
+        """Stop background syncing and flush outstanding debits"""
+        if self._sync_task:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
+        await self.sync()
+    
+    def get_stats(self) -> dict:
+        return {
+            "buckets": len(self._buckets),
+            "local_admits": self.local_admits,
+            "exact_checks": self.exact_checks
+        }
+
+
 # Pub/Sub for real-time notifications
 class PubSubManager:
     """Redis Pub/Sub for real-time messaging"""
@@ -395,15 +1291,26 @@ class PubSubManager:
 
 
 # Cache warming utilities
-async def warm_cache_on_startup():
-    """Pre-load frequently accessed data into cache"""
+async def warm_cache_on_startup(wait: bool = False) -> dict:
+    """
+    Run all registered cache warmers
+    
+    Registration lives in app.services.cache_warmers; by default warming
+    runs in the background and readiness tracks the critical warmers.
+    """
+    from app.core.cache_warming import cache_warmer
+    
     logger.info("🔥 Warming cache...")
     
     try:
-        # Example: Cache popular products, active campaigns, etc.
-        # await cache_manager.set("popular_products", popular_products, ttl=3600)
+        if wait:
+            report = await cache_warmer.run()
+            logger.info("✅ Cache warming completed")
+            return report
         
-        logger.info("✅ Cache warming completed")
+        cache_warmer.start()
+        return cache_warmer.get_report()
         
     except Exception as e:
         logger.error(f"❌ Cache warming failed: {str(e)}")
+        return {}
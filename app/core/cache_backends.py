@@ -0,0 +1,496 @@
+"""
+🧱 OmniCRM Ultimate - Cache Backends
+=====================================
+✅ CacheBackend interface used by CacheManager
+✅ RedisBackend (shared across workers, Lua scripts for atomic ops)
+✅ MemoryBackend (single node / dev / tests, no Redis server needed)
+
+MemoryBackend supports TTLs, memory-bounded LRU eviction, atomic
+increments, tag indexes, locks and pattern deletes. Atomicity comes from
+the event loop: no method awaits while mutating state.
+"""
+
+import math
+import time
+import fnmatch
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Delete a lock key only if it still holds the caller's token
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# SETEX a value and register it under its tag sets. A tag set's TTL is only
+# ever extended so it outlives every member it indexes.
+# KEYS[1] = cache key, KEYS[2..n] = tag keys; ARGV[1] = ttl, ARGV[2] = payload
+_SET_WITH_TAGS_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+redis.call("setex", KEYS[1], ttl, ARGV[2])
+for i = 2, #KEYS do
+    redis.call("sadd", KEYS[i], KEYS[1])
+    if redis.call("ttl", KEYS[i]) < ttl then
+        redis.call("expire", KEYS[i], ttl)
+    end
+end
+return 1
+"""
+
+# Delete every member of the given tag sets plus the sets themselves and
+# return the deleted member keys. KEYS = tag keys
+_INVALIDATE_TAGS_SCRIPT = """
+local deleted = {}
+for i = 1, #KEYS do
+    local members = redis.call("smembers", KEYS[i])
+    for _, key in ipairs(members) do
+        if redis.call("del", key) == 1 then
+            table.insert(deleted, key)
+        end
+    end
+    redis.call("del", KEYS[i])
+end
+return deleted
+"""
+
+# INCRBY and set the window TTL only when the counter is created
+# KEYS[1] = counter; ARGV[1] = amount, ARGV[2] = ttl (0 = none)
+_INCR_WITH_TTL_SCRIPT = """
+local value = redis.call("incrby", KEYS[1], ARGV[1])
+if tonumber(ARGV[2]) > 0 and redis.call("ttl", KEYS[1]) == -1 then
+    redis.call("expire", KEYS[1], ARGV[2])
+end
+return value
+"""
+
+# Token bucket: capacity = limit, refilled at limit/window tokens per second.
+# Uses the server clock so every worker agrees on time.
+# KEYS[1] = bucket; ARGV[1] = capacity, ARGV[2] = window seconds, ARGV[3] = cost,
+# ARGV[4] = drain (1 = take what is left when short, for reconciling
+# requests that were already admitted). Returns {allowed, remaining, reset}
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local drain = tonumber(ARGV[4])
+local clock = redis.call("time")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local rate = capacity / window
+
+local state = redis.call("hmget", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local reset
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+    reset = (capacity - tokens) / rate
+else
+    reset = (cost - tokens) / rate
+    if drain == 1 then
+        tokens = 0
+    end
+end
+
+redis.call("hset", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("expire", KEYS[1], math.ceil(window))
+return {allowed, math.floor(tokens), math.ceil(reset)}
+"""
+
+
+def token_bucket_take(
+    tokens: Optional[float],
+    ts: Optional[float],
+    now: float,
+    capacity: int,
+    window: int,
+    cost: int = 1,
+    drain: bool = False
+) -> Tuple[bool, float, int]:
+    """Pure-Python twin of _TOKEN_BUCKET_SCRIPT; returns (allowed, tokens, reset)"""
+    rate = capacity / window
+    if tokens is None:
+        tokens, ts = capacity, now
+    tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+
+    if tokens >= cost:
+        tokens -= cost
+        return True, tokens, math.ceil((capacity - tokens) / rate)
+    reset = math.ceil((cost - tokens) / rate)
+    return False, 0.0 if drain else tokens, reset
+
+
+def _as_str(key: Any) -> str:
+    return key.decode() if isinstance(key, bytes) else key
+
+
+class CacheBackend:
+    """Storage operations CacheManager relies on (values are bytes)"""
+
+    name = "base"
+    supports_pubsub = False  # Cross-worker L1 invalidation available
+
+    async def ping(self) -> bool:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    async def get_with_ttl(self, key: str) -> Tuple[Optional[bytes], Optional[int]]:
+        raise NotImplementedError
+
+    async def mget_with_ttl(self, keys: List[str]) -> List[Tuple[Optional[bytes], Optional[int]]]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: int, tags: Optional[List[str]] = None):
+        raise NotImplementedError
+
+    async def set_many(self, items: List[Tuple[str, bytes, int]]):
+        raise NotImplementedError
+
+    async def delete(self, *keys: str) -> int:
+        raise NotImplementedError
+
+    async def delete_pattern(self, pattern: str) -> int:
+        raise NotImplementedError
+
+    async def invalidate_tags(self, tag_keys: List[str]) -> List[str]:
+        raise NotImplementedError
+
+    async def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    async def ttl(self, key: str) -> int:
+        raise NotImplementedError
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[int] = None) -> int:
+        """Atomically add to a counter; ttl applies when the counter is created"""
+        raise NotImplementedError
+
+    async def take_token(
+        self,
+        key: str,
+        capacity: int,
+        window: int,
+        cost: int = 1,
+        drain: bool = False
+    ) -> Tuple[bool, int, int]:
+        """
+        Atomic token-bucket check; returns (allowed, remaining, reset seconds)
+
+        With drain=True a short bucket is emptied instead of left untouched.
+        """
+        raise NotImplementedError
+
+    async def acquire_lock(self, key: str, token: str, ttl_ms: int) -> bool:
+        raise NotImplementedError
+
+    async def release_lock(self, key: str, token: str) -> bool:
+        raise NotImplementedError
+
+    async def publish(self, channel: str, message: str):
+        pass
+
+    async def info(self) -> dict:
+        return {}
+
+
+class RedisBackend(CacheBackend):
+    """Redis-backed storage shared by every worker"""
+
+    name = "redis"
+    supports_pubsub = True
+
+    def __init__(self, client):
+        self.client = client
+
+    async def ping(self) -> bool:
+        return await self.client.ping()
+
+    async def close(self):
+        await self.client.close()
+
+    async def get_with_ttl(self, key: str) -> Tuple[Optional[bytes], Optional[int]]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            value, ttl = await pipe.get(key).ttl(key).execute()
+        return value, ttl
+
+    async def mget_with_ttl(self, keys: List[str]) -> List[Tuple[Optional[bytes], Optional[int]]]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.mget(keys)
+            for key in keys:
+                pipe.ttl(key)
+            replies = await pipe.execute()
+        return list(zip(replies[0], replies[1:]))
+
+    async def set(self, key: str, value: bytes, ttl: int, tags: Optional[List[str]] = None):
+        if tags:
+            await self.client.eval(_SET_WITH_TAGS_SCRIPT, 1 + len(tags), key, *tags, ttl, value)
+        else:
+            await self.client.setex(key, ttl, value)
+
+    async def set_many(self, items: List[Tuple[str, bytes, int]]):
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value, ttl in items:
+                pipe.setex(key, ttl, value)
+            await pipe.execute()
+
+    async def delete(self, *keys: str) -> int:
+        return await self.client.delete(*keys) if keys else 0
+
+    async def delete_pattern(self, pattern: str) -> int:
+        keys = [key async for key in self.client.scan_iter(match=pattern)]
+        return await self.client.delete(*keys) if keys else 0
+
+    async def invalidate_tags(self, tag_keys: List[str]) -> List[str]:
+        deleted = await self.client.eval(_INVALIDATE_TAGS_SCRIPT, len(tag_keys), *tag_keys)
+        return [_as_str(key) for key in deleted]
+
+    async def exists(self, key: str) -> bool:
+        return await self.client.exists(key) > 0
+
+    async def ttl(self, key: str) -> int:
+        return await self.client.ttl(key)
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[int] = None) -> int:
+        if not ttl:
+            return await self.client.incrby(key, amount)
+        return await self.client.eval(_INCR_WITH_TTL_SCRIPT, 1, key, amount, ttl)
+
+    async def take_token(
+        self,
+        key: str,
+        capacity: int,
+        window: int,
+        cost: int = 1,
+        drain: bool = False
+    ) -> Tuple[bool, int, int]:
+        allowed, remaining, reset = await self.client.eval(
+            _TOKEN_BUCKET_SCRIPT, 1, key, capacity, window, cost, int(drain)
+        )
+        return bool(allowed), remaining, reset
+
+    async def acquire_lock(self, key: str, token: str, ttl_ms: int) -> bool:
+        return bool(await self.client.set(key, token, nx=True, px=ttl_ms))
+
+    async def release_lock(self, key: str, token: str) -> bool:
+        return bool(await self.client.eval(_RELEASE_LOCK_SCRIPT, 1, key, token))
+
+    async def publish(self, channel: str, message: str):
+        await self.client.publish(channel, message)
+
+    def pubsub(self):
+        return self.client.pubsub()
+
+    async def info(self) -> dict:
+        info = await self.client.info()
+        return {
+            "backend": self.name,
+            "total_connections": info.get("total_connections_received", 0),
+            "total_commands": info.get("total_commands_processed", 0),
+            "keyspace_hits": info.get("keyspace_hits", 0),
+            "keyspace_misses": info.get("keyspace_misses", 0),
+            "used_memory": info.get("used_memory", 0),
+            "connected_clients": info.get("connected_clients", 0)
+        }
+
+
+class MemoryBackend(CacheBackend):
+    """
+    In-process storage with TTLs and memory-bounded LRU eviction
+
+    Used automatically when Redis is unavailable. State is per process,
+    so multi-worker deployments should still run Redis.
+    """
+
+    name = "memory"
+
+    # Rough per-entry bookkeeping overhead counted against the memory limit
+    ENTRY_OVERHEAD = 96
+
+    def __init__(self, max_memory_bytes: int = 64 * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self._data: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._key_tags: Dict[str, Set[str]] = {}
+        self.used_bytes = 0
+        self.evictions = 0
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- internal helpers ----------
+
+    def _size(self, key: str, value: bytes) -> int:
+        return len(key) + len(value) + self.ENTRY_OVERHEAD
+
+    def _remove(self, key: str) -> bool:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return False
+        self.used_bytes -= self._size(key, entry[0])
+        for tag in self._key_tags.pop(key, ()):
+            members = self._tags.get(tag)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._tags[tag]
+        return True
+
+    def _live(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        """Return the entry if present and unexpired (expired ones are dropped)"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            self._remove(key)
+            return None
+        return entry
+
+    def _remaining_ttl(self, expires_at: Optional[float]) -> int:
+        if expires_at is None:
+            return -1
+        return max(1, math.ceil(expires_at - time.monotonic()))
+
+    def _store(self, key: str, value: bytes, ttl: Optional[float]):
+        tags = self._key_tags.get(key)
+        if key in self._data:
+            old = self._data.pop(key)
+            self.used_bytes -= self._size(key, old[0])
+
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (value, expires_at)
+        self.used_bytes += self._size(key, value)
+        if tags:
+            self._key_tags[key] = tags
+
+        self._evict()
+
+    def _evict(self):
+        # Expired entries at the cold end go first, then least recently used
+        now = time.monotonic()
+        while self.used_bytes > self.max_memory_bytes and self._data:
+            key, (_, expires_at) = next(iter(self._data.items()))
+            self._remove(key)
+            if expires_at is None or expires_at > now:
+                self.evictions += 1
+
+    # ---------- CacheBackend ----------
+
+    async def ping(self) -> bool:
+        return True
+
+    async def close(self):
+        self._data.clear()
+        self._tags.clear()
+        self._key_tags.clear()
+        self.used_bytes = 0
+
+    async def get_with_ttl(self, key: str) -> Tuple[Optional[bytes], Optional[int]]:
+        entry = self._live(key)
+        if entry is None:
+            self.misses += 1
+            return None, -2
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0], self._remaining_ttl(entry[1])
+
+    async def mget_with_ttl(self, keys: List[str]) -> List[Tuple[Optional[bytes], Optional[int]]]:
+        return [await self.get_with_ttl(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: int, tags: Optional[List[str]] = None):
+        self._store(key, value, ttl)
+        for tag in tags or []:
+            self._tags.setdefault(tag, set()).add(key)
+            self._key_tags.setdefault(key, set()).add(tag)
+
+    async def set_many(self, items: List[Tuple[str, bytes, int]]):
+        for key, value, ttl in items:
+            self._store(key, value, ttl)
+
+    async def delete(self, *keys: str) -> int:
+        return sum(1 for key in keys if self._remove(key))
+
+    async def delete_pattern(self, pattern: str) -> int:
+        matched = [key for key in self._data if fnmatch.fnmatchcase(key, pattern)]
+        return sum(1 for key in matched if self._remove(key))
+
+    async def invalidate_tags(self, tag_keys: List[str]) -> List[str]:
+        deleted = []
+        for tag in tag_keys:
+            for key in list(self._tags.pop(tag, ())):
+                if self._live(key) is not None and self._remove(key):
+                    deleted.append(key)
+        return deleted
+
+    async def exists(self, key: str) -> bool:
+        return self._live(key) is not None
+
+    async def ttl(self, key: str) -> int:
+        entry = self._live(key)
+        if entry is None:
+            return -2
+        return self._remaining_ttl(entry[1])
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[int] = None) -> int:
+        entry = self._live(key)
+        if entry is None:
+            value, remaining = amount, ttl
+        else:
+            value = int(entry[0]) + amount
+            remaining = entry[1] - time.monotonic() if entry[1] is not None else None
+        self._store(key, str(value).encode(), remaining)
+        return value
+
+    async def take_token(
+        self,
+        key: str,
+        capacity: int,
+        window: int,
+        cost: int = 1,
+        drain: bool = False
+    ) -> Tuple[bool, int, int]:
+        entry = self._live(key)
+        tokens = ts = None
+        if entry is not None:
+            tokens, ts = (float(part) for part in entry[0].split(b":"))
+
+        now = time.monotonic()
+        allowed, tokens, reset = token_bucket_take(tokens, ts, now, capacity, window, cost, drain)
+        self._store(key, f"{tokens}:{now}".encode(), window)
+        return allowed, math.floor(tokens), reset
+
+    async def acquire_lock(self, key: str, token: str, ttl_ms: int) -> bool:
+        if self._live(key) is not None:
+            return False
+        self._store(key, token.encode(), ttl_ms / 1000)
+        return True
+
+    async def release_lock(self, key: str, token: str) -> bool:
+        entry = self._live(key)
+        if entry is None or entry[0] != token.encode():
+            return False
+        return self._remove(key)
+
+    async def info(self) -> dict:
+        return {
+            "backend": self.name,
+            "keys": len(self._data),
+            "tags": len(self._tags),
+            "keyspace_hits": self.hits,
+            "keyspace_misses": self.misses,
+            "used_memory": self.used_bytes,
+            "max_memory": self.max_memory_bytes,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,231 @@
+"""
+🗜️ OmniCRM Ultimate - Cache Value Codecs
+=========================================
+✅ Compact binary encoding (msgpack / orjson) with pickle fallback
+✅ Schema-versioned header (stale formats become cache misses)
+✅ Transparent zlib compression for large values
+
+Wire format:
+    b"OC" | schema_version (1 byte) | codec_id (1 byte) | flags (1 byte) | payload
+"""
+
+import json
+import pickle
+import zlib
+from typing import Any, Dict, Optional
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+MAGIC = b"OC"
+HEADER_SIZE = len(MAGIC) + 3
+FLAG_COMPRESSED = 0x01
+
+
+class CacheCodecError(Exception):
+    """Raised when a cached payload cannot be decoded"""
+    pass
+
+
+def _reject(value: Any):
+    """default= hook: refuse anything the fast codecs cannot round-trip"""
+    raise TypeError(f"Unsupported type for fast codec: {type(value).__name__}")
+
+
+def _check_json_shape(value: Any):
+    """
+    Reject what JSON would change without complaint: tuples (read back as
+    lists) and non-str dict keys (read back as strings)
+    """
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            for key, child in item.items():
+                if type(key) is not str:
+                    _reject(key)
+                stack.append(child)
+        elif isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, tuple):
+            _reject(item)
+
+
+class CacheCodec:
+    """Base codec - turns a Python value into bytes and back"""
+
+    codec_id: int = 0
+    name: str = "base"
+
+    def dumps(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class PickleCodec(CacheCodec):
+    """Fallback for ORM objects and other non JSON-shaped values"""
+
+    codec_id = 1
+    name = "pickle"
+
+    def dumps(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+
+class JSONCodec(CacheCodec):
+    """Standard library JSON (always available)"""
+
+    codec_id = 2
+    name = "json"
+
+    def dumps(self, value: Any) -> bytes:
+        _check_json_shape(value)
+        return json.dumps(value, separators=(",", ":"), default=_reject).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(CacheCodec):
+    """orjson - fast JSON; datetimes/dataclasses are routed to pickle"""
+
+    codec_id = 3
+    name = "orjson"
+
+    def __init__(self):
+        self._options = (
+            orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+            | orjson.OPT_PASSTHROUGH_SUBCLASS
+        )
+
+    def dumps(self, value: Any) -> bytes:
+        _check_json_shape(value)  # orjson writes tuples as arrays
+        return orjson.dumps(value, default=_reject, option=self._options)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackCodec(CacheCodec):
+    """msgpack - compact binary encoding"""
+
+    codec_id = 4
+    name = "msgpack"
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=_reject, use_bin_type=True, strict_types=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def available_codecs() -> Dict[str, CacheCodec]:
+    """All codecs usable in this environment, keyed by name"""
+    codecs: Dict[str, CacheCodec] = {"pickle": PickleCodec(), "json": JSONCodec()}
+    if orjson is not None:
+        codecs["orjson"] = OrjsonCodec()
+    if msgpack is not None:
+        codecs["msgpack"] = MsgpackCodec()
+    return codecs
+
+
+class ValueSerializer:
+    """
+    Encodes cache values with a versioned header
+
+    JSON-shaped values (dict/list/str/number/bool/None) use the fast codec;
+    anything it rejects - including tuples and non-str dict keys, which JSON
+    would hand back as lists and strings - falls back to pickle. Payloads
+    above the compression threshold are zlib-compressed when that actually
+    saves space.
+    """
+
+    def __init__(
+        self,
+        codec: Optional[str] = None,
+        compression_threshold: Optional[int] = None,
+        compression_level: int = 1,
+        schema_version: Optional[int] = None
+    ):
+        self._codecs = available_codecs()
+        self._by_id = {c.codec_id: c for c in self._codecs.values()}
+        self._fallback = self._codecs["pickle"]
+
+        codec = codec or settings.CACHE_CODEC
+        if codec == "auto":
+            codec = next(
+                name for name in ("msgpack", "orjson", "json") if name in self._codecs
+            )
+        if codec not in self._codecs:
+            logger.warning(f"⚠️ Cache codec '{codec}' unavailable, using json")
+            codec = "json"
+        self.codec = self._codecs[codec]
+
+        self.compression_threshold = (
+            settings.CACHE_COMPRESSION_THRESHOLD
+            if compression_threshold is None else compression_threshold
+        )
+        self.compression_level = compression_level
+        self.schema_version = (
+            settings.CACHE_SCHEMA_VERSION if schema_version is None else schema_version
+        ) & 0xFF
+
+    def encode(self, value: Any) -> bytes:
+        """Serialize value into a self-describing payload"""
+        codec = self.codec
+        try:
+            payload = codec.dumps(value)
+        except (TypeError, ValueError, OverflowError):
+            codec = self._fallback
+            payload = codec.dumps(value)
+
+        flags = 0
+        if self.compression_threshold and len(payload) > self.compression_threshold:
+            compressed = zlib.compress(payload, self.compression_level)
+            if len(compressed) < len(payload):
+                payload = compressed
+                flags |= FLAG_COMPRESSED
+
+        return MAGIC + bytes((self.schema_version, codec.codec_id, flags)) + payload
+
+    def decode(self, data: bytes) -> Any:
+        """Deserialize a payload written by encode()"""
+        if len(data) < HEADER_SIZE or data[:2] != MAGIC:
+            raise CacheCodecError("Missing cache header (legacy or foreign value)")
+
+        version, codec_id, flags = data[2], data[3], data[4]
+        if version != self.schema_version:
+            raise CacheCodecError(
+                f"Schema version mismatch: stored {version}, expected {self.schema_version}"
+            )
+
+        codec = self._by_id.get(codec_id)
+        if codec is None:
+            raise CacheCodecError(f"Codec {codec_id} not available in this process")
+
+        payload = data[HEADER_SIZE:]
+        try:
+            if flags & FLAG_COMPRESSED:
+                payload = zlib.decompress(payload)
+            return codec.loads(payload)
+        except Exception as e:
+            raise CacheCodecError(f"Corrupt {codec.name} payload: {str(e)}") from e
@@ -0,0 +1,160 @@
+"""
+📈 OmniCRM Ultimate - Cache Instrumentation
+============================================
+✅ Per-prefix hit / miss / set / error counters
+✅ Serialized bytes written per prefix
+✅ Get / set latency histograms
+✅ JSON snapshot + Prometheus text export
+
+The prefix is the first ":"-separated segment of the key, which matches
+the @cached(prefix=...) naming used across services.
+"""
+
+from typing import Dict, List, Optional
+import bisect
+
+
+# Latency bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+
+def key_prefix(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (cumulative export, Prometheus style)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value_ms: float):
+        self.counts[bisect.bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th percentile"""
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99)
+        }
+
+
+class PrefixStats:
+    """Counters for one key prefix"""
+
+    def __init__(self):
+        self.hits = 0
+        self.l1_hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.errors = 0
+        self.bytes_written = 0
+        self.get_latency = Histogram()
+        self.set_latency = Histogram()
+
+    def to_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "l1_hits": self.l1_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / max(lookups, 1) * 100, 2),
+            "sets": self.sets,
+            "errors": self.errors,
+            "bytes_written": self.bytes_written,
+            "avg_value_bytes": round(self.bytes_written / self.sets) if self.sets else None,
+            "get_latency": self.get_latency.to_dict(),
+            "set_latency": self.set_latency.to_dict()
+        }
+
+
+class CacheMetrics:
+    """In-process cache metrics keyed by prefix"""
+
+    def __init__(self):
+        self._prefixes: Dict[str, PrefixStats] = {}
+
+    def _stats(self, key: str) -> PrefixStats:
+        prefix = key_prefix(key)
+        stats = self._prefixes.get(prefix)
+        if stats is None:
+            stats = self._prefixes[prefix] = PrefixStats()
+        return stats
+
+    def record_get(self, key: str, hit: bool, seconds: float, tier: str = "l2"):
+        stats = self._stats(key)
+        if hit:
+            stats.hits += 1
+            if tier == "l1":
+                stats.l1_hits += 1
+        else:
+            stats.misses += 1
+        stats.get_latency.observe(seconds * 1000)
+
+    def record_set(self, key: str, nbytes: int, seconds: float):
+        stats = self._stats(key)
+        stats.sets += 1
+        stats.bytes_written += nbytes
+        stats.set_latency.observe(seconds * 1000)
+
+    def record_error(self, key: str):
+        self._stats(key).errors += 1
+
+    def reset(self):
+        self._prefixes.clear()
+
+    def snapshot(self) -> dict:
+        return {prefix: stats.to_dict() for prefix, stats in sorted(self._prefixes.items())}
+
+    def to_prometheus(self, namespace: str = "omnicrm_cache") -> str:
+        """Render all counters and histograms in Prometheus text format"""
+        lines: List[str] = []
+
+        counters = (
+            ("hits_total", "Cache hits (any tier)", lambda s: s.hits),
+            ("l1_hits_total", "Cache hits served from the in-process tier", lambda s: s.l1_hits),
+            ("misses_total", "Cache misses", lambda s: s.misses),
+            ("sets_total", "Cache writes", lambda s: s.sets),
+            ("errors_total", "Cache backend errors", lambda s: s.errors),
+            ("bytes_written_total", "Serialized bytes written", lambda s: s.bytes_written),
+        )
+        for name, help_text, getter in counters:
+            lines.append(f"# HELP {namespace}_{name} {help_text}")
+            lines.append(f"# TYPE {namespace}_{name} counter")
+            for prefix, stats in sorted(self._prefixes.items()):
+                lines.append(f'{namespace}_{name}{{prefix="{prefix}"}} {getter(stats)}')
+
+        for op in ("get", "set"):
+            metric = f"{namespace}_{op}_latency_ms"
+            lines.append(f"# HELP {metric} Cache {op} latency in milliseconds")
+            lines.append(f"# TYPE {metric} histogram")
+            for prefix, stats in sorted(self._prefixes.items()):
+                hist = stats.get_latency if op == "get" else stats.set_latency
+                running = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    running += count
+                    lines.append(f'{metric}_bucket{{prefix="{prefix}",le="{bound}"}} {running}')
+                lines.append(f'{metric}_bucket{{prefix="{prefix}",le="+Inf"}} {hist.count}')
+                lines.append(f'{metric}_sum{{prefix="{prefix}"}} {round(hist.total, 3)}')
+                lines.append(f'{metric}_count{{prefix="{prefix}"}} {hist.count}')
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,200 @@
+"""
+🔥 OmniCRM Ultimate - Cache Warming
+====================================
+✅ Registry of named warmers
+✅ Bounded concurrency with per-warmer timeouts
+✅ Startup run + periodic re-warming
+✅ Per-warmer timing report
+✅ Readiness gate on critical warmers
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Warmer:
+    """A registered warming job"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        critical: bool = False,
+        interval: Optional[int] = None
+    ):
+        self.name = name
+        self.func = func
+        self.critical = critical
+        self.interval = interval
+
+        # Last run report
+        self.status = "pending"  # pending, running, ok, failed, timeout
+        self.runs = 0
+        self.duration_ms: Optional[float] = None
+        self.last_run: Optional[str] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "critical": self.critical,
+            "interval": self.interval,
+            "runs": self.runs,
+            "duration_ms": self.duration_ms,
+            "last_run": self.last_run,
+            "error": self.error
+        }
+
+
+class CacheWarmer:
+    """
+    Runs registered warmers at startup and on a schedule
+
+    Usage:
+        @cache_warmer.warmer("pipeline_stats", critical=True, interval=60)
+        async def warm_pipeline_stats():
+            ...
+
+        cache_warmer.start()
+        ready = await cache_warmer.wait_until_ready(timeout=30)
+    """
+
+    def __init__(self, concurrency: int = 4, timeout: int = 60):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._warmers: Dict[str, Warmer] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    def register(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        critical: bool = False,
+        interval: Optional[int] = None
+    ):
+        """Register a warmer; critical warmers gate readiness"""
+        self._warmers[name] = Warmer(name, func, critical, interval)
+        logger.debug(f"🔥 Registered cache warmer: {name}")
+
+    def warmer(self, name: str, critical: bool = False, interval: Optional[int] = None):
+        """Decorator form of register()"""
+        def decorator(func: Callable[[], Awaitable[Any]]):
+            self.register(name, func, critical, interval)
+            return func
+        return decorator
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    def _get_ready_event(self) -> asyncio.Event:
+        if self._ready is None:
+            self._ready = asyncio.Event()
+        return self._ready
+
+    def _update_readiness(self):
+        critical = [w for w in self._warmers.values() if w.critical]
+        if all(w.runs > 0 for w in critical):
+            self._get_ready_event().set()
+
+    async def _run_one(self, warmer: Warmer):
+        async with self._get_semaphore():
+            warmer.status = "running"
+            started = time.perf_counter()
+
+            try:
+                await asyncio.wait_for(warmer.func(), timeout=self.timeout)
+                warmer.status = "ok"
+                warmer.error = None
+            except asyncio.TimeoutError:
+                warmer.status = "timeout"
+                warmer.error = f"Exceeded {self.timeout}s"
+            except Exception as e:
+                warmer.status = "failed"
+                warmer.error = str(e)
+
+            warmer.runs += 1
+            warmer.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            warmer.last_run = datetime.utcnow().isoformat()
+
+        if warmer.status == "ok":
+            logger.info(f"🔥 Warmed {warmer.name} in {warmer.duration_ms}ms")
+        else:
+            logger.error(f"❌ Cache warmer {warmer.name} {warmer.status}: {warmer.error}")
+
+        # A failed attempt still unblocks readiness: serving cold beats never serving
+        self._update_readiness()
+
+    async def run(self, names: Optional[List[str]] = None) -> dict:
+        """Run the given warmers (default: all) and return the report"""
+        warmers = [
+            w for w in self._warmers.values()
+            if names is None or w.name in names
+        ]
+        await asyncio.gather(*[self._run_one(w) for w in warmers])
+        self._update_readiness()
+        return self.get_report()
+
+    async def _schedule(self, warmer: Warmer):
+        while True:
+            await asyncio.sleep(warmer.interval)
+            await self._run_one(warmer)
+
+    def start(self):
+        """Warm everything in the background, then re-warm on each interval"""
+        if self._tasks:
+            return
+
+        self._tasks.append(asyncio.create_task(self.run()))
+        for warmer in self._warmers.values():
+            if warmer.interval:
+                self._tasks.append(asyncio.create_task(self._schedule(warmer)))
+
+        logger.info(f"🔥 Cache warming started ({len(self._warmers)} warmers)")
+
+    async def stop(self):
+        """Cancel the startup run and all scheduled re-warms"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def is_ready(self) -> bool:
+        self._update_readiness()
+        return self._get_ready_event().is_set()
+
+    async def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait for every critical warmer to finish at least once"""
+        if self.is_ready:
+            return True
+
+        try:
+            await asyncio.wait_for(self._get_ready_event().wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def get_report(self) -> dict:
+        return {
+            "ready": self.is_ready,
+            "warmers": {name: w.to_dict() for name, w in self._warmers.items()}
+        }
+
+
+# Global warmer instance
+cache_warmer = CacheWarmer(
+    concurrency=settings.CACHE_WARM_CONCURRENCY,
+    timeout=settings.CACHE_WARM_TIMEOUT
+)
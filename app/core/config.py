@@ -20,12 +20,73 @@ class Settings(BaseSettings):
     
     # Database (optional)
     DATABASE_URL: Optional[str] = None
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_SLOW_WAIT_MS: float = 100.0  # log checkouts that queued this long
+    DB_POOL_SLOW_HOLD_MS: float = 5000.0  # log connections held this long
+    DB_POOL_TRACE_SITES: bool = True  # attribute checkouts to the calling app code
+    DB_STATEMENT_CACHE_SIZE: int = 1200  # compiled SQL kept per engine (SQLAlchemy query_cache_size)
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 500  # asyncpg prepared statements per connection; 0 for PgBouncer
+    DATABASE_REPLICA_URLS: Optional[str] = None  # Comma-separated read replica URLs
+    DB_REPLICA_HEALTH_INTERVAL: int = 10  # seconds between replica health checks
+    DB_REPLICA_MAX_LAG: float = 5.0  # seconds of replication lag before a replica is skipped
+    DB_REPLICA_RETRY_AFTER: int = 30  # seconds a failed replica sits out without a health check
+    DB_READ_YOUR_WRITES_WINDOW: float = 5.0  # seconds a client reads from the primary after writing
+    
+    # Bulk writes
+    BULK_CHUNK_SIZE: int = 5000  # rows per upsert statement / savepoint
+    BULK_COPY_MIN_ROWS: int = 2000  # PostgreSQL chunks this large go through COPY
+    BULK_API_MAX_ROWS: int = 10000  # rows accepted by one /bulk request
+    
+    # Customer import
+    IMPORT_DIR: Optional[str] = None  # uploads + error files; defaults to <tmp>/omnicrm-imports
+    IMPORT_MAX_BYTES: int = 200 * 1024 * 1024  # upload cap for /api/customers/import
+    IMPORT_MAX_CONCURRENT: int = 2  # imports running at once per worker
+    IMPORT_JOB_TTL: int = 86400  # seconds job status and error files are kept
+    IMPORT_DEFAULT_COUNTRY_CODE: str = "966"  # for phone numbers written without one
+    
+    # Streaming export
+    EXPORT_BATCH_SIZE: int = 2000  # rows per cursor fetch / response chunk
+    EXPORT_MAX_CONCURRENT: int = 4  # exports running at once per worker (one connection each)
+    
+    # Pipeline aggregates
+    PIPELINE_RECONCILE_INTERVAL: int = 900  # seconds between drift checks against deals; 0 disables
     
     # Redis (optional)
     REDIS_URL: Optional[str] = None
+    REDIS_MAX_CONNECTIONS: int = 50
+    
+    # Cache
+    CACHE_L1_ENABLED: bool = True
+    CACHE_L1_MAX_ENTRIES: int = 10000
+    CACHE_L1_TTL: int = 30  # Upper bound on L1 staleness if an invalidation is missed
+    CACHE_MEMORY_FALLBACK: bool = True  # In-process backend when Redis is unavailable
+    CACHE_MEMORY_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_NEGATIVE_TTL: int = 30  # seconds a "not found" lookup stays cached
+    CACHE_CODEC: str = "auto"  # auto, msgpack, orjson, json, pickle
+    CACHE_COMPRESSION_THRESHOLD: int = 1024  # bytes; 0 disables compression
+    CACHE_SCHEMA_VERSION: int = 1  # Bump to orphan all cached values on deploy
+    CACHE_WARM_ON_STARTUP: bool = True
+    CACHE_WARM_CONCURRENCY: int = 4
+    CACHE_WARM_TIMEOUT: int = 60  # seconds per warmer
+    CACHE_WARM_READY_TIMEOUT: int = 30  # max seconds /ready?wait=true waits for critical warmers
+    
+    # Metrics
+    METRICS_PUBLIC: bool = False  # serve /api/v1/metrics/* without admin auth (internal-only deployments)
+    
+    # Rate limiting
+    RATE_LIMIT_LOCAL_ENABLED: bool = True  # Per-worker pre-filter in front of Redis
+    RATE_LIMIT_LOCAL_FRACTION: float = 0.1  # Share of a limit each worker may admit between syncs
+    RATE_LIMIT_LOCAL_MIN_LIMIT: int = 100  # Smaller limits always use exact checks
+    RATE_LIMIT_SYNC_INTERVAL: float = 1.0  # seconds
     
     # Security
     SECRET_KEY: str = "change-this-in-production"
+    SECURITY_MIDDLEWARE_ENABLED: bool = False  # IP filter, validation, rate limit, CSRF
+    IP_BLOCKLIST_PATH: Optional[str] = None  # One IP / CIDR per line
+    IP_BLOCKLIST_RELOAD_INTERVAL: int = 300  # seconds between change checks
     
     # AI Providers (optional)
     OPENAI_API_KEY: Optional[str] = None
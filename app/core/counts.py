@@ -0,0 +1,360 @@
+"""
+🔢 OmniCRM Ultimate - Table Counts
+==================================
+✅ exact: per-tenant counter rows kept by triggers in the writing transaction
+✅ approximate: planner statistics (pg_class.reltuples scaled to the current
+   table size, sqlite_stat1, information_schema.tables) - no table access
+✅ scan: plain COUNT(*), one connection per table, all tables concurrently
+✅ Tables without counters / statistics fall back to a concurrent scan
+
+Counters live in row_counts (table, organization_id, slot). PostgreSQL
+updates them once per statement from transition tables, spreading writers
+over COUNTER_SLOTS rows per tenant so concurrent inserts don't queue on one
+hot row; SQLite updates them per row. Every write path - ORM, bulk upserts,
+COPY, raw SQL - keeps them exact, and TRUNCATE resets them.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, inspect, text
+
+logger = logging.getLogger(__name__)
+
+COUNTED_TABLES = ("users", "customers", "deals", "messages", "campaigns")
+COUNT_MODES = ("exact", "approximate", "scan")
+COUNTER_SLOTS = 16
+TENANT_COLUMN = "organization_id"
+
+
+# ==================== POSTGRESQL ====================
+
+POSTGRES_TABLE = """
+CREATE TABLE IF NOT EXISTS row_counts (
+    table_name varchar(63) NOT NULL,
+    organization_id integer NOT NULL DEFAULT 0,
+    slot smallint NOT NULL DEFAULT 0,
+    row_count bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, organization_id, slot)
+)
+"""
+
+_PG_UPSERT = """
+        INSERT INTO row_counts (table_name, organization_id, slot, row_count)
+        SELECT TG_TABLE_NAME, {tenant}, v_slot, {sign}count(*) FROM {rows} GROUP BY 2
+        ON CONFLICT (table_name, organization_id, slot)
+        DO UPDATE SET row_count = row_counts.row_count + excluded.row_count;"""
+
+
+def _pg_count_function(name: str, tenant: str) -> str:
+    return f"""
+CREATE OR REPLACE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    v_slot smallint := floor(random() * {COUNTER_SLOTS});
+BEGIN
+    IF TG_OP = 'INSERT' THEN{_PG_UPSERT.format(tenant=tenant, sign='', rows='new_rows')}
+    ELSIF TG_OP = 'DELETE' THEN{_PG_UPSERT.format(tenant=tenant, sign='-', rows='old_rows')}
+    ELSIF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM row_counts WHERE table_name = TG_TABLE_NAME;
+    END IF;
+    RETURN NULL;
+END $$
+"""
+
+
+POSTGRES_FUNCTIONS = [
+    _pg_count_function("crm_count_rows", "0"),
+    _pg_count_function("crm_count_tenant_rows", f"coalesce({TENANT_COLUMN}, 0)"),
+    # A row moving between tenants (rare): row-level, fires only when the column changes
+    f"""
+CREATE OR REPLACE FUNCTION crm_count_tenant_move() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO row_counts (table_name, organization_id, slot, row_count)
+    VALUES (TG_TABLE_NAME, coalesce(OLD.{TENANT_COLUMN}, 0), 0, -1),
+           (TG_TABLE_NAME, coalesce(NEW.{TENANT_COLUMN}, 0), 0, 1)
+    ON CONFLICT (table_name, organization_id, slot)
+    DO UPDATE SET row_count = row_counts.row_count + excluded.row_count;
+    RETURN NULL;
+END $$
+""",
+]
+
+
+def _pg_triggers(table: str, tenant: bool) -> List[str]:
+    function = "crm_count_tenant_rows" if tenant else "crm_count_rows"
+    statements = [
+        f"DROP TRIGGER IF EXISTS {table}_count_insert ON {table}",
+        f"DROP TRIGGER IF EXISTS {table}_count_delete ON {table}",
+        f"DROP TRIGGER IF EXISTS {table}_count_truncate ON {table}",
+        f"DROP TRIGGER IF EXISTS {table}_count_move ON {table}",
+        f"CREATE TRIGGER {table}_count_insert AFTER INSERT ON {table} "
+        f"REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION {function}()",
+        f"CREATE TRIGGER {table}_count_delete AFTER DELETE ON {table} "
+        f"REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION {function}()",
+        f"CREATE TRIGGER {table}_count_truncate AFTER TRUNCATE ON {table} "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION {function}()",
+    ]
+    if tenant:
+        statements.append(
+            f"CREATE TRIGGER {table}_count_move AFTER UPDATE OF {TENANT_COLUMN} ON {table} FOR EACH ROW "
+            f"WHEN (OLD.{TENANT_COLUMN} IS DISTINCT FROM NEW.{TENANT_COLUMN}) "
+            f"EXECUTE FUNCTION crm_count_tenant_move()"
+        )
+    return statements
+
+
+# Row estimate the planner would use: tuples per page x current pages
+POSTGRES_ESTIMATE = """
+SELECT c.relname,
+       CASE WHEN c.reltuples < 0 THEN NULL
+            WHEN c.relpages = 0 THEN c.reltuples
+            ELSE c.reltuples / c.relpages
+                 * (pg_relation_size(c.oid) / current_setting('block_size')::int)
+       END
+FROM pg_class c
+WHERE c.relkind = 'r' AND c.relname IN :tables AND pg_table_is_visible(c.oid)
+"""
+
+
+# ==================== SQLITE ====================
+
+SQLITE_TABLE = """
+CREATE TABLE IF NOT EXISTS row_counts (
+    table_name TEXT NOT NULL,
+    organization_id INTEGER NOT NULL DEFAULT 0,
+    slot INTEGER NOT NULL DEFAULT 0,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, organization_id, slot)
+)
+"""
+
+
+def _sqlite_bump(table: str, tenant: str, delta: int) -> str:
+    return (
+        f"INSERT INTO row_counts (table_name, organization_id, slot, row_count) "
+        f"VALUES ('{table}', {tenant}, 0, {delta}) "
+        f"ON CONFLICT (table_name, organization_id, slot) DO UPDATE SET row_count = row_count + ({delta});"
+    )
+
+
+def _sqlite_triggers(table: str, tenant: bool) -> List[str]:
+    new = f"coalesce(NEW.{TENANT_COLUMN}, 0)" if tenant else "0"
+    old = f"coalesce(OLD.{TENANT_COLUMN}, 0)" if tenant else "0"
+    statements = [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_count_insert AFTER INSERT ON {table} "
+        f"BEGIN {_sqlite_bump(table, new, 1)} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_count_delete AFTER DELETE ON {table} "
+        f"BEGIN {_sqlite_bump(table, old, -1)} END",
+    ]
+    if tenant:
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_count_move AFTER UPDATE OF {TENANT_COLUMN} ON {table} "
+            f"WHEN OLD.{TENANT_COLUMN} IS NOT NEW.{TENANT_COLUMN} "
+            f"BEGIN {_sqlite_bump(table, old, -1)} {_sqlite_bump(table, new, 1)} END"
+        )
+    return statements
+
+
+# ==================== INSTALL ====================
+
+def _backfill(table: str, tenant: bool) -> List[str]:
+    tenant_expr = f"coalesce({TENANT_COLUMN}, 0)" if tenant else "0"
+    group_by = f" GROUP BY {tenant_expr}" if tenant else ""
+    return [
+        f"DELETE FROM row_counts WHERE table_name = '{table}'",
+        f"INSERT INTO row_counts (table_name, organization_id, slot, row_count) "
+        f"SELECT '{table}', {tenant_expr}, 0, count(*) FROM {table}{group_by}",
+    ]
+
+
+def _counted(connection) -> set:
+    """Tables that already have counter triggers"""
+    if connection.dialect.name == "postgresql":
+        query = "SELECT c.relname FROM pg_trigger t JOIN pg_class c ON c.oid = t.tgrelid " \
+                "WHERE t.tgname LIKE '%\\_count\\_insert'"
+    else:
+        query = "SELECT tbl_name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%\\_count\\_insert' ESCAPE '\\'"
+    return {row[0] for row in connection.execute(text(query))}
+
+
+def install_row_counters(connection, tables: Sequence[str] = COUNTED_TABLES, rebuild: bool = False):
+    """
+    Create the counter table, triggers and initial counts (idempotent)
+
+    Takes a sync Connection: use conn.run_sync(install_row_counters) from
+    async code, or op.get_bind() in a migration. Counts are backfilled for
+    tables that had no triggers yet, or all of them with rebuild=True.
+    On PostgreSQL CREATE TRIGGER locks out writers until commit, so the
+    backfill and the triggers agree.
+    """
+    dialect = connection.dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        logger.info(f"ℹ️ No row counters for {dialect}; exact counts scan the tables")
+        return
+
+    inspector = inspect(connection)
+    existing = set(inspector.get_table_names())
+    counted = _counted(connection) if "row_counts" in existing else set()
+
+    if dialect == "postgresql":
+        connection.execute(text(POSTGRES_TABLE))
+        for statement in POSTGRES_FUNCTIONS:
+            connection.execute(text(statement))
+    else:
+        connection.execute(text(SQLITE_TABLE))
+
+    installed = []
+    for table in tables:
+        if table not in existing:
+            continue
+        tenant = TENANT_COLUMN in {c["name"] for c in inspector.get_columns(table)}
+        triggers = _pg_triggers(table, tenant) if dialect == "postgresql" else _sqlite_triggers(table, tenant)
+        for statement in triggers:
+            connection.execute(text(statement))
+        if rebuild or table not in counted:
+            for statement in _backfill(table, tenant):
+                connection.execute(text(statement))
+        installed.append(table)
+
+    _installed.clear()
+    logger.info(f"🔢 Row counters installed for {', '.join(installed) or 'no tables'}")
+
+
+# ==================== COUNTING ====================
+
+# Seconds detected counters are trusted: found ones are re-checked now and
+# then (a migration may run while workers are up), none or a failed
+# detection soon
+INSTALLED_TTL = 300
+INSTALLED_RETRY_TTL = 10
+
+# engine URL -> (expires at, tables with counter triggers)
+_installed: Dict[str, Tuple[float, set]] = {}
+
+
+async def _counter_tables(db) -> set:
+    key = str(db.get_bind().url)
+    cached = _installed.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    try:
+        counted = await db.run_sync(lambda session: _counted(session.connection()))
+    except Exception as e:
+        logger.error(f"❌ Could not detect row counters: {str(e)}")
+        counted = set()
+    _installed[key] = (time.monotonic() + (INSTALLED_TTL if counted else INSTALLED_RETRY_TTL), counted)
+    return counted
+
+
+async def exact_counts(db, tables: Sequence[str], organization_id: Optional[int] = None) -> Dict[str, Optional[int]]:
+    """Counts from row_counts - one index range read; None where a table has no counters"""
+    if db.get_bind().dialect.name not in ("postgresql", "sqlite"):
+        return {table: None for table in tables}
+    counted = await _counter_tables(db)
+    wanted = [t for t in tables if t in counted]
+    counts: Dict[str, Optional[int]] = {t: (0 if t in counted else None) for t in tables}
+    if not wanted:
+        return counts
+
+    query = "SELECT table_name, SUM(row_count) FROM row_counts WHERE table_name IN :tables"
+    params: Dict[str, Any] = {"tables": wanted}
+    if organization_id is not None:
+        query += " AND organization_id = :organization_id"
+        params["organization_id"] = organization_id
+    stmt = text(query + " GROUP BY table_name").bindparams(bindparam("tables", expanding=True))
+    try:
+        rows = await db.execute(stmt, params)
+    except Exception:
+        # row_counts may be gone (downgrade, restore): detect again next time
+        _installed.pop(str(db.get_bind().url), None)
+        raise
+    for name, total in rows:
+        counts[name] = int(total or 0)
+    return counts
+
+
+async def approximate_counts(db, tables: Sequence[str]) -> Dict[str, Optional[int]]:
+    """Counts from planner statistics; None where the table has none yet"""
+    dialect = db.get_bind().dialect.name
+    counts: Dict[str, Optional[int]] = {t: None for t in tables}
+
+    if dialect == "postgresql":
+        stmt = text(POSTGRES_ESTIMATE).bindparams(bindparam("tables", expanding=True))
+        for name, estimate in await db.execute(stmt, {"tables": list(tables)}):
+            counts[name] = int(estimate) if estimate is not None else None
+
+    elif dialect == "sqlite":
+        # sqlite_stat1 exists once ANALYZE / PRAGMA optimize has run
+        has_stats = (await db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        )).first()
+        if has_stats:
+            stmt = text("SELECT tbl, stat FROM sqlite_stat1 WHERE tbl IN :tables").bindparams(
+                bindparam("tables", expanding=True)
+            )
+            for name, stat in await db.execute(stmt, {"tables": list(tables)}):
+                counts[name] = int(stat.split()[0])
+
+    elif dialect == "mysql":
+        stmt = text(
+            "SELECT table_name, table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name IN :tables"
+        ).bindparams(bindparam("tables", expanding=True))
+        for name, rows in await db.execute(stmt, {"tables": list(tables)}):
+            counts[name] = int(rows) if rows is not None else None
+
+    return counts
+
+
+async def _scan(session_context, table: str, organization_id: Optional[int]) -> int:
+    query = f"SELECT count(*) FROM {table}"
+    params = {}
+    if organization_id is not None:
+        query += f" WHERE {TENANT_COLUMN} = :organization_id"
+        params["organization_id"] = organization_id
+    async with session_context() as db:
+        return (await db.execute(text(query), params)).scalar() or 0
+
+
+async def count_rows(
+    tables: Iterable[str] = COUNTED_TABLES,
+    mode: str = "exact",
+    organization_id: Optional[int] = None,
+    session_context: Optional[Callable[[], Any]] = None,
+) -> Dict[str, int]:
+    """
+    Row count per table
+
+    mode "exact" reads the counters (per tenant when organization_id is
+    given), "approximate" reads planner statistics and falls back to the
+    counters (whole tables only - with organization_id it is "exact"),
+    "scan" runs COUNT(*). Tables nothing else can answer are scanned, each
+    on its own connection, all at once.
+    """
+    if mode not in COUNT_MODES:
+        raise ValueError(f"Unknown count mode '{mode}' (expected one of {', '.join(COUNT_MODES)})")
+    if session_context is None:
+        from app.core.database import get_read_db_context
+        session_context = get_read_db_context
+
+    tables = list(tables)
+    counts: Dict[str, Optional[int]] = {t: None for t in tables}
+    if mode != "scan":
+        async with session_context() as db:
+            if mode == "approximate" and organization_id is None:
+                counts = await approximate_counts(db, tables)
+            # Counters stand in for tables the planner has no statistics for yet
+            unknown = [t for t, count in counts.items() if count is None]
+            if unknown:
+                counts.update(await exact_counts(db, unknown, organization_id))
+
+    missing = [t for t, count in counts.items() if count is None]
+    if missing:
+        if mode != "scan":
+            logger.info(f"ℹ️ No {mode} counts for {', '.join(missing)}; scanning")
+        scanned = await asyncio.gather(*(_scan(session_context, t, organization_id) for t in missing))
+        counts.update(zip(missing, scanned))
+
+    return counts
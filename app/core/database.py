@@ -4,20 +4,23 @@ Version: 7.0.0
 Advanced database setup with async support and connection pooling
 """
 
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, List, Optional
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     AsyncEngine,
     create_async_engine,
     async_sessionmaker,
 )
-from sqlalchemy.orm import declarative_base, DeclarativeBase
-from sqlalchemy.pool import NullPool, QueuePool
+from sqlalchemy.orm import declarative_base, DeclarativeBase, Session
+from sqlalchemy.exc import DBAPIError, OperationalError
 from sqlalchemy import event, MetaData
 from contextlib import asynccontextmanager
+from fastapi import Request
 import logging
 
 from app.core.config import settings
+from app.core.db_replicas import Replica, ReplicaRouter, request_consistency_key
+from app.core.pool_metrics import InstrumentedNullPool, InstrumentedQueuePool, instrument_engine
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -45,15 +48,16 @@ def get_database_url() -> str:
     return settings.DATABASE_URL
 
 
-def create_engine() -> AsyncEngine:
-    """Create async database engine with connection pooling"""
+def create_engine(database_url: Optional[str] = None, name: str = "primary") -> AsyncEngine:
+    """Create async database engine with connection pooling (pool telemetry under name)"""
     
-    database_url = get_database_url()
+    database_url = database_url or get_database_url()
     
     # Configuration based on database type
     engine_args = {
         "echo": settings.DB_ECHO,
         "future": True,
+        "query_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
     }
     
     # SQLite specific configuration
@@ -62,7 +66,7 @@ def create_engine() -> AsyncEngine:
             "check_same_thread": False,
             "timeout": 30,
         }
-        engine_args["poolclass"] = NullPool
+        engine_args["poolclass"] = InstrumentedNullPool
         logger.info("🗄️ Using SQLite database")
     
     # PostgreSQL specific configuration
@@ -71,7 +75,12 @@ def create_engine() -> AsyncEngine:
         engine_args["max_overflow"] = settings.DB_MAX_OVERFLOW
         engine_args["pool_timeout"] = settings.DB_POOL_TIMEOUT
         engine_args["pool_pre_ping"] = True
-        engine_args["poolclass"] = QueuePool
+        engine_args["poolclass"] = InstrumentedQueuePool
+        if "+asyncpg" in database_url:
+            # Server-side prepared statements, reused per connection (0 behind PgBouncer)
+            engine_args["connect_args"] = {
+                "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+            }
         logger.info("🗄️ Using PostgreSQL database")
     
     # MySQL specific configuration
@@ -81,10 +90,16 @@ def create_engine() -> AsyncEngine:
         engine_args["pool_timeout"] = settings.DB_POOL_TIMEOUT
         engine_args["pool_pre_ping"] = True
         engine_args["pool_recycle"] = 3600  # Recycle connections every hour
-        engine_args["poolclass"] = QueuePool
+        engine_args["poolclass"] = InstrumentedQueuePool
         logger.info("🗄️ Using MySQL database")
     
     engine = create_async_engine(database_url, **engine_args)
+    instrument_engine(
+        engine, name,
+        slow_wait_ms=settings.DB_POOL_SLOW_WAIT_MS,
+        slow_hold_ms=settings.DB_POOL_SLOW_HOLD_MS,
+        trace_sites=settings.DB_POOL_TRACE_SITES,
+    )
     
     # Event listeners for SQLite
     if "sqlite" in database_url:
@@ -124,15 +139,39 @@ AsyncSessionLocal = async_sessionmaker(
 )
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+# Sessions that wrote something pin their client to the primary on commit
+# (see get_read_db). Tracked on the sync Session both engines share.
+@event.listens_for(Session, "after_flush")
+def _mark_flush_write(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_statement_write(orm_execute_state):
+    # Textual SQL counts as a write: pinning a read costs less than a stale one
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _pin_after_commit(session):
+    if session.info.get("has_writes") and replica_router is not None and replica_router.enabled:
+        replica_router.pin(session.info.get("consistency_key"))
+
+
+async def get_db(request: Request = None) -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency for getting database session
     Usage: db: AsyncSession = Depends(get_db)
     """
+    key = request_consistency_key(request)
     async with AsyncSessionLocal() as session:
+        session.info["consistency_key"] = key
         try:
             yield session
             await session.commit()
+            if session.info.get("has_writes") and get_replica_router().enabled:
+                await get_replica_router().record_write(key)
         except Exception as e:
             await session.rollback()
             logger.error(f"Database session error: {e}")
@@ -161,6 +200,100 @@ async def get_db_context():
             await session.close()
 
 
+# ========== Read Replicas ==========
+replica_router: Optional[ReplicaRouter] = None
+
+
+def get_replica_urls() -> List[str]:
+    """Replica URLs from DATABASE_REPLICA_URLS (comma-separated)"""
+    urls = settings.DATABASE_REPLICA_URLS or ""
+    return [url.strip() for url in urls.split(",") if url.strip()]
+
+
+def create_replica_router() -> ReplicaRouter:
+    """Build an engine and session factory per configured replica"""
+    replicas = []
+    for index, url in enumerate(get_replica_urls(), start=1):
+        replica_engine = create_engine(url, name=f"replica-{index}")
+        replicas.append(Replica(
+            name=f"replica-{index}",
+            engine=replica_engine,
+            session_factory=async_sessionmaker(
+                bind=replica_engine,
+                class_=AsyncSession,
+                expire_on_commit=False,
+                autoflush=False,
+            ),
+        ))
+    
+    if replicas:
+        logger.info(f"🗄️ Routing reads across {len(replicas)} replica(s)")
+    
+    return ReplicaRouter(
+        replicas,
+        read_your_writes_window=settings.DB_READ_YOUR_WRITES_WINDOW,
+        max_lag=settings.DB_REPLICA_MAX_LAG,
+        retry_after=settings.DB_REPLICA_RETRY_AFTER,
+        health_interval=settings.DB_REPLICA_HEALTH_INTERVAL,
+    )
+
+
+def get_replica_router() -> ReplicaRouter:
+    """Get or create the global replica router"""
+    global replica_router
+    if replica_router is None:
+        replica_router = create_replica_router()
+    
+    # Share read-your-writes pins across workers once the cache is connected
+    if replica_router.pin_store is None and replica_router.enabled:
+        from app.core.cache import cache_manager
+        replica_router.pin_store = cache_manager.backend
+    
+    return replica_router
+
+
+@asynccontextmanager
+async def get_read_db_context(consistency_key: Optional[str] = None):
+    """
+    Context manager for read-only work (stats, reports, audits)
+    Usage:
+        async with get_read_db_context() as db:
+            # read-only queries
+    
+    Uses a healthy replica in round-robin order, or the primary when none
+    is configured/healthy or the client committed a write within
+    DB_READ_YOUR_WRITES_WINDOW. The session is never committed.
+    """
+    router = get_replica_router()
+    replica = None
+    if router.enabled:
+        if not router.started:
+            router.start()
+        replica = router.choose(pinned=await router.is_pinned(consistency_key))
+    
+    session_factory = replica.session_factory if replica else AsyncSessionLocal
+    async with session_factory() as session:
+        try:
+            yield session
+        except DBAPIError as e:
+            if replica is not None and (e.connection_invalidated or isinstance(e, OperationalError)):
+                router.mark_failed(replica, e)
+            logger.error(f"Read session error: {e}")
+            raise
+        finally:
+            await session.rollback()
+            await session.close()
+
+
+async def get_read_db(request: Request = None) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for read-only database session
+    Usage: db: AsyncSession = Depends(get_read_db)
+    """
+    async with get_read_db_context(request_consistency_key(request)) as session:
+        yield session
+
+
 # ========== Database Initialization ==========
 async def init_db():
     """Initialize database - create all tables"""
@@ -182,6 +315,18 @@ async def init_db():
             
             await conn.run_sync(Base.metadata.create_all)
             logger.info("✅ Database tables created successfully")
+            
+            # Full-text search indexes + sync triggers (idempotent)
+            from app.core.search import install_customer_search
+            await conn.run_sync(install_customer_search)
+            
+            # Trigger-maintained row counters for get_table_counts (idempotent)
+            from app.core.counts import install_row_counters
+            await conn.run_sync(install_row_counters)
+            
+            # Per-stage pipeline aggregates for get_pipeline_stats (idempotent)
+            from app.core.pipeline_aggregates import install_pipeline_aggregates
+            await conn.run_sync(install_pipeline_aggregates)
         
         # Create default admin user if not exists
         await create_default_admin()
@@ -235,6 +380,7 @@ async def get_db_info() -> dict:
             "pool_size": engine.pool.size() if hasattr(engine, "pool") else None,
             "checked_out_connections": engine.pool.checkedout() if hasattr(engine, "pool") else None,
             "status": "connected" if await check_db_connection() else "disconnected",
+            "replicas": get_replica_router().get_stats(),
         }
     except Exception as e:
         logger.error(f"Error getting database info: {e}")
@@ -295,11 +441,17 @@ async def run_migrations():
 # ========== Connection Pool Management ==========
 async def dispose_engine():
     """Dispose database engine and close all connections"""
-    global engine
+    global engine, replica_router
     if engine is not None:
         await engine.dispose()
         engine = None
         logger.info("✅ Database engine disposed")
+    
+    if replica_router is not None:
+        await replica_router.stop()
+        for replica in replica_router.replicas:
+            await replica.engine.dispose()
+        replica_router = None
 
 
 async def get_pool_status() -> dict:
@@ -370,42 +522,47 @@ async def transaction():
 
 # ========== Bulk Operations ==========
 async def bulk_insert(model_class, objects: list):
-    """Bulk insert objects"""
+    """Bulk insert plain dicts in chunks (Core INSERT, no ORM object per row)"""
+    from app.core.bulk import BulkUpserter
+
     async with get_db_context() as db:
-        db.add_all([model_class(**obj) for obj in objects])
-        await db.commit()
-        logger.info(f"✅ Bulk inserted {len(objects)} {model_class.__name__} objects")
+        result = await BulkUpserter(model_class, collect_ids=False).upsert(db, objects)
+        logger.info(f"✅ Bulk inserted {result.written} {model_class.__name__} objects")
+        return result
 
 
 async def bulk_update(model_class, objects: list):
-    """Bulk update objects"""
+    """Bulk update by primary key; every dict must carry the primary key"""
+    from sqlalchemy import update
+    from app.core.bulk import iterate_chunks
+
     async with get_db_context() as db:
-        await db.execute(model_class.__table__.update(), objects)
-        await db.commit()
+        async for chunk in iterate_chunks(objects, settings.BULK_CHUNK_SIZE):
+            # ORM bulk UPDATE: WHERE pk = :pk per row, executemany
+            await db.execute(update(model_class), chunk)
+            await db.commit()
         logger.info(f"✅ Bulk updated {len(objects)} {model_class.__name__} objects")
 
 
+async def bulk_upsert(model_class, objects, conflict_columns, **options):
+    """Insert-or-update on a unique key; see app.core.bulk.BulkUpserter"""
+    from app.core.bulk import BulkUpserter
+
+    async with get_db_context() as db:
+        return await BulkUpserter(model_class, conflict_columns, **options).upsert(db, objects)
+
+
 # ========== Database Statistics ==========
-async def get_table_counts() -> dict:
-    """Get row count for all tables"""
-    from app.models import user, customer, deal, message, campaign
-    
-    tables = {
-        "users": user.User,
-        "customers": customer.Customer,
-        "deals": deal.Deal,
-        "messages": message.Message,
-        "campaigns": campaign.Campaign,
-    }
+async def get_table_counts(mode: str = "exact", organization_id: Optional[int] = None) -> dict:
+    """
+    Get row count for all tables
     
-    counts = {}
-    async with get_db_context() as db:
-        from sqlalchemy import select, func
-        for name, model in tables.items():
-            result = await db.execute(select(func.count()).select_from(model))
-            counts[name] = result.scalar()
+    mode: "exact" (trigger-maintained counters, optionally per organization),
+    "approximate" (planner statistics) or "scan" (COUNT(*)); see app.core.counts
+    """
+    from app.core.counts import COUNTED_TABLES, count_rows
     
-    return counts
+    return await count_rows(COUNTED_TABLES, mode=mode, organization_id=organization_id)
 
 
 if __name__ == "__main__":
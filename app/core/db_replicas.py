@@ -0,0 +1,256 @@
+"""
+🗄️ OmniCRM Ultimate - Read Replica Routing
+==========================================
+✅ Optional replica engines next to the primary (DATABASE_REPLICA_URLS)
+✅ Round-robin over healthy replicas, primary as the fallback
+✅ Background health checks with a replication-lag ceiling
+✅ Read-your-writes: a client that just committed reads from the primary
+
+The router only decides *where* a read goes; engines and sessions are
+built in app.core.database. A replica that errors is skipped until the
+next successful health check (or retry_after seconds without one).
+"""
+
+import time
+import math
+import asyncio
+import hashlib
+import itertools
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+# Lag is only meaningful while WAL is still being replayed; an idle
+# replica that has caught up reports 0 instead of "time since last write".
+_POSTGRES_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class Replica:
+    """A replica engine plus its session factory and health state"""
+
+    __slots__ = (
+        "name", "engine", "session_factory",
+        "healthy", "lag", "failures", "last_error", "retry_at", "reads",
+    )
+
+    def __init__(self, name: str, engine: Any = None, session_factory: Any = None):
+        self.name = name
+        self.engine = engine
+        self.session_factory = session_factory
+        self.healthy = True
+        self.lag: Optional[float] = None
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.retry_at = 0.0
+        self.reads = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy or now >= self.retry_at
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "reads": self.reads,
+        }
+
+
+async def probe_replica(replica: Replica) -> Optional[float]:
+    """Ping a replica; returns replication lag in seconds where the dialect exposes it"""
+    async with replica.engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            lag = (await conn.execute(_POSTGRES_LAG_SQL)).scalar()
+            return float(lag or 0)
+        await conn.execute(text("SELECT 1"))
+    return None
+
+
+def request_consistency_key(request: Any) -> Optional[str]:
+    """
+    Identify the client whose writes must be visible to its next reads
+
+    Authenticated clients are keyed by a hash of their credentials so the
+    pin follows them across connections; anonymous ones by address.
+    """
+    if request is None:
+        return None
+
+    credential = request.headers.get("authorization") or request.cookies.get("access_token")
+    if credential:
+        return "auth:" + hashlib.sha1(credential.encode()).hexdigest()[:16]
+    if request.client:
+        return "ip:" + request.client.host
+    return None
+
+
+class ReplicaRouter:
+    """
+    Picks the engine for read-only work
+
+    Pins are kept in-process and, when a pin_store (cache backend) is
+    given, mirrored there so other workers honour them too.
+    """
+
+    PIN_PREFIX = "db:rw_pin:"
+
+    def __init__(
+        self,
+        replicas: Optional[List[Replica]] = None,
+        read_your_writes_window: float = 5.0,
+        max_lag: Optional[float] = 5.0,
+        retry_after: float = 30.0,
+        health_interval: float = 10.0,
+        probe: Callable[[Replica], Awaitable[Optional[float]]] = probe_replica,
+        pin_store: Any = None,
+    ):
+        self.replicas = list(replicas or [])
+        self.read_your_writes_window = read_your_writes_window
+        self.max_lag = max_lag
+        self.retry_after = retry_after
+        self.health_interval = health_interval
+        self.probe = probe
+        self.pin_store = pin_store
+
+        self._cursor = itertools.count()
+        self._pins: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.primary_reads = 0
+        self.pinned_reads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    # ==================== SELECTION ====================
+
+    def choose(self, pinned: bool = False) -> Optional[Replica]:
+        """Next available replica in round-robin order; None means use the primary"""
+        if pinned:
+            self.pinned_reads += 1
+            self.primary_reads += 1
+            return None
+
+        now = time.monotonic()
+        count = len(self.replicas)
+        for _ in range(count):
+            replica = self.replicas[next(self._cursor) % count]
+            if replica.available(now):
+                replica.reads += 1
+                return replica
+
+        self.primary_reads += 1
+        return None
+
+    def mark_failed(self, replica: Replica, error: Any):
+        replica.healthy = False
+        replica.failures += 1
+        replica.last_error = str(error)[:200]
+        replica.retry_at = time.monotonic() + self.retry_after
+        logger.error(f"❌ Read replica {replica.name} unavailable: {replica.last_error}")
+
+    def mark_healthy(self, replica: Replica, lag: Optional[float] = None):
+        replica.lag = lag
+        if self.max_lag is not None and lag is not None and lag > self.max_lag:
+            self.mark_failed(replica, f"replication lag {lag:.1f}s > {self.max_lag}s")
+            return
+        if not replica.healthy:
+            logger.info(f"✅ Read replica {replica.name} is healthy again")
+        replica.healthy = True
+        replica.last_error = None
+
+    # ==================== READ-YOUR-WRITES ====================
+
+    def pin(self, key: Optional[str]):
+        """Send this client's reads to the primary for the read-your-writes window"""
+        if not key or self.read_your_writes_window <= 0:
+            return
+
+        now = time.monotonic()
+        if len(self._pins) > 10000:
+            self._pins = {k: exp for k, exp in self._pins.items() if exp > now}
+        self._pins[key] = now + self.read_your_writes_window
+
+    async def record_write(self, key: Optional[str]):
+        """Pin locally and in the shared store (best effort)"""
+        if not key or self.read_your_writes_window <= 0:
+            return
+
+        self.pin(key)
+        if self.pin_store is not None:
+            try:
+                await self.pin_store.set(
+                    self.PIN_PREFIX + key, b"1", ttl=math.ceil(self.read_your_writes_window)
+                )
+            except Exception as e:
+                logger.error(f"❌ Failed to share read-your-writes pin: {str(e)}")
+
+    async def is_pinned(self, key: Optional[str]) -> bool:
+        if not key:
+            return False
+
+        expires_at = self._pins.get(key)
+        if expires_at is not None:
+            if expires_at > time.monotonic():
+                return True
+            self._pins.pop(key, None)
+
+        if self.pin_store is not None:
+            try:
+                return bool(await self.pin_store.exists(self.PIN_PREFIX + key))
+            except Exception as e:
+                # Fail open: a missed pin only risks a briefly stale read
+                logger.error(f"❌ Read-your-writes pin lookup failed: {str(e)}")
+        return False
+
+    # ==================== HEALTH CHECKS ====================
+
+    async def _check(self, replica: Replica):
+        try:
+            lag = await asyncio.wait_for(self.probe(replica), timeout=self.health_interval)
+        except Exception as e:
+            self.mark_failed(replica, str(e) or "health check timed out")
+            return
+        self.mark_healthy(replica, lag)
+
+    async def check_health(self):
+        """Probe every replica concurrently"""
+        await asyncio.gather(*[self._check(replica) for replica in self.replicas])
+
+    async def _health_loop(self):
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_interval)
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        """Start background health checks (needs a running event loop)"""
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "replicas": [replica.get_stats() for replica in self.replicas],
+            "primary_reads": self.primary_reads,
+            "pinned_reads": self.pinned_reads,
+            "active_pins": sum(1 for exp in self._pins.values() if exp > time.monotonic()),
+        }
@@ -0,0 +1,213 @@
+"""
+🛡️ OmniCRM Ultimate - CIDR IP Filtering
+========================================
+✅ IPv4 / IPv6 addresses and CIDR ranges in one set
+✅ Ranges compiled to merged, sorted intervals (binary-search lookups)
+✅ Hot reload of large blocklists (100k+ ranges) off the event loop
+
+Lookups cost O(log n) in the number of merged ranges - about 17 integer
+comparisons for 100k ranges - independent of prefix length. Addresses are
+parsed with inet_pton rather than the ipaddress module, which dominated
+lookup time.
+"""
+
+import os
+import socket
+import asyncio
+import bisect
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+_V4_MAPPED_PREFIX = b"\x00" * 10 + b"\xff\xff"
+
+
+def _parse_address(ip: str, map_v4: bool = True) -> Optional[Tuple[int, int]]:
+    """Return (version, integer value) or None if ip is not a valid address"""
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+    except (OSError, TypeError):
+        pass
+
+    try:
+        packed = socket.inet_pton(socket.AF_INET6, ip)
+    except (OSError, TypeError):
+        return None
+
+    if map_v4 and packed[:12] == _V4_MAPPED_PREFIX:
+        return 4, int.from_bytes(packed[12:], "big")
+    return 6, int.from_bytes(packed, "big")
+
+
+def _parse_network(entry: str) -> Optional[Tuple[int, int, int]]:
+    """Return (version, first, last) for an address or CIDR (host bits ignored)"""
+    address, _, prefix = entry.partition("/")
+    parsed = _parse_address(address.strip(), map_v4=False)
+    if parsed is None:
+        return None
+
+    version, value = parsed
+    bits = 32 if version == 4 else 128
+    try:
+        prefix_len = int(prefix) if prefix else bits
+    except ValueError:
+        return None
+    if not 0 <= prefix_len <= bits:
+        return None
+
+    host_mask = (1 << (bits - prefix_len)) - 1
+    first = value & ~host_mask
+    return version, first, first | host_mask
+
+
+def _merge(ranges: List[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+    """Sort and coalesce overlapping/adjacent ranges into parallel start/end lists"""
+    ranges.sort()
+    starts: List[int] = []
+    ends: List[int] = []
+    for start, end in ranges:
+        if ends and start <= ends[-1] + 1:
+            if end > ends[-1]:
+                ends[-1] = end
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+class IPNetworkSet:
+    """
+    Immutable set of IP ranges built from addresses and CIDRs
+
+    Entries may carry trailing "# comments"; invalid entries are counted
+    in .invalid and skipped rather than failing the whole list.
+    """
+
+    __slots__ = ("_v4", "_v6", "invalid")
+
+    def __init__(self, entries: Iterable[str] = ()):
+        ranges = {4: [], 6: []}
+        self.invalid = 0
+
+        for entry in entries:
+            entry = entry.split("#", 1)[0].strip()
+            if not entry:
+                continue
+            network = _parse_network(entry)
+            if network is None:
+                self.invalid += 1
+                continue
+            version, first, last = network
+            ranges[version].append((first, last))
+
+        self._v4 = _merge(ranges[4])
+        self._v6 = _merge(ranges[6])
+
+    def __contains__(self, ip: str) -> bool:
+        parsed = _parse_address(ip)
+        if parsed is None:
+            return False
+
+        version, value = parsed
+        starts, ends = self._v4 if version == 4 else self._v6
+        index = bisect.bisect_right(starts, value) - 1
+        return index >= 0 and value <= ends[index]
+
+    def __len__(self) -> int:
+        """Number of merged ranges"""
+        return len(self._v4[0]) + len(self._v6[0])
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+
+@lru_cache(maxsize=64)
+def _compile_cached(entries: Tuple[str, ...]) -> IPNetworkSet:
+    return IPNetworkSet(entries)
+
+
+def as_network_set(entries: Union["IPNetworkSet", "IPBlocklist", Iterable[str]]):
+    """Accept a compiled set as-is; compile (and memoize) plain lists"""
+    if isinstance(entries, (IPNetworkSet, IPBlocklist)):
+        return entries
+    return _compile_cached(tuple(entries))
+
+
+def load_network_file(path: str) -> IPNetworkSet:
+    """Parse a one-entry-per-line blocklist file (blocking; run in a thread)"""
+    with open(path, encoding="utf-8") as f:
+        return IPNetworkSet(f)
+
+
+class IPBlocklist:
+    """
+    File-backed IPNetworkSet reloaded in the background when the file changes
+
+    Parsing runs in a worker thread and the compiled set is swapped in with
+    a single assignment, so lookups never see a half-built list.
+    """
+
+    def __init__(self, path: Optional[str] = None, reload_interval: int = 300):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.networks = IPNetworkSet()
+        self._mtime: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __contains__(self, ip: str) -> bool:
+        return ip in self.networks
+
+    def __len__(self) -> int:
+        return len(self.networks)
+
+    def __bool__(self) -> bool:
+        return bool(self.networks)
+
+    async def reload(self, force: bool = False) -> bool:
+        """Recompile if the file changed; returns True when a new set was loaded"""
+        if not self.path:
+            return False
+
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if not force and mtime == self._mtime:
+                return False
+
+            networks = await asyncio.to_thread(load_network_file, self.path)
+
+        except Exception as e:
+            # Keep serving the previous list
+            logger.error(f"❌ IP blocklist reload failed ({self.path}): {str(e)}")
+            return False
+
+        self.networks = networks
+        self._mtime = mtime
+        logger.info(
+            f"🛡️ IP blocklist loaded: {len(networks)} ranges from {self.path}"
+            + (f" ({networks.invalid} invalid entries skipped)" if networks.invalid else "")
+        )
+        return True
+
+    async def _watch(self):
+        while True:
+            await self.reload()
+            await asyncio.sleep(self.reload_interval)
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        """Load now and poll the file for changes (needs a running event loop)"""
+        if self.path and self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        """Cancel the reload task (shutdown); the loaded set keeps answering"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,134 @@
+"""
+📑 OmniCRM Ultimate - Keyset Pagination
+=======================================
+✅ Cursor pagination on (sort column, id) - same cost on page 1 and page 2,000
+✅ Opaque URL-safe cursors bound to the sort they were issued for
+✅ Ascending or descending on any non-null, indexed column
+
+OFFSET makes the database walk and discard every earlier row. A keyset
+page instead seeks straight to "after the last row I saw" using a row
+comparison that a (sort column, id) index answers with one range scan.
+Sort columns must be NOT NULL - NULLs never compare and would be skipped.
+"""
+
+import json
+import base64
+import binascii
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Callable, Generic, List, Optional, Sequence, TypeVar
+
+from sqlalchemy import literal, tuple_
+from sqlalchemy.sql import Select
+
+T = TypeVar("T")
+
+
+class InvalidCursor(ValueError):
+    """Cursor is malformed or was issued for a different sort"""
+
+
+@dataclass
+class Page(Generic[T]):
+    """One page of results plus the cursor for the next one"""
+
+    items: List[T] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+# ==================== CURSOR ENCODING ====================
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        raise InvalidCursor("Unknown cursor value")
+    return value
+
+
+def encode_cursor(sort: str, values: Sequence[Any]) -> str:
+    """Opaque cursor for the row that ended a page"""
+    payload = json.dumps({"s": sort, "k": [_encode_value(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, sort: str, size: int) -> List[Any]:
+    """Key values stored in cursor; raises InvalidCursor if it does not fit this sort"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [_decode_value(v) for v in payload["k"]]
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Malformed cursor: {str(e)}")
+
+    if payload.get("s") != sort or len(values) != size:
+        raise InvalidCursor("Cursor does not match the requested sort order")
+    return values
+
+
+# ==================== QUERY BUILDING ====================
+
+def sort_token(sort: str, descending: bool) -> str:
+    """Sort identity stored in cursors, e.g. "-created_at" """
+    return ("-" if descending else "") + sort
+
+
+def keyset_paginate(
+    stmt: Select,
+    columns: Sequence[Any],
+    cursor: Optional[str],
+    limit: int,
+    sort: str,
+    descending: bool = True,
+) -> Select:
+    """
+    Order stmt by columns (sort column(s) then a unique tiebreaker) and
+    seek past cursor. Fetches limit + 1 rows so build_page can tell
+    whether another page exists.
+    """
+    if cursor:
+        values = decode_cursor(cursor, sort_token(sort, descending), len(columns))
+        key = tuple_(*columns)
+        after = tuple_(*[literal(v, type_=c.type) for c, v in zip(columns, values)])
+        stmt = stmt.where(key < after if descending else key > after)
+
+    order = [c.desc() if descending else c.asc() for c in columns]
+    return stmt.order_by(*order).limit(limit + 1)
+
+
+def build_page(
+    rows: Sequence[T],
+    limit: int,
+    sort: str,
+    descending: bool,
+    key: Callable[[T], Sequence[Any]],
+) -> Page[T]:
+    """Trim the look-ahead row and issue the next cursor if there was one"""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return Page(items=rows)
+
+    rows = rows[:limit]
+    return Page(items=rows, next_cursor=encode_cursor(sort_token(sort, descending), key(rows[-1])))
+
+
+def set_page_headers(request: Any, response: Any, page: Page):
+    """Expose the next-page cursor on a response (X-Next-Cursor + RFC 8288 Link)"""
+    if page.next_cursor:
+        next_url = request.url.remove_query_params("offset").include_query_params(cursor=page.next_cursor)
+        response.headers["X-Next-Cursor"] = page.next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
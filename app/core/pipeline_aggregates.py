@@ -0,0 +1,389 @@
+"""
+📊 OmniCRM Ultimate - Pipeline Aggregates
+=========================================
+✅ deal count, sum(amount), sum(probability) per (organization, stage, status)
+✅ Kept current by the deal writes themselves, in the same transaction
+✅ Pipeline stats read O(stages) primary-key rows instead of grouping all deals
+✅ Periodic reconciliation rebuilds from deals and logs any drift it corrects
+✅ Falls back to grouping deals where the table isn't installed
+
+status is derived from the stage (closed_won -> won, closed_lost -> lost,
+anything else -> active); soft-deleted deals are left out. CRMService
+applies a delta read from the deal row as stored (so the tenant column
+counts even though the ORM doesn't map it): -row before a change, +row
+after it - per chunk for bulk upserts. Writes that bypass CRMService (raw
+SQL, other services) are caught by reconciliation.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    BigInteger, Column, Float, Integer, MetaData, String, Table, case, cast, column, delete, func, inspect,
+    literal_column, select, table, text
+)
+
+from app.core.cache import cache_manager
+from app.core.config import settings
+from app.core.counts import TENANT_COLUMN
+
+logger = logging.getLogger(__name__)
+
+# Cache tag of every pipeline read (CRMService invalidates it on deal writes)
+PIPELINE_TAG = "pipeline"
+
+metadata = MetaData()
+
+pipeline_aggregates = Table(
+    "pipeline_aggregates",
+    metadata,
+    Column("organization_id", Integer, primary_key=True, default=0),
+    Column("stage", String(50), primary_key=True),
+    Column("status", String(20), primary_key=True),
+    Column("deal_count", BigInteger, nullable=False, default=0),
+    Column("value_sum", Float, nullable=False, default=0.0),
+    Column("probability_sum", Float, nullable=False, default=0.0),
+)
+
+# The Deal columns aggregated, as stored (stage holds DealStage names)
+DEALS = table(
+    "deals",
+    column("id"), column("customer_id"), column("stage"), column("amount"), column("probability"),
+    column("deleted_at"),
+)
+REQUIRED_COLUMNS = {"id", "stage", "amount", "probability", "deleted_at"}
+
+# Stages (lower-cased DealStage names / values) that close a deal
+WON_STAGES = ("closed_won", "won")
+LOST_STAGES = ("closed_lost", "lost")
+
+GROUP_COLUMNS = ("organization_id", "stage", "status")
+SUM_COLUMNS = ("deal_count", "value_sum", "probability_sum")
+
+# (organization_id, stage, status) -> (deal_count, value_sum, probability_sum)
+Totals = Dict[Tuple[int, str, str], Tuple[int, float, float]]
+
+
+def _grouped(has_tenant: bool, condition=None, sign: int = 1):
+    """Aggregate rows from deals: (organization_id, stage, status, count, value, probability)"""
+    # Grouped expressions carry no bound parameters: PostgreSQL only matches
+    # a GROUP BY expression to the select list when the SQL is identical
+    def literals(values):
+        return [literal_column(f"'{v}'") for v in values]
+
+    zero, blank = literal_column("0"), literal_column("''")
+    tenant = func.coalesce(column(TENANT_COLUMN), zero) if has_tenant else zero
+    # Enum-typed on PostgreSQL; lower-cased names are the DealStage values
+    stage = func.lower(func.coalesce(cast(DEALS.c.stage, String), blank))
+    status = case(
+        (stage.in_(literals(WON_STAGES)), literal_column("'won'")),
+        (stage.in_(literals(LOST_STAGES)), literal_column("'lost'")),
+        else_=literal_column("'active'"),
+    )
+    stmt = select(
+        tenant.label("organization_id"),
+        stage.label("stage"),
+        status.label("status"),
+        (func.count() * sign).label("deal_count"),
+        (func.coalesce(func.sum(DEALS.c.amount), 0) * sign).label("value_sum"),
+        (func.coalesce(func.sum(DEALS.c.probability), 0) * sign).label("probability_sum"),
+    ).select_from(DEALS).where(DEALS.c.deleted_at.is_(None))  # a WHERE also lets SQLite parse ON CONFLICT
+    if condition is not None:
+        stmt = stmt.where(condition)
+    # status follows from stage, so grouping by stage is enough
+    return stmt.group_by(*((tenant,) if has_tenant else ()), stage)
+
+
+def _insert(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(pipeline_aggregates)
+
+
+# ==================== INSTALL ====================
+
+def _rebuild(connection, has_tenant: bool):
+    connection.execute(delete(pipeline_aggregates))
+    connection.execute(
+        pipeline_aggregates.insert().from_select(GROUP_COLUMNS + SUM_COLUMNS, _grouped(has_tenant))
+    )
+
+
+def install_pipeline_aggregates(connection, rebuild: bool = False):
+    """
+    Create pipeline_aggregates and fill it from deals (idempotent)
+
+    Takes a sync Connection: conn.run_sync(install_pipeline_aggregates) from
+    async code, or op.get_bind() in a migration. An existing table is only
+    refilled with rebuild=True.
+    """
+    dialect = connection.dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        logger.info(f"ℹ️ No pipeline aggregates for {dialect}; pipeline stats group the deals table")
+        return
+
+    inspector = inspect(connection)
+    existing = set(inspector.get_table_names())
+    if "deals" not in existing:
+        return
+    deal_columns = {c["name"] for c in inspector.get_columns("deals")}
+    missing = REQUIRED_COLUMNS - deal_columns
+    if missing:
+        logger.warning(f"⚠️ deals has no {', '.join(sorted(missing))}; pipeline aggregates not installed")
+        return
+
+    pipeline_aggregates.create(connection, checkfirst=True)
+    if rebuild or "pipeline_aggregates" not in existing:
+        _rebuild(connection, TENANT_COLUMN in deal_columns)
+
+    _state.clear()
+    logger.info("📊 Pipeline aggregates installed")
+
+
+# Seconds a detected state is trusted: an install found is re-checked now
+# and then (a migration may run while workers are up), a miss or a failed
+# detection soon
+STATE_TTL = 300
+STATE_RETRY_TTL = 10
+
+# engine URL -> (expires at, (deals has the aggregated columns, aggregates installed, deals has a tenant column))
+_state: Dict[str, Tuple[float, Tuple[bool, bool, bool]]] = {}
+
+
+def _detect(connection) -> Tuple[bool, bool, bool]:
+    inspector = inspect(connection)
+    if "deals" not in inspector.get_table_names():
+        return False, False, False
+    deal_columns = {c["name"] for c in inspector.get_columns("deals")}
+    if not REQUIRED_COLUMNS <= deal_columns:
+        logger.warning("⚠️ deals lacks the columns pipeline stats aggregate; stats will be empty")
+        return False, False, False
+    installed = (
+        connection.dialect.name in ("postgresql", "sqlite")
+        and "pipeline_aggregates" in inspector.get_table_names()
+    )
+    return True, installed, TENANT_COLUMN in deal_columns
+
+
+async def _detect_state(db) -> Tuple[bool, bool, bool]:
+    key = str(db.get_bind().url)
+    cached = _state.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    try:
+        state = await db.run_sync(lambda session: _detect(session.connection()))
+    except Exception as e:
+        logger.error(f"❌ Could not detect pipeline aggregates: {str(e)}")
+        state = (False, False, False)
+    _state[key] = (time.monotonic() + (STATE_TTL if state[1] else STATE_RETRY_TTL), state)
+    return state
+
+
+# ==================== INCREMENTAL UPDATES ====================
+
+async def apply_deals(db, condition, sign: int) -> bool:
+    """
+    Add (sign=1) or subtract (sign=-1) the deals matching condition, as they
+    are in the database now, in the session's transaction. Call with -1
+    before changing or deleting deals and with +1 after creating or changing
+    them (flush first). Returns False where aggregates aren't installed.
+    """
+    _, installed, has_tenant = await _detect_state(db)
+    if not installed:
+        return False
+
+    stmt = _insert(db.get_bind().dialect.name).from_select(
+        GROUP_COLUMNS + SUM_COLUMNS, _grouped(has_tenant, condition, sign)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(GROUP_COLUMNS),
+        set_={name: pipeline_aggregates.c[name] + stmt.excluded[name] for name in SUM_COLUMNS},
+    )
+    try:
+        await db.execute(stmt)
+    except Exception:
+        # The table may be gone (downgrade, restore): detect again next time
+        _state.pop(str(db.get_bind().url), None)
+        raise
+    return True
+
+
+async def add_deal(db, deal_id: int) -> bool:
+    return await apply_deals(db, DEALS.c.id == deal_id, 1)
+
+
+async def remove_deal(db, deal_id: int) -> bool:
+    return await apply_deals(db, DEALS.c.id == deal_id, -1)
+
+
+async def add_deals(db, deal_ids: Iterable[int]) -> bool:
+    deal_ids = list(deal_ids)
+    return bool(deal_ids) and await apply_deals(db, DEALS.c.id.in_(deal_ids), 1)
+
+
+async def remove_deals(db, deal_ids: Iterable[int]) -> bool:
+    deal_ids = list(deal_ids)
+    return bool(deal_ids) and await apply_deals(db, DEALS.c.id.in_(deal_ids), -1)
+
+
+def bulk_write_hooks() -> Dict[str, Callable]:
+    """
+    before_write / after_write for a BulkUpserter on deals keyed by id:
+    each chunk subtracts the deals it names before writing and adds them
+    back, as written, after - one grouped statement each. Rows that failed
+    are added back unchanged, so rejects leave the totals as they were.
+    """
+    named: List[int] = []
+
+    async def before_write(db, rows):
+        named[:] = [row["id"] for row in rows if row.get("id") is not None]
+        await remove_deals(db, named)
+
+    async def after_write(db, ids):
+        await add_deals(db, set(named) | set(ids))
+
+    return {"before_write": before_write, "after_write": after_write}
+
+
+# ==================== READS ====================
+
+async def pipeline_totals(db, organization_id: Optional[int] = None) -> Totals:
+    """
+    Totals per (organization, stage, status) - one organization's when
+    organization_id is given. Read from the aggregates (one short index
+    range), or by grouping deals where they aren't installed. Empty when
+    deals lacks the aggregated columns.
+    """
+    usable, installed, has_tenant = await _detect_state(db)
+    if not usable:
+        return {}
+    if installed:
+        stmt = select(pipeline_aggregates).where(pipeline_aggregates.c.deal_count != 0)
+        if organization_id is not None:
+            stmt = stmt.where(pipeline_aggregates.c.organization_id == organization_id)
+    else:
+        condition = None
+        if organization_id is not None and has_tenant:
+            condition = column(TENANT_COLUMN) == organization_id
+        stmt = _grouped(has_tenant, condition)
+
+    totals: Totals = {}
+    for row in await db.execute(stmt):
+        totals[(row.organization_id, row.stage, row.status)] = (
+            int(row.deal_count), float(row.value_sum or 0), float(row.probability_sum or 0)
+        )
+    return totals
+
+
+# ==================== RECONCILIATION ====================
+
+def _drifted(stored: Tuple[int, float, float], actual: Tuple[int, float, float]) -> bool:
+    if stored[0] != actual[0]:
+        return True
+    # Float sums pick up rounding error from many +/- deltas; only fix real drift
+    return any(abs(s - a) > 1e-6 * max(1.0, abs(a)) for s, a in zip(stored[1:], actual[1:]))
+
+
+async def reconcile_pipeline_aggregates(db) -> int:
+    """
+    Rebuild the aggregates from deals in the session's transaction (caller
+    commits) and return the number of groups that had drifted. On
+    PostgreSQL the table is locked against deal writers (not readers) so no
+    delta lands between the recount and the fix.
+    """
+    _, installed, has_tenant = await _detect_state(db)
+    if not installed:
+        return 0
+
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(text("LOCK TABLE pipeline_aggregates IN EXCLUSIVE MODE"))
+
+    stored: Totals = {}
+    for row in await db.execute(select(pipeline_aggregates)):
+        stored[(row.organization_id, row.stage, row.status)] = (
+            int(row.deal_count), float(row.value_sum), float(row.probability_sum)
+        )
+    actual: Totals = {}
+    for row in await db.execute(_grouped(has_tenant)):
+        actual[(row.organization_id, row.stage, row.status)] = (
+            int(row.deal_count), float(row.value_sum or 0), float(row.probability_sum or 0)
+        )
+
+    zero = (0, 0.0, 0.0)
+    drifted = [key for key in stored.keys() | actual.keys()
+               if _drifted(stored.get(key, zero), actual.get(key, zero))]
+    for key in drifted:
+        where = [pipeline_aggregates.c[name] == value for name, value in zip(GROUP_COLUMNS, key)]
+        await db.execute(delete(pipeline_aggregates).where(*where))
+        if key in actual:
+            await db.execute(pipeline_aggregates.insert().values(
+                **dict(zip(GROUP_COLUMNS, key)), **dict(zip(SUM_COLUMNS, actual[key]))
+            ))
+    # Groups that emptied out cleanly
+    await db.execute(delete(pipeline_aggregates).where(pipeline_aggregates.c.deal_count == 0))
+
+    if drifted:
+        logger.warning(f"⚠️ Pipeline aggregates drifted in {len(drifted)} group(s); corrected")
+    return len(drifted)
+
+
+class PipelineReconciler:
+    """Reconciles pipeline aggregates on an interval in the background"""
+
+    def __init__(self, session_context: Optional[Callable[[], Any]] = None, interval: float = 900):
+        self.session_context = session_context
+        self.interval = interval
+        self.runs = 0
+        self.corrected = 0
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> int:
+        session_context = self.session_context
+        if session_context is None:
+            from app.core.database import get_db_context
+            session_context = get_db_context
+        try:
+            async with session_context() as db:
+                drifted = await reconcile_pipeline_aggregates(db)
+                await db.commit()
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"❌ Pipeline aggregate reconciliation failed: {str(e)}")
+            return 0
+        self.runs += 1
+        self.corrected += drifted
+        self.last_error = None
+        if drifted:
+            await cache_manager.invalidate_tags(PIPELINE_TAG)
+        return drifted
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        """Start periodic reconciliation (needs a running event loop)"""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"runs": self.runs, "corrected_groups": self.corrected, "last_error": self.last_error}
+
+
+pipeline_reconciler = PipelineReconciler(interval=settings.PIPELINE_RECONCILE_INTERVAL)
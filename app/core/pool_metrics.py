@@ -0,0 +1,365 @@
+"""
+🔌 OmniCRM Ultimate - Connection Pool Telemetry
+===============================================
+✅ Checkout wait histogram - time spent queuing on the pool (pool_timeout)
+✅ Hold time histogram - checkout to checkin, per connection use
+✅ Overflow usage: checkouts beyond pool_size, high-water marks, timeouts
+✅ Top call sites by total hold time (innermost app frame that checked out)
+✅ Slow wait / slow hold warnings naming the call site
+✅ Per-request totals for the request log line
+✅ JSON snapshot + Prometheus text export
+
+Wait is timed around the pool's _do_get (SQLAlchemy has no "started waiting"
+pool event); everything else hangs off the checkout / checkin / connect /
+invalidate pool events. Under asyncio the checkout runs inside SQLAlchemy's
+greenlet, so the call site is looked up in the parent greenlet's frames.
+"""
+
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+import logging
+import os
+import sys
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from app.core.cache_metrics import Histogram
+
+try:
+    import greenlet
+except ImportError:  # pragma: no cover - installed with SQLAlchemy's asyncio support
+    greenlet = None
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds in milliseconds
+WAIT_BUCKETS_MS = (0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000, 30000)
+HOLD_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+MAX_SITES = 500  # distinct call sites tracked per pool; later ones count as "other"
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(APP_ROOT)
+
+
+# ==================== PER-REQUEST USAGE ====================
+
+@dataclass
+class RequestPoolUsage:
+    """Connections one request checked out, and how long it waited / held them"""
+    checkouts: int = 0
+    wait_ms: float = 0.0
+    hold_ms: float = 0.0
+
+    def summary(self) -> str:
+        return f"DB: {self.checkouts} conn, wait {self.wait_ms:.1f}ms, held {self.hold_ms:.1f}ms"
+
+
+_request_usage: ContextVar[Optional[RequestPoolUsage]] = ContextVar("pool_request_usage", default=None)
+
+
+def track_request() -> RequestPoolUsage:
+    """Collect pool usage for the current request (see LoggingMiddleware)"""
+    usage = RequestPoolUsage()
+    _request_usage.set(usage)
+    return usage
+
+
+# ==================== CALL SITES ====================
+
+def _frames() -> Iterator:
+    frame = sys._getframe(2)
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+    # The awaiting application code is suspended in the parent greenlet
+    current = greenlet.getcurrent() if greenlet is not None else None
+    parent = current.parent if current is not None else None
+    frame = parent.gr_frame if parent is not None else None
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+
+
+def call_site() -> str:
+    """'app/services/crm_service.py:123 get_pipeline_stats' - the innermost app frame"""
+    for frame in _frames():
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_ROOT) and filename != __file__:
+            return f"{os.path.relpath(filename, PROJECT_ROOT)}:{frame.f_lineno} {frame.f_code.co_name}"
+    return "unknown"
+
+
+class SiteStats:
+    """Checkouts made from one call site"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_ms = 0.0
+        self.hold_ms = 0.0
+        self.max_hold_ms = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "total_hold_ms": round(self.hold_ms, 1),
+            "avg_hold_ms": round(self.hold_ms / self.checkouts, 2) if self.checkouts else None,
+            "max_hold_ms": round(self.max_hold_ms, 1),
+            "total_wait_ms": round(self.wait_ms, 1),
+        }
+
+
+# ==================== POOL METRICS ====================
+
+class PoolMetrics:
+    """Telemetry for one engine's pool, fed by pool events"""
+
+    def __init__(self, name: str, slow_wait_ms: float = 100, slow_hold_ms: float = 5000, trace_sites: bool = True):
+        self.name = name
+        self.slow_wait_ms = slow_wait_ms
+        self.slow_hold_ms = slow_hold_ms
+        self.trace_sites = trace_sites
+        self.pool = None
+        self.reset()
+
+    def reset(self):
+        self.wait = Histogram(WAIT_BUCKETS_MS)
+        self.hold = Histogram(HOLD_BUCKETS_MS)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.overflow_checkouts = 0
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+        self.sites: Dict[str, SiteStats] = {}
+
+    def _site(self, site: str) -> SiteStats:
+        stats = self.sites.get(site)
+        if stats is None:
+            if len(self.sites) >= MAX_SITES:
+                site = "other"
+                stats = self.sites.get(site)
+            if stats is None:
+                stats = self.sites[site] = SiteStats()
+        return stats
+
+    def _pool_status(self) -> dict:
+        pool = self.pool
+        if not isinstance(pool, AsyncAdaptedQueuePool):
+            return {"class": type(pool).__name__ if pool is not None else None}
+        return {
+            "class": type(pool).__name__,
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        }
+
+    # ---------- event handlers ----------
+
+    def on_timeout(self, waited: float):
+        self.timeouts += 1
+        site = call_site() if self.trace_sites else "unknown"
+        logger.error(
+            f"❌ [{self.name}] No DB connection after {waited:.1f}s at {site} "
+            f"(pool: {self._pool_status()})"
+        )
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        wait_ms = connection_record.info.pop("pool_wait_ms", 0.0)
+        site = call_site() if self.trace_sites else "unknown"
+        usage = _request_usage.get()
+
+        self.checkouts += 1
+        self.wait.observe(wait_ms)
+        stats = self._site(site)
+        stats.checkouts += 1
+        stats.wait_ms += wait_ms
+        if usage is not None:
+            usage.checkouts += 1
+            usage.wait_ms += wait_ms
+
+        pool = self.pool
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            checked_out = pool.checkedout()
+            overflow = max(checked_out - pool.size(), 0)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+            self.peak_overflow = max(self.peak_overflow, overflow)
+            if overflow:
+                self.overflow_checkouts += 1
+
+        if wait_ms >= self.slow_wait_ms:
+            logger.warning(
+                f"⚠️ [{self.name}] Waited {wait_ms:.0f}ms for a DB connection at {site} "
+                f"(pool: {self._pool_status()})"
+            )
+
+        connection_record.info["pool_checkout"] = (time.perf_counter(), stats, site, usage)
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        if connection_record is None:
+            return
+        checkout = connection_record.info.pop("pool_checkout", None)
+        if checkout is None:
+            return
+        started, stats, site, usage = checkout
+        hold_ms = (time.perf_counter() - started) * 1000
+
+        self.hold.observe(hold_ms)
+        stats.hold_ms += hold_ms
+        stats.max_hold_ms = max(stats.max_hold_ms, hold_ms)
+        if usage is not None:
+            usage.hold_ms += hold_ms
+
+        if hold_ms >= self.slow_hold_ms:
+            logger.warning(f"⚠️ [{self.name}] Held a DB connection for {hold_ms / 1000:.1f}s at {site}")
+
+    def on_connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        self.invalidations += 1
+
+    # ---------- export ----------
+
+    def top_sites(self, limit: int = 10) -> List[dict]:
+        """Call sites holding connections longest in total"""
+        ranked = sorted(self.sites.items(), key=lambda item: item[1].hold_ms, reverse=True)
+        return [{"site": site, **stats.to_dict()} for site, stats in ranked[:limit]]
+
+    def snapshot(self, top: int = 10) -> dict:
+        return {
+            "pool": self._pool_status(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "overflow_checkouts": self.overflow_checkouts,
+            "peak_checked_out": self.peak_checked_out,
+            "peak_overflow": self.peak_overflow,
+            "wait": self.wait.to_dict(),
+            "hold": self.hold.to_dict(),
+            "top_sites": self.top_sites(top),
+        }
+
+
+# ==================== INSTRUMENTED POOLS ====================
+
+class _TimedGetMixin:
+    """Times the pool's _do_get - queuing for a free slot plus any new connect"""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.on_timeout(time.perf_counter() - started)
+            raise
+        record.info["pool_wait_ms"] = (time.perf_counter() - started) * 1000
+        return record
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; events carry over, metrics must too
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        if self.metrics is not None:
+            self.metrics.pool = pool
+        return pool
+
+
+class InstrumentedQueuePool(_TimedGetMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool with checkout wait timing"""
+
+
+class InstrumentedNullPool(_TimedGetMixin, NullPool):
+    """NullPool with connect timing (SQLite)"""
+
+
+# ==================== REGISTRY ====================
+
+pool_metrics: Dict[str, PoolMetrics] = {}
+
+
+def instrument_engine(engine, name: str, **options) -> PoolMetrics:
+    """Attach telemetry to an engine (async or sync) and register it under name"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    pool = sync_engine.pool
+    metrics = PoolMetrics(name, **options)
+    metrics.pool = pool
+    if isinstance(pool, _TimedGetMixin):
+        pool.metrics = metrics
+
+    event.listen(pool, "checkout", metrics.on_checkout)
+    event.listen(pool, "checkin", metrics.on_checkin)
+    event.listen(pool, "connect", metrics.on_connect)
+    event.listen(pool, "invalidate", metrics.on_invalidate)
+
+    pool_metrics[name] = metrics
+    return metrics
+
+
+def snapshot(top: int = 10) -> dict:
+    return {name: metrics.snapshot(top) for name, metrics in sorted(pool_metrics.items())}
+
+
+def _histogram_lines(metric: str, label: str, hist: Histogram) -> List[str]:
+    lines = []
+    running = 0
+    for bound, count in zip(hist.buckets, hist.counts):
+        running += count
+        lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {running}')
+    lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {hist.count}')
+    lines.append(f'{metric}_sum{{{label}}} {round(hist.total, 3)}')
+    lines.append(f'{metric}_count{{{label}}} {hist.count}')
+    return lines
+
+
+def to_prometheus(namespace: str = "omnicrm_db_pool") -> str:
+    """Render all pools' counters and histograms in Prometheus text format"""
+    lines: List[str] = []
+    pools = sorted(pool_metrics.items())
+
+    counters = (
+        ("checkouts_total", "Connections checked out", lambda m: m.checkouts),
+        ("timeouts_total", "Checkouts that hit pool_timeout", lambda m: m.timeouts),
+        ("connects_total", "New DBAPI connections opened", lambda m: m.connects),
+        ("invalidations_total", "Connections invalidated", lambda m: m.invalidations),
+        ("overflow_checkouts_total", "Checkouts beyond pool_size", lambda m: m.overflow_checkouts),
+    )
+    for name, help_text, getter in counters:
+        lines.append(f"# HELP {namespace}_{name} {help_text}")
+        lines.append(f"# TYPE {namespace}_{name} counter")
+        for pool, metrics in pools:
+            lines.append(f'{namespace}_{name}{{pool="{pool}"}} {getter(metrics)}')
+
+    gauges = (
+        ("checked_out", "Connections currently checked out", "checked_out"),
+        ("overflow", "Overflow connections currently open", "overflow"),
+    )
+    for name, help_text, key in gauges:
+        lines.append(f"# HELP {namespace}_{name} {help_text}")
+        lines.append(f"# TYPE {namespace}_{name} gauge")
+        for pool, metrics in pools:
+            status = metrics._pool_status()
+            if key in status:
+                lines.append(f'{namespace}_{name}{{pool="{pool}"}} {status[key]}')
+
+    for name, help_text, attr in (
+        ("wait_ms", "Time waiting for a connection in milliseconds", "wait"),
+        ("hold_ms", "Time a connection is held, checkout to checkin, in milliseconds", "hold"),
+    ):
+        metric = f"{namespace}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for pool, metrics in pools:
+            lines.extend(_histogram_lines(metric, f'pool="{pool}"', getattr(metrics, attr)))
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,300 @@
+"""
+🔎 OmniCRM Ultimate - Customer Full-Text Search
+===============================================
+✅ PostgreSQL: generated tsvector column + GIN, ranked with ts_rank_cd
+✅ Arabic + English: letter-form folding, english/arabic stemming, prefix matching
+✅ Fuzzy email / phone matching on pg_trgm GIN indexes (digits-only phones)
+✅ SQLite: FTS5 tables (unicode61 words + trigram contacts) kept in sync by triggers
+✅ Falls back to ILIKE where neither is installed
+
+Search never scans the customers table: word queries hit the inverted
+index, email/phone fragments hit trigram indexes. Indexes are maintained
+by the database itself (generated column / triggers), so every write path
+- ORM, bulk upserts, raw SQL - keeps them current.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from sqlalchemy import column, func, literal, literal_column, or_, select, table, text
+from sqlalchemy.sql import Select
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== NORMALIZATION ====================
+
+# Alef/ya/taa-marbuta variants fold to one form; harakat and tatweel drop
+_ARABIC_FOLD = {"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه"}
+_ARABIC_STRIP = "ًٌٍَُِّْـٰ"
+
+_ARABIC_TABLE = str.maketrans({**_ARABIC_FOLD, **{ch: None for ch in _ARABIC_STRIP}})
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_PHONE_RE = re.compile(r"[\d\s()+\-.]+")
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Lowercase and fold Arabic letter variants (matches the SQL-side folding)"""
+    return (value or "").lower().translate(_ARABIC_TABLE)
+
+
+def tokenize(query: str) -> List[str]:
+    return _TOKEN_RE.findall(normalize_text(query))
+
+
+def phone_digits(value: str) -> str:
+    """Digits only, without a leading trunk/international zero"""
+    return re.sub(r"\D", "", value).lstrip("0")
+
+
+def classify_query(query: str) -> Tuple[str, str]:
+    """("email" | "phone" | "words", search term)"""
+    query = query.strip()
+    if "@" in query:
+        return "email", query.lower()
+    if _PHONE_RE.fullmatch(query) and len(phone_digits(query)) >= 3:
+        return "phone", phone_digits(query)
+    return "words", query
+
+
+def _sqlite_normalize(expr: str) -> str:
+    """SQL replace() chain equivalent to normalize_text (case folding is the tokenizer's job)"""
+    for source, target in list(_ARABIC_FOLD.items()) + [(ch, "") for ch in _ARABIC_STRIP]:
+        expr = f"replace({expr}, '{source}', '{target}')"
+    return expr
+
+
+def _sqlite_digits(expr: str) -> str:
+    for ch in " -+().":
+        expr = f"replace({expr}, '{ch}', '')"
+    return expr
+
+
+# ==================== DDL ====================
+
+_PG_FOLD_FROM = "".join(_ARABIC_FOLD) + _ARABIC_STRIP
+_PG_FOLD_TO = "".join(_ARABIC_FOLD.values())
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"""
+    CREATE OR REPLACE FUNCTION crm_search_normalize(value text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT translate(lower(coalesce(value, '')), '{_PG_FOLD_FROM}', '{_PG_FOLD_TO}')
+    $$
+    """,
+    # Generated column: recomputed by Postgres on every insert/update
+    """
+    ALTER TABLE customers ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple'::regconfig, crm_search_normalize(name)), 'A')
+        || setweight(to_tsvector('simple'::regconfig, crm_search_normalize(company)), 'B')
+        || setweight(to_tsvector('english'::regconfig,
+               coalesce(name, '') || ' ' || coalesce(company, '')), 'C')
+        || setweight(to_tsvector('arabic'::regconfig,
+               crm_search_normalize(name) || ' ' || crm_search_normalize(company)), 'C')
+        || setweight(to_tsvector('simple'::regconfig, coalesce(email, '')), 'D')
+    ) STORED
+    """,
+]
+
+POSTGRES_INDEXES = [
+    "CREATE INDEX {concurrently} IF NOT EXISTS idx_customers_search_vector "
+    "ON customers USING gin (search_vector)",
+    "CREATE INDEX {concurrently} IF NOT EXISTS idx_customers_email_trgm "
+    "ON customers USING gin (lower(email) gin_trgm_ops)",
+    "CREATE INDEX {concurrently} IF NOT EXISTS idx_customers_phone_digits_trgm "
+    "ON customers USING gin ((ltrim(regexp_replace(phone, '[^0-9]', '', 'g'), '0')) gin_trgm_ops)",
+]
+
+_SQLITE_WORDS = {
+    "name": _sqlite_normalize("coalesce({row}.name, '')"),
+    "company": _sqlite_normalize("coalesce({row}.company, '')"),
+    "email": "coalesce({row}.email, '')",
+}
+_SQLITE_CONTACT = {
+    "email": "lower(coalesce({row}.email, ''))",
+    "phone": "ltrim(" + _sqlite_digits("coalesce({row}.phone, '')") + ", '0')",
+}
+
+
+def _fts_values(columns: Dict[str, str], row: str) -> str:
+    return ", ".join(expr.format(row=row) for expr in columns.values())
+
+
+def _fts_sync(fts: str, columns: Dict[str, str], row: str, delete: bool = False) -> str:
+    names = ", ".join(columns)
+    if delete:
+        return (f"INSERT INTO {fts}({fts}, rowid, {names}) "
+                f"VALUES ('delete', {row}.id, {_fts_values(columns, row)});")
+    return f"INSERT INTO {fts}(rowid, {names}) VALUES ({row}.id, {_fts_values(columns, row)});"
+
+
+def _sqlite_triggers() -> List[str]:
+    tables = [("customers_fts", _SQLITE_WORDS), ("customers_contact_fts", _SQLITE_CONTACT)]
+    insert = " ".join(_fts_sync(fts, cols, "new") for fts, cols in tables)
+    delete = " ".join(_fts_sync(fts, cols, "old", delete=True) for fts, cols in tables)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS customers_search_ai AFTER INSERT ON customers BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS customers_search_ad AFTER DELETE ON customers BEGIN {delete} END",
+        "CREATE TRIGGER IF NOT EXISTS customers_search_au "
+        f"AFTER UPDATE OF name, company, email, phone ON customers BEGIN {delete} {insert} END",
+    ]
+
+
+# Contentless tables: the index only stores postings, rows stay in customers
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5("
+    "name, company, email, content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS customers_contact_fts USING fts5("
+    "email, phone, content='', tokenize='trigram')",
+    *_sqlite_triggers(),
+]
+
+SQLITE_BACKFILL = [
+    f"INSERT INTO customers_fts(rowid, {', '.join(_SQLITE_WORDS)}) "
+    f"SELECT c.id, {_fts_values(_SQLITE_WORDS, 'c')} FROM customers c",
+    f"INSERT INTO customers_contact_fts(rowid, {', '.join(_SQLITE_CONTACT)}) "
+    f"SELECT c.id, {_fts_values(_SQLITE_CONTACT, 'c')} FROM customers c",
+]
+
+
+def install_customer_search(connection, concurrently: bool = False):
+    """
+    Create search indexes for the connection's dialect (idempotent)
+
+    Takes a sync Connection: use conn.run_sync(install_customer_search)
+    from async code, or op.get_bind() in a migration.
+    """
+    dialect = connection.dialect.name
+
+    if dialect == "postgresql":
+        for statement in POSTGRES_DDL:
+            connection.execute(text(statement))
+        for statement in POSTGRES_INDEXES:
+            connection.execute(text(statement.format(concurrently="CONCURRENTLY" if concurrently else "")))
+        logger.info("🔎 Customer search installed (tsvector + trigram)")
+
+    elif dialect == "sqlite":
+        existed = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'customers_fts'")
+        ).first()
+        for statement in SQLITE_DDL:
+            connection.execute(text(statement))
+        if not existed:
+            for statement in SQLITE_BACKFILL:
+                connection.execute(text(statement))
+        logger.info("🔎 Customer search installed (FTS5)")
+
+    else:
+        logger.info(f"ℹ️ No full-text search for {dialect}; using ILIKE")
+
+    _installed.clear()
+
+
+# ==================== QUERYING ====================
+
+# engine URL -> whether the search objects exist
+_installed: Dict[str, bool] = {}
+
+
+async def search_mode(db: Any) -> str:
+    """"postgresql", "sqlite" or "ilike" for the session's database"""
+    bind = db.get_bind()
+    dialect = bind.dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        return "ilike"
+
+    key = str(bind.url)
+    if key not in _installed:
+        try:
+            if dialect == "postgresql":
+                probe = text(
+                    "SELECT 1 FROM information_schema.columns "
+                    "WHERE table_name = 'customers' AND column_name = 'search_vector'"
+                )
+            else:
+                probe = text("SELECT 1 FROM sqlite_master WHERE name = 'customers_fts'")
+            _installed[key] = (await db.execute(probe)).first() is not None
+        except Exception as e:
+            logger.error(f"❌ Could not detect customer search indexes: {str(e)}")
+            return "ilike"
+
+    return dialect if _installed[key] else "ilike"
+
+
+def _fts5_words(tokens: List[str]) -> str:
+    # Tokens are \w+ only, so quoting needs no escaping; "x"* is a prefix match
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _ilike(customer, query: str):
+    return or_(
+        customer.name.ilike(f"%{query}%"),
+        customer.email.ilike(f"%{query}%"),
+        customer.phone.ilike(f"%{query}%"),
+        customer.company.ilike(f"%{query}%"),
+    )
+
+
+def apply_customer_search(stmt: Select, customer, query: str, mode: str) -> Tuple[Select, Any]:
+    """
+    Restrict stmt to customers matching query
+
+    Returns (statement, rank expression); higher rank = more relevant.
+    """
+    kind, term = classify_query(query)
+
+    if mode == "postgresql":
+        if kind == "email":
+            email = func.lower(customer.email)
+            return stmt.where(email.contains(term, autoescape=True)), func.similarity(email, term)
+        if kind == "phone":
+            digits = func.ltrim(
+                func.regexp_replace(customer.phone, literal_column("'[^0-9]'"),
+                                    literal_column("''"), literal_column("'g'")),
+                literal_column("'0'"),
+            )
+            return stmt.where(digits.contains(term, autoescape=True)), func.similarity(digits, term)
+
+        tokens = tokenize(term)
+        if not tokens:
+            return stmt.where(literal(False)), literal(0.0)
+        vector = literal_column("customers.search_vector")
+        tsquery = (
+            func.to_tsquery(literal_column("'simple'::regconfig"), " & ".join(f"{t}:*" for t in tokens))
+            .op("||")(func.plainto_tsquery(literal_column("'english'::regconfig"), term))
+            .op("||")(func.plainto_tsquery(literal_column("'arabic'::regconfig"), normalize_text(term)))
+        )
+        return stmt.where(vector.op("@@")(tsquery)), func.ts_rank_cd(vector, tsquery)
+
+    if mode == "sqlite":
+        if kind in ("email", "phone"):
+            # Trigram MATCH needs 3+ characters
+            if len(term) < 3:
+                return stmt.where(_ilike(customer, query)), literal(0.0)
+            fts_name = "customers_contact_fts"
+            match = '"' + term.replace('"', '""') + '"'
+            weights = "1.0, 1.0"
+        else:
+            tokens = tokenize(term)
+            if not tokens:
+                return stmt.where(literal(False)), literal(0.0)
+            fts_name = "customers_fts"
+            match = _fts5_words(tokens)
+            weights = "10.0, 5.0, 1.0"  # name, company, email
+
+        fts = table(fts_name, column("rowid"))
+        hits = (
+            select(
+                fts.c.rowid.label("customer_id"),
+                literal_column(f"-bm25({fts_name}, {weights})").label("rank"),
+            )
+            .where(literal_column(fts_name).op("MATCH")(match))
+            .subquery(f"{fts_name}_hits")
+        )
+        return stmt.join(hits, hits.c.customer_id == customer.id), hits.c.rank
+
+    return stmt.where(_ilike(customer, query)), literal(0.0)
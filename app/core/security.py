@@ -388,7 +388,7 @@ def verify_csrf_token(token: str, expected: str) -> bool:
 
 # ========== Rate Limiting ==========
 class RateLimiter:
-    """Simple rate limiter using Redis"""
+    """Simple rate limiter on the shared cache backend"""
     
     def __init__(self):
         self.prefix = "ratelimit:"
@@ -403,21 +403,18 @@ class RateLimiter:
         Check if request is allowed
         Returns: (is_allowed, remaining_requests)
         """
-        from app.core.cache import cache
-        
-        rate_key = f"{self.prefix}{key}"
-        
-        current = await cache.get(rate_key)
+        from app.core.cache import cache_manager, RateLimiter as BackendRateLimiter
         
-        if current is None:
-            await cache.set(rate_key, 1, window)
-            return True, max_requests - 1
+        if not cache_manager.backend:
+            return True, max_requests
         
-        if current >= max_requests:
-            return False, 0
-        
-        await cache.increment(rate_key)
-        return True, max_requests - current - 1
+        # One atomic check instead of GET + SET/INCR, which raced
+        allowed, info = await BackendRateLimiter(cache_manager.backend).is_allowed(
+            f"{self.prefix}{key}",
+            max_requests,
+            window
+        )
+        return allowed, info.get("remaining", max_requests)
 
 
 # Global rate limiter
@@ -429,14 +426,16 @@ class IPFilter:
     """IP filtering for security"""
     
     @staticmethod
-    def is_ip_whitelisted(ip: str, whitelist: list) -> bool:
-        """Check if IP is in whitelist"""
-        return ip in whitelist
+    def is_ip_whitelisted(ip: str, whitelist) -> bool:
+        """Check if IP is in whitelist (IPs / CIDRs, or a compiled IPNetworkSet)"""
+        from app.core.ip_filter import as_network_set
+        return ip in as_network_set(whitelist)
     
     @staticmethod
-    def is_ip_blacklisted(ip: str, blacklist: list) -> bool:
-        """Check if IP is in blacklist"""
-        return ip in blacklist
+    def is_ip_blacklisted(ip: str, blacklist) -> bool:
+        """Check if IP is in blacklist (IPs / CIDRs, or a compiled IPNetworkSet)"""
+        from app.core.ip_filter import as_network_set
+        return ip in as_network_set(blacklist)
     
     @staticmethod
     async def log_suspicious_ip(ip: str, reason: str):
@@ -3,7 +3,7 @@ OmniCRM God Mode - Main Application Entry Point
 FastAPI Application for AI-Powered Sales OS
 """
 
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
@@ -13,9 +13,14 @@ from pathlib import Path
 
 # Import routers
 from app.api.v1 import router as api_v1_router
+from app.api.dependencies import get_current_active_superuser
+from app.api.routes.metrics import router as metrics_router
 from app.core.config import settings
-from app.middleware.error_handler import error_handler_middleware
-from app.middleware.logging_middleware import logging_middleware
+from app.core.cache import cache_manager, warm_cache_on_startup
+from app.core.cache_warming import cache_warmer
+from app.core.pipeline_aggregates import pipeline_reconciler
+from app.services.import_service import import_manager
+from app.middleware.pipeline import install_pipeline, ip_blocklist
 
 # Configure logging
 logging.basicConfig(
@@ -47,9 +52,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Custom Middleware
-app.middleware("http")(error_handler_middleware)
-app.middleware("http")(logging_middleware)
+# Custom Middleware (pure-ASGI pipeline: logging -> errors -> optional security)
+install_pipeline(app)
 
 # Mount static files (if exists)
 static_path = Path(__file__).parent.parent / "static"
@@ -79,6 +83,25 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check(wait: bool = False):
+    """
+    Readiness probe - fails until critical cache warmers have run
+    
+    Answers at once by default, as probes expect; ?wait=true holds the
+    request up to CACHE_WARM_READY_TIMEOUT seconds for warming to finish.
+    """
+    if wait:
+        ready = await cache_warmer.wait_until_ready(timeout=settings.CACHE_WARM_READY_TIMEOUT)
+    else:
+        ready = cache_warmer.is_ready
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "warming", **cache_warmer.get_report()}
+    )
+
+
 @app.get("/api/v1/status")
 async def api_status():
     """API status endpoint"""
@@ -98,6 +121,11 @@ async def api_status():
 # Include API routers (when available)
 try:
     app.include_router(api_v1_router, prefix="/api/v1")
+    # Operational metrics are admin-only unless the deployment keeps them internal
+    app.include_router(
+        metrics_router, prefix="/api/v1",
+        dependencies=[] if settings.METRICS_PUBLIC else [Depends(get_current_active_superuser)]
+    )
     logger.info("API v1 router included successfully")
 except Exception as e:
     logger.warning(f"Could not include API v1 router: {e}")
@@ -110,6 +138,20 @@ async def startup_event():
     """Application startup tasks"""
     logger.info("🚀 OmniCRM God Mode is starting...")
     logger.info(f"Environment: {getattr(settings, 'ENVIRONMENT', 'production')}")
+    
+    # Falls back to the in-process backend without Redis
+    await cache_manager.connect()
+    
+    if settings.CACHE_WARM_ON_STARTUP:
+        try:
+            from app.services.cache_warmers import register_default_warmers
+            register_default_warmers()
+        except Exception as e:
+            logger.warning(f"Could not register cache warmers: {e}")
+        await warm_cache_on_startup()
+    
+    pipeline_reconciler.start()
+    
     logger.info("✅ Application started successfully!")
 
 
@@ -118,6 +160,11 @@ async def startup_event():
 async def shutdown_event():
     """Application shutdown tasks"""
     logger.info("🛑 OmniCRM God Mode is shutting down...")
+    await cache_warmer.stop()
+    await pipeline_reconciler.stop()
+    await import_manager.stop()
+    await ip_blocklist.stop()
+    await cache_manager.disconnect()
     logger.info("✅ Shutdown completed successfully!")
 
 
@@ -4,26 +4,47 @@ Error Handler Middleware
 
 from fastapi import Request
 from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
 import traceback
 
 logger = logging.getLogger(__name__)
 
 
-async def error_handler_middleware(request: Request, call_next):
-    """Global error handler middleware"""
-    try:
-        response = await call_next(request)
-        return response
-    except Exception as e:
-        logger.error(f"Unhandled exception: {e}")
-        logger.error(traceback.format_exc())
+class ErrorHandlerMiddleware:
+    """Global error handler middleware (pure ASGI)"""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
         
-        return JSONResponse(
-            status_code=500,
-            content={
-                "error": "Internal Server Error",
-                "message": str(e),
-                "path": str(request.url)
-            }
-        )
+        response_started = False
+        
+        async def send_tracking(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_tracking)
+        except Exception as e:
+            logger.error(f"Unhandled exception: {e}")
+            logger.error(traceback.format_exc())
+            
+            # Too late for an error body once headers are on the wire
+            if response_started:
+                raise
+            
+            response = JSONResponse(
+                status_code=500,
+                content={
+                    "error": "Internal Server Error",
+                    "message": str(e),
+                    "path": str(Request(scope).url)
+                }
+            )
+            await response(scope, receive, send)
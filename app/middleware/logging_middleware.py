@@ -2,31 +2,51 @@
 Logging Middleware
 """
 
-from fastapi import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
 import time
 
+from app.core.pool_metrics import track_request
+
 logger = logging.getLogger(__name__)
 
 
-async def logging_middleware(request: Request, call_next):
-    """Log all requests"""
-    start_time = time.time()
-    
-    # Log request
-    logger.info(f"➡️  {request.method} {request.url.path}")
-    
-    # Process request
-    response = await call_next(request)
-    
-    # Calculate duration
-    duration = time.time() - start_time
+class LoggingMiddleware:
+    """Log all requests (pure ASGI; duration covers the full response body)"""
     
-    # Log response
-    logger.info(
-        f"⬅️  {request.method} {request.url.path} "
-        f"- Status: {response.status_code} "
-        f"- Duration: {duration:.3f}s"
-    )
+    def __init__(self, app: ASGIApp):
+        self.app = app
     
-    return response
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        start_time = time.perf_counter()
+        method, path = scope["method"], scope["path"]
+        status_code = 500
+        pool_usage = track_request()
+        
+        # Log request
+        logger.info(f"➡️  {method} {path}")
+        
+        async def send_logging(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            # Process request
+            await self.app(scope, receive, send_logging)
+        finally:
+            # Calculate duration
+            duration = time.perf_counter() - start_time
+            
+            # Log response (with DB pool usage when the request touched the database)
+            db_usage = f" - {pool_usage.summary()}" if pool_usage.checkouts else ""
+            logger.info(
+                f"⬅️  {method} {path} "
+                f"- Status: {status_code} "
+                f"- Duration: {duration:.3f}s"
+                f"{db_usage}"
+            )
@@ -7,33 +7,53 @@
 ✅ Request Validation
 ✅ IP Whitelisting/Blacklisting
 ✅ DDoS Protection
+
+All middlewares are pure ASGI: they inspect the scope, answer early with
+a response or pass the original receive/send through untouched, so
+streaming responses keep streaming. Compose them with
+app.middleware.pipeline.
 """
 
-from fastapi import Request, HTTPException, status
+from fastapi import Request, status
+from starlette.exceptions import HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from datetime import datetime, timedelta
 import hashlib
 import secrets
 from typing import Optional, Dict, List
 import logging
 
-from app.core.cache import cache_manager, RateLimiter
+from app.core.cache import cache_manager, RateLimiter, HybridRateLimiter
+from app.core.cache_backends import RedisBackend
+from app.core.ip_filter import IPBlocklist, IPNetworkSet
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+def client_ip(scope: Scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else ""
+
+
+class RateLimitMiddleware:
     """
     Multi-tier rate limiting:
     - IP-based: 100 req/min for anonymous
     - User-based: 1000 req/min for authenticated
     - Endpoint-specific: Custom limits for expensive operations
+    
+    With Redis, generous limits are pre-filtered by per-worker token
+    buckets (HybridRateLimiter) so most requests skip the round trip;
+    strict endpoints and small limits always get an exact Redis check.
     """
     
-    def __init__(self, app, redis_client=None):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, redis_client=None):
+        self.app = app
         self.rate_limiter = RateLimiter(redis_client) if redis_client else None
+        self.local_limiter: Optional[HybridRateLimiter] = None
         
         # Default limits
         self.default_limits = {
@@ -52,19 +72,52 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             "/api/auth/login": (5, 300),  # 5 attempts per 5 minutes
             "/api/auth/register": (3, 3600),  # 3 registrations per hour
         }
+        
+        # Never admitted from local buckets, whatever their limit
+        self.strict_paths = {"/api/auth/login", "/api/auth/register"}
     
-    async def dispatch(self, request: Request, call_next):
+    def _get_limiter(self, path: str, max_requests: int):
+        """Exact limiter for strict paths / small limits, local pre-filter otherwise"""
+        if (
+            self.local_limiter is None
+            and settings.RATE_LIMIT_LOCAL_ENABLED
+            and isinstance(self.rate_limiter.backend, RedisBackend)
+        ):
+            self.local_limiter = HybridRateLimiter(
+                self.rate_limiter,
+                local_fraction=settings.RATE_LIMIT_LOCAL_FRACTION,
+                sync_interval=settings.RATE_LIMIT_SYNC_INTERVAL
+            )
+        
+        if (
+            self.local_limiter is None
+            or path in self.strict_paths
+            or max_requests < settings.RATE_LIMIT_LOCAL_MIN_LIMIT
+        ):
+            return self.rate_limiter
+        return self.local_limiter
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        if not self.rate_limiter and cache_manager.backend:
+            # No dedicated client: share the cache backend (Redis or in-process)
+            self.rate_limiter = RateLimiter(cache_manager.backend)
+        
         if not self.rate_limiter:
-            return await call_next(request)
+            return await self.app(scope, receive, send)
         
         # Skip rate limiting for health checks
-        if request.url.path in ["/health", "/api/health"]:
-            return await call_next(request)
+        path = scope["path"]
+        if path in ["/health", "/api/health"]:
+            return await self.app(scope, receive, send)
         
         try:
             # Determine rate limit tier
-            user_id = getattr(request.state, "user_id", None)
-            is_admin = getattr(request.state, "is_admin", False)
+            state = scope.get("state") or {}
+            user_id = state.get("user_id")
+            is_admin = state.get("is_admin", False)
             
             if is_admin:
                 max_requests, window = self.default_limits["admin"]
@@ -74,72 +127,81 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                 max_requests, window = self.default_limits["anonymous"]
             
             # Apply endpoint-specific limits
-            if request.url.path in self.endpoint_limits:
-                max_requests, window = self.endpoint_limits[request.url.path]
+            if path in self.endpoint_limits:
+                max_requests, window = self.endpoint_limits[path]
             
             # Create rate limit key
             if user_id:
-                rate_key = f"rate_limit:user:{user_id}:{request.url.path}"
+                rate_key = f"rate_limit:user:{user_id}:{path}"
             else:
-                client_ip = request.client.host
-                rate_key = f"rate_limit:ip:{client_ip}:{request.url.path}"
+                rate_key = f"rate_limit:ip:{client_ip(scope)}:{path}"
             
             # Check rate limit
-            allowed, info = await self.rate_limiter.is_allowed(
+            limiter = self._get_limiter(path, max_requests)
+            allowed, info = await limiter.is_allowed(
                 rate_key,
                 max_requests,
                 window
             )
             
-            if not allowed:
-                logger.warning(
-                    f"Rate limit exceeded: {rate_key}",
-                    extra={
-                        "event": "rate_limit_exceeded",
-                        "key": rate_key,
-                        "limit": max_requests,
-                        "window": window
-                    }
-                )
-                
-                return JSONResponse(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    content={
-                        "error": "Rate limit exceeded",
-                        "message": f"Too many requests. Try again in {info.get('reset', window)} seconds.",
-                        "retry_after": info.get('reset', window)
-                    },
-                    headers={
-                        "X-RateLimit-Limit": str(info.get("limit", max_requests)),
-                        "X-RateLimit-Remaining": str(info.get("remaining", 0)),
-                        "X-RateLimit-Reset": str(info.get("reset", window)),
-                        "Retry-After": str(info.get("reset", window))
-                    }
-                )
-            
-            # Add rate limit headers to response
-            response = await call_next(request)
-            response.headers["X-RateLimit-Limit"] = str(info.get("limit", max_requests))
-            response.headers["X-RateLimit-Remaining"] = str(info.get("remaining", max_requests - 1))
-            response.headers["X-RateLimit-Reset"] = str(info.get("reset", window))
-            
-            return response
-            
         except Exception as e:
             logger.error(f"Rate limiting error: {str(e)}")
             # Fail open (allow request)
-            return await call_next(request)
+            return await self.app(scope, receive, send)
+        
+        if not allowed:
+            logger.warning(
+                f"Rate limit exceeded: {rate_key}",
+                extra={
+                    "event": "rate_limit_exceeded",
+                    "key": rate_key,
+                    "limit": max_requests,
+                    "window": window
+                }
+            )
+            
+            response = JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={
+                    "error": "Rate limit exceeded",
+                    "message": f"Too many requests. Try again in {info.get('reset', window)} seconds.",
+                    "retry_after": info.get('reset', window)
+                },
+                headers={
+                    "X-RateLimit-Limit": str(info.get("limit", max_requests)),
+                    "X-RateLimit-Remaining": str(info.get("remaining", 0)),
+                    "X-RateLimit-Reset": str(info.get("reset", window)),
+                    "Retry-After": str(info.get("reset", window))
+                }
+            )
+            return await response(scope, receive, send)
+        
+        # Add rate limit headers to response
+        rate_headers = {
+            "X-RateLimit-Limit": str(info.get("limit", max_requests)),
+            "X-RateLimit-Remaining": str(info.get("remaining", max_requests - 1)),
+            "X-RateLimit-Reset": str(info.get("reset", window))
+        }
+        
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in rate_headers.items():
+                    headers[name] = value
+            await send(message)
+        
+        await self.app(scope, receive, send_with_headers)
 
 
-class CSRFProtectionMiddleware(BaseHTTPMiddleware):
+class CSRFProtectionMiddleware:
     """
     CSRF protection for state-changing operations
     - Double-submit cookie pattern
     - Token validation for POST/PUT/DELETE/PATCH
     """
     
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp):
+        self.app = app
         self.safe_methods = ["GET", "HEAD", "OPTIONS"]
         self.exempt_paths = [
             "/api/auth/login",
@@ -150,69 +212,88 @@ class CSRFProtectionMiddleware(BaseHTTPMiddleware):
             "/openapi.json"
         ]
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
         # Skip CSRF for safe methods
-        if request.method in self.safe_methods:
-            return await call_next(request)
+        if scope["method"] in self.safe_methods:
+            return await self.app(scope, receive, send)
         
         # Skip CSRF for exempt paths
-        if any(request.url.path.startswith(path) for path in self.exempt_paths):
-            return await call_next(request)
+        path = scope["path"]
+        if any(path.startswith(exempt) for exempt in self.exempt_paths):
+            return await self.app(scope, receive, send)
         
         try:
+            # Request over the scope only - the body is never touched
+            request = Request(scope)
+            
             # Get CSRF token from header
             csrf_header = request.headers.get("X-CSRF-Token")
             
             # Get CSRF token from cookie
             csrf_cookie = request.cookies.get("csrf_token")
             
-            # Validate tokens match
-            if not csrf_header or not csrf_cookie or csrf_header != csrf_cookie:
-                logger.warning(
-                    f"CSRF validation failed",
-                    extra={
-                        "event": "csrf_failed",
-                        "path": request.url.path,
-                        "method": request.method,
-                        "has_header": bool(csrf_header),
-                        "has_cookie": bool(csrf_cookie)
-                    }
-                )
-                
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="CSRF validation failed"
-                )
-            
-            return await call_next(request)
+            valid = bool(csrf_header and csrf_cookie) and secrets.compare_digest(
+                csrf_header, csrf_cookie
+            )
             
-        except HTTPException:
-            raise
         except Exception as e:
             logger.error(f"CSRF middleware error: {str(e)}")
-            raise HTTPException(
+            response = JSONResponse(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Security validation error"
+                content={"detail": "Security validation error"}
             )
+            return await response(scope, receive, send)
+        
+        # Validate tokens match
+        if not valid:
+            logger.warning(
+                f"CSRF validation failed",
+                extra={
+                    "event": "csrf_failed",
+                    "path": path,
+                    "method": scope["method"],
+                    "has_header": bool(csrf_header),
+                    "has_cookie": bool(csrf_cookie)
+                }
+            )
+            
+            response = JSONResponse(
+                status_code=status.HTTP_403_FORBIDDEN,
+                content={"detail": "CSRF validation failed"}
+            )
+            return await response(scope, receive, send)
+        
+        await self.app(scope, receive, send)
 
 
-class IPFilterMiddleware(BaseHTTPMiddleware):
+class IPFilterMiddleware:
     """
     IP-based access control
     - Whitelist for admin endpoints
     - Blacklist for malicious IPs
+    - Threat-intel blocklist file, hot reloaded in the background
     - Geo-blocking (optional)
+    
+    Lists accept exact IPs and IPv4/IPv6 CIDR ranges.
     """
     
     def __init__(
         self,
-        app,
+        app: ASGIApp,
         whitelist: Optional[List[str]] = None,
-        blacklist: Optional[List[str]] = None
+        blacklist: Optional[List[str]] = None,
+        blocklist_path: Optional[str] = None,
+        blocklist_reload_interval: int = 300,
+        blocklist: Optional[IPBlocklist] = None
     ):
-        super().__init__(app)
-        self.whitelist = set(whitelist or [])
-        self.blacklist = set(blacklist or [])
+        self.app = app
+        self.whitelist = IPNetworkSet(whitelist or [])
+        self.blacklist = IPNetworkSet(blacklist or [])
+        # A shared blocklist lets its owner stop the reload task on shutdown
+        self.blocklist = blocklist if blocklist is not None else IPBlocklist(blocklist_path, blocklist_reload_interval)
         
         # Admin endpoints requiring whitelist
         self.protected_paths = [
@@ -221,100 +302,177 @@ class IPFilterMiddleware(BaseHTTPMiddleware):
             "/api/backups"
         ]
     
-    async def dispatch(self, request: Request, call_next):
-        client_ip = request.client.host
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        if self.blocklist.path and not self.blocklist.started:
+            self.blocklist.start()
+        
+        ip = client_ip(scope)
+        path = scope["path"]
         
         # Check blacklist
-        if client_ip in self.blacklist:
+        if ip in self.blacklist or ip in self.blocklist:
             logger.warning(
-                f"Blocked blacklisted IP: {client_ip}",
+                f"Blocked blacklisted IP: {ip}",
                 extra={
                     "event": "ip_blocked",
-                    "ip": client_ip,
+                    "ip": ip,
                     "reason": "blacklist"
                 }
             )
             
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=status.HTTP_403_FORBIDDEN,
                 content={"error": "Access denied"}
             )
+            return await response(scope, receive, send)
         
         # Check whitelist for protected paths
         is_protected = any(
-            request.url.path.startswith(path)
-            for path in self.protected_paths
+            path.startswith(protected)
+            for protected in self.protected_paths
         )
         
-        if is_protected and self.whitelist and client_ip not in self.whitelist:
+        if is_protected and self.whitelist and ip not in self.whitelist:
             logger.warning(
-                f"Blocked non-whitelisted IP from protected path: {client_ip}",
+                f"Blocked non-whitelisted IP from protected path: {ip}",
                 extra={
                     "event": "ip_blocked",
-                    "ip": client_ip,
-                    "path": request.url.path,
+                    "ip": ip,
+                    "path": path,
                     "reason": "not_whitelisted"
                 }
             )
             
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=status.HTTP_403_FORBIDDEN,
                 content={"error": "Access denied"}
             )
+            return await response(scope, receive, send)
         
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
 
-class RequestValidationMiddleware(BaseHTTPMiddleware):
+class RequestBodyTooLarge(HTTPException):
+    """Raised from the receive stream once a body crosses its size limit"""
+    
+    def __init__(self, max_body_size: int):
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request body exceeds {max_body_size} bytes"
+        )
+        self.max_body_size = max_body_size
+
+
+class RequestValidationMiddleware:
     """
     Request validation and sanitization
     - Content-Type validation
-    - Request size limits
+    - Request size limits, enforced on the receive stream
     - Payload inspection
+    
+    Bodies are never buffered here: chunks are counted as the app reads
+    them, and the read that crosses the limit raises RequestBodyTooLarge
+    (413), so a request never holds more than the limit plus one chunk,
+    whether or not the client sent an honest Content-Length.
     """
     
-    def __init__(self, app, max_body_size: int = 10 * 1024 * 1024):  # 10MB
-        super().__init__(app)
+    # Allow only specific content types
+    ALLOWED_CONTENT_TYPES = (
+        "application/json",
+        "application/x-www-form-urlencoded",
+        "multipart/form-data",
+        # Raw-body customer imports
+        "text/csv",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_body_size: int = 10 * 1024 * 1024,  # 10MB
+        path_limits: Optional[Dict[str, int]] = None
+    ):
+        self.app = app
         self.max_body_size = max_body_size
+        # Path prefix -> body limit, e.g. larger caps for bulk import routes
+        self.path_limits = path_limits or {}
+    
+    def _limit_for(self, path: str) -> int:
+        for prefix, limit in self.path_limits.items():
+            if path.startswith(prefix):
+                return limit
+        return self.max_body_size
     
-    async def dispatch(self, request: Request, call_next):
+    def _too_large(self, max_body_size: int) -> JSONResponse:
+        return JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={
+                "error": "Request too large",
+                "max_size_mb": max_body_size / 1024 / 1024
+            }
+        )
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        max_body_size = self._limit_for(scope["path"])
+        
         try:
+            headers = Headers(scope=scope)
+            
             # Validate Content-Type for POST/PUT/PATCH
-            if request.method in ["POST", "PUT", "PATCH"]:
-                content_type = request.headers.get("content-type", "")
-                
-                # Allow only specific content types
-                allowed_types = [
-                    "application/json",
-                    "application/x-www-form-urlencoded",
-                    "multipart/form-data"
-                ]
+            if scope["method"] in ["POST", "PUT", "PATCH"]:
+                content_type = headers.get("content-type", "")
                 
-                if not any(ct in content_type for ct in allowed_types):
-                    return JSONResponse(
+                if not any(ct in content_type for ct in self.ALLOWED_CONTENT_TYPES):
+                    response = JSONResponse(
                         status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
                         content={"error": "Unsupported Media Type"}
                     )
+                    return await response(scope, receive, send)
             
-            # Check request body size
-            content_length = request.headers.get("content-length")
-            if content_length and int(content_length) > self.max_body_size:
-                return JSONResponse(
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    content={
-                        "error": "Request too large",
-                        "max_size_mb": self.max_body_size / 1024 / 1024
-                    }
-                )
-            
-            return await call_next(request)
+            # Reject declared oversize bodies before reading anything
+            content_length = headers.get("content-length")
+            if content_length and int(content_length) > max_body_size:
+                return await self._too_large(max_body_size)(scope, receive, send)
             
         except Exception as e:
             logger.error(f"Request validation error: {str(e)}")
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={"error": "Invalid request"}
             )
+            return await response(scope, receive, send)
+        
+        received = 0
+        response_started = False
+        
+        async def receive_limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_size:
+                    raise RequestBodyTooLarge(max_body_size)
+            return message
+        
+        async def send_tracking(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
+        try:
+            await self.app(scope, receive_limited, send_tracking)
+        except RequestBodyTooLarge:
+            # Apps that let it escape (no HTTPException handler) still get a 413
+            if response_started:
+                raise
+            await self._too_large(max_body_size)(scope, receive, send)
 
 
 # CSRF Token utilities
@@ -4,7 +4,7 @@ Version: 7.0.0
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Enum, Index, text
 from sqlalchemy.orm import relationship
 import enum
 
@@ -38,10 +38,24 @@ class Customer(Base):
     """Customer/Lead model"""
     
     __tablename__ = "customers"
+    __table_args__ = (
+        # Keyset pagination: (sort key, id) for each supported listing order
+        Index("idx_customers_created_at_id", "created_at", "id"),
+        Index("idx_customers_name_id", "name", "id"),
+        Index("idx_customers_status_created_at_id", "status", "created_at", "id"),
+        # Conflict target for bulk upserts keyed by email within an organization
+        Index(
+            "uq_customers_org_email", "organization_id", "email", unique=True,
+            postgresql_where=text("email IS NOT NULL"), sqlite_where=text("email IS NOT NULL")
+        ),
+    )
     
     # Primary Key
     id = Column(Integer, primary_key=True, index=True)
     
+    # Tenant (migration 001)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    
     # Basic Information
     name = Column(String(200), nullable=False, index=True)
     email = Column(String(255), index=True)
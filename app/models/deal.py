@@ -4,7 +4,7 @@ Version: 7.0.0
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 import enum
 
@@ -33,10 +33,20 @@ class Deal(Base):
     """Deal/Opportunity model"""
     
     __tablename__ = "deals"
+    __table_args__ = (
+        # Keyset pagination: (sort key, id) for each supported listing order
+        Index("idx_deals_created_at_id", "created_at", "id"),
+        Index("idx_deals_amount_id", "amount", "id"),
+        Index("idx_deals_stage_created_at_id", "stage", "created_at", "id"),
+        Index("idx_deals_customer_created_at_id", "customer_id", "created_at", "id"),
+    )
     
     # Primary Key
     id = Column(Integer, primary_key=True, index=True)
     
+    # Tenant (migration 001)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    
     # Basic Information
     title = Column(String(200), nullable=False)
     description = Column(Text)
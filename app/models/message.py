@@ -44,6 +44,9 @@ class Message(Base):
     # Primary Key
     id = Column(Integer, primary_key=True, index=True)
     
+    # Tenant (migration 001)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    
     # Message Content
     subject = Column(String(500))
     body = Column(Text, nullable=False)
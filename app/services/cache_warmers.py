@@ -0,0 +1,69 @@
+"""
+Cache Warmers
+Pre-computes the hottest dashboard reads so new instances never serve cold
+"""
+
+import logging
+
+from app.core.cache_warming import CacheWarmer, cache_warmer
+from app.core.database import get_db_context
+from app.services.ai_service import ai_service
+from app.services.crm_service import CRMService
+from app.services.strategic_compass_service import StrategicCompassService
+from app.services.neural_empathy_service import NeuralEmpathyService
+
+logger = logging.getLogger(__name__)
+
+# Re-warm slightly before each entry's TTL so hot keys never lapse
+PIPELINE_STATS_INTERVAL = 50       # ttl 60s
+COMPASS_PRIORITIES_INTERVAL = 3300  # ttl 1h
+AT_RISK_INTERVAL = 270             # ttl 5m
+
+DEFAULT_TOP_N = 10
+DEFAULT_STRESS_THRESHOLD = 70
+
+
+async def warm_pipeline_stats():
+    """Pipeline stats for the Kanban board and Gemini Live context"""
+    async with get_db_context() as db:
+        crm = CRMService(ai_service)
+        await CRMService.get_pipeline_stats.refresh(crm, db)
+
+
+async def warm_compass_priorities():
+    """Top-N Strategic Compass priorities (default dashboard view)"""
+    async with get_db_context() as db:
+        compass = StrategicCompassService(db)
+        await StrategicCompassService.generate_daily_priorities.refresh(
+            compass, None, DEFAULT_TOP_N
+        )
+
+
+async def warm_at_risk_customers():
+    """At-risk customer list at the default stress threshold"""
+    async with get_db_context() as db:
+        empathy = NeuralEmpathyService(ai_service)
+        await NeuralEmpathyService.get_at_risk_customers.refresh(
+            empathy, db, DEFAULT_STRESS_THRESHOLD
+        )
+
+
+def register_default_warmers(warmer: CacheWarmer = cache_warmer):
+    """Register the built-in warmers (idempotent)"""
+    warmer.register(
+        "pipeline_stats",
+        warm_pipeline_stats,
+        critical=True,
+        interval=PIPELINE_STATS_INTERVAL
+    )
+    warmer.register(
+        "compass_priorities",
+        warm_compass_priorities,
+        critical=True,
+        interval=COMPASS_PRIORITIES_INTERVAL
+    )
+    warmer.register(
+        "at_risk_customers",
+        warm_at_risk_customers,
+        interval=AT_RISK_INTERVAL
+    )
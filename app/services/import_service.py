@@ -0,0 +1,626 @@
+"""
+📥 OmniCRM Ultimate - Customer Import
+=====================================
+✅ CSV / XLSX read from disk row by row - memory stays flat for any file size
+✅ Normalize: E.164 phones, lower-case emails, trimmed text, status/source aliases
+✅ Validate per row; rejected rows go to a downloadable error CSV
+✅ In-file dedupe on email and phone (first occurrence wins)
+✅ Chunked upsert keyed by (organization, email) through CRMService / BulkUpserter
+✅ Background jobs with progress mirrored to the cache for other workers
+
+Upload -> spool to IMPORT_DIR -> job: parse -> normalize -> validate ->
+dedupe -> upsert (BULK_CHUNK_SIZE rows per statement) -> error file.
+"""
+
+import os
+import re
+import csv
+import uuid
+import asyncio
+import logging
+import tempfile
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from app.core.bulk import BulkResult
+from app.core.cache import cache_manager
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Row = Dict[str, Any]
+
+# (1-based row number in the file, raw cell values)
+Record = Tuple[int, List[Any]]
+
+# Async writer: (rows, progress callback) -> BulkResult
+Writer = Callable[[AsyncIterator[Row], Callable[[BulkResult], Awaitable[None]]], Awaitable[BulkResult]]
+
+XLSX_MAGIC = b"PK\x03\x04"
+
+
+class ImportFileTooLarge(ValueError):
+    """The upload crossed IMPORT_MAX_BYTES"""
+
+
+# ==================== NORMALIZATION ====================
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s.]+$")
+
+# Header spellings (normalized with _header_key) -> customer column
+COLUMN_ALIASES = {
+    "name": ("name", "full name", "customer", "customer name", "contact", "contact name", "الاسم", "اسم العميل"),
+    "first_name": ("first name", "firstname", "given name", "الاسم الأول"),
+    "last_name": ("last name", "lastname", "surname", "family name", "اسم العائلة"),
+    "email": ("email", "e mail", "email address", "mail", "البريد", "البريد الإلكتروني"),
+    "phone": ("phone", "phone number", "mobile", "mobile number", "tel", "telephone", "whatsapp",
+              "الجوال", "الهاتف", "رقم الجوال"),
+    "company": ("company", "company name", "organization", "organisation", "account", "الشركة"),
+    "position": ("position", "title", "job title", "role", "المسمى الوظيفي"),
+    "website": ("website", "web", "url", "الموقع"),
+    "city": ("city", "المدينة"),
+    "country": ("country", "الدولة"),
+    "status": ("status", "الحالة"),
+    "source": ("source", "lead source", "المصدر"),
+    "tags": ("tags", "labels", "الوسوم"),
+    "notes": ("notes", "note", "comments", "ملاحظات"),
+}
+
+_HEADER_LOOKUP = {alias: column for column, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+
+def _header_key(value: Any) -> str:
+    return re.sub(r"[\s_\-]+", " ", str(value or "")).strip().lower()
+
+
+def map_columns(header: Sequence[Any]) -> Tuple[Dict[int, str], List[str]]:
+    """Header cells -> ({cell index: column}, ignored headers); first match wins"""
+    mapping, ignored, taken = {}, [], set()
+    for index, cell in enumerate(header):
+        column = _HEADER_LOOKUP.get(_header_key(cell))
+        if column and column not in taken:
+            mapping[index] = column
+            taken.add(column)
+        elif str(cell or "").strip():
+            ignored.append(str(cell).strip())
+    return mapping, ignored
+
+
+_WHITESPACE_RUN = re.compile(r"\s{2,}|[\t\r\n\f\v]")
+_NON_DIGITS = re.compile(r"\D+")
+_TAG_SEPARATORS = re.compile(r"[,;|]")
+
+# Arabic-Indic and Eastern Arabic-Indic digits -> ASCII
+_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+
+
+def _text(value: Any) -> Optional[str]:
+    """Trimmed text with inner whitespace collapsed; None when blank"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Excel stores phone-like cells as floats
+    text = value.strip() if isinstance(value, str) else str(value).strip()
+    if _WHITESPACE_RUN.search(text):
+        text = " ".join(text.split())
+    return text or None
+
+
+def normalize_email(value: Any) -> Optional[str]:
+    email = _text(value)
+    if email is None:
+        return None
+    email = email.lower()
+    if email.startswith("mailto:"):
+        email = email[7:]
+    if not EMAIL_PATTERN.match(email):
+        raise ValueError(f"Invalid email: {value}")
+    return email
+
+
+def normalize_phone(value: Any, default_country_code: Optional[str] = None) -> Optional[str]:
+    """
+    E.164 (+<country><number>) from common spellings: spaces, dashes,
+    brackets, 00 prefix, national trunk 0 and Arabic-Indic digits
+    """
+    text = _text(value)
+    if text is None:
+        return None
+
+    digits = _NON_DIGITS.sub("", text).translate(_DIGITS)
+    if not digits.isascii():
+        digits = "".join(str(unicodedata.digit(c)) for c in digits)
+    international = text.startswith("+")
+    if not international and digits.startswith("00"):
+        digits, international = digits[2:], True
+
+    if not international and (digits.startswith("0") or len(digits) <= 10):
+        # National number, with or without the trunk 0; longer ones already
+        # carry their country code
+        national = digits.lstrip("0")
+        if len(national) < 7:
+            raise ValueError(f"Invalid phone: {value}")
+        digits = (default_country_code or "") + national
+
+    if not 8 <= len(digits) <= 15:
+        raise ValueError(f"Invalid phone: {value}")
+    return f"+{digits}"
+
+
+def normalize_tags(value: Any) -> Optional[str]:
+    text = _text(value)
+    if text is None:
+        return None
+    tags = [t.strip() for t in _TAG_SEPARATORS.split(text) if t.strip()]
+    return ", ".join(dict.fromkeys(tags)) or None
+
+
+# ==================== PARSING ====================
+
+def detect_format(path: str, filename: Optional[str] = None) -> str:
+    """'xlsx' or 'csv', by content first and extension second"""
+    with open(path, "rb") as f:
+        if f.read(4) == XLSX_MAGIC:
+            return "xlsx"
+    if filename and filename.lower().endswith((".xlsx", ".xlsm")):
+        return "xlsx"
+    return "csv"
+
+
+def iter_csv(path: str) -> Iterator[Record]:
+    """Rows of a CSV file; delimiter sniffed (, ; tab), UTF-8 with or without BOM"""
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        for number, row in enumerate(csv.reader(f, dialect), start=1):
+            yield number, row
+
+
+def iter_xlsx(path: str) -> Iterator[Record]:
+    """Rows of the first worksheet (read-only mode streams the sheet XML)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("XLSX import needs openpyxl (pip install openpyxl); upload CSV instead")
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for number, row in enumerate(workbook.worksheets[0].iter_rows(values_only=True), start=1):
+            yield number, list(row)
+    finally:
+        workbook.close()
+
+
+def iter_records(path: str, file_format: str) -> Iterator[Record]:
+    records = iter_xlsx(path) if file_format == "xlsx" else iter_csv(path)
+    return (r for r in records if any(cell is not None and str(cell).strip() for cell in r[1]))
+
+
+# ==================== PIPELINE ====================
+
+class ErrorFile:
+    """Rejected rows as CSV (row, error, original cells); opened on first error"""
+
+    def __init__(self, path: str, header: Sequence[Any]):
+        self.path = path
+        self.header = [str(h) if h is not None else "" for h in header]
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, number: int, error: str, cells: Sequence[Any]):
+        if self._writer is None:
+            self._file = open(self.path, "w", newline="", encoding="utf-8-sig")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["row", "error", *self.header])
+        self._writer.writerow([number, error, *("" if c is None else c for c in cells)])
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class CustomerImporter:
+    """
+    Turns raw records into customer rows and feeds them to a writer
+
+    max_lengths and choices ({"status": {"new": CustomerStatus.NEW, ...}})
+    come from the Customer model; the importer itself does not touch the
+    database.
+    """
+
+    def __init__(
+        self,
+        max_lengths: Optional[Dict[str, int]] = None,
+        choices: Optional[Dict[str, Dict[str, Any]]] = None,
+        default_country_code: Optional[str] = None,
+    ):
+        self.max_lengths = max_lengths or {}
+        self.choices = choices or {}
+        self.default_country_code = default_country_code or settings.IMPORT_DEFAULT_COUNTRY_CODE
+
+        self.ignored_columns: List[str] = []
+        self.processed = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.failed = 0
+
+        self._seen_emails: Set[str] = set()
+        self._seen_phones: Set[str] = set()
+
+        # column -> normalizer, resolved once instead of per cell
+        self._normalizers: Dict[str, Callable[[Any], Any]] = {
+            "email": normalize_email,
+            "phone": lambda value: normalize_phone(value, self.default_country_code),
+            "tags": normalize_tags,
+        }
+        for column, options in self.choices.items():
+            self._normalizers[column] = self._choice_normalizer(column, options)
+
+    @staticmethod
+    def _choice_normalizer(column: str, options: Dict[str, Any]) -> Callable[[Any], Any]:
+        def normalize(value: Any) -> Any:
+            text = _text(value)
+            if text is None:
+                return None
+            choice = options.get(text.lower().replace(" ", "_"))
+            if choice is None:
+                raise ValueError(f"Unknown {column}: {value}")
+            return choice
+        return normalize
+
+    def normalize(self, raw: Dict[str, Any]) -> Row:
+        """One mapped record -> customer row; raises ValueError with the reason"""
+        row: Row = {}
+        normalizers = self._normalizers
+        for column, value in raw.items():
+            value = normalizers.get(column, _text)(value)
+            if value is not None:
+                row[column] = value
+
+        if "first_name" in row or "last_name" in row:
+            first, last = row.pop("first_name", None), row.pop("last_name", None)
+            row.setdefault("name", " ".join(p for p in (first, last) if p))
+        if not row.get("name"):
+            raise ValueError("Missing name")
+
+        for column, limit in self.max_lengths.items():
+            value = row.get(column)
+            if isinstance(value, str) and len(value) > limit:
+                raise ValueError(f"{column} longer than {limit} characters")
+        return row
+
+    def _duplicate_of(self, row: Row) -> Optional[str]:
+        email, phone = row.get("email"), row.get("phone")
+        if email is not None:
+            if email in self._seen_emails:
+                return f"Duplicate email in file: {email}"
+            self._seen_emails.add(email)
+        elif phone is not None:
+            # Rows without an email are keyed on their phone number
+            if phone in self._seen_phones:
+                return f"Duplicate phone in file: {phone}"
+        if phone is not None:
+            self._seen_phones.add(phone)
+        return None
+
+    async def run(
+        self,
+        records: Iterator[Record],
+        write: Writer,
+        errors: Callable[[Sequence[Any]], ErrorFile],
+        progress: Optional[Callable[["CustomerImporter", BulkResult], Awaitable[None]]] = None,
+    ) -> Tuple[BulkResult, Optional[ErrorFile]]:
+        """Consume records (header first) and write them; returns the writer result and error file"""
+        records = iter(records)
+        try:
+            _, header = next(records)
+        except StopIteration:
+            raise ValueError("The file is empty")
+
+        mapping, self.ignored_columns = map_columns(header)
+        if "name" not in mapping.values() and "first_name" not in mapping.values():
+            raise ValueError("No name column found (expected e.g. 'name', 'full name' or 'first name')")
+
+        error_file = errors(header)
+        pending: Dict[int, Record] = {}  # writer index -> record, for rows not yet confirmed
+        handled_errors = 0
+
+        async def rows() -> AsyncIterator[Row]:
+            index = 0
+            for number, cells in records:
+                self.processed += 1
+                raw = {column: cells[i] for i, column in mapping.items() if i < len(cells)}
+                try:
+                    row = self.normalize(raw)
+                except ValueError as e:
+                    self.invalid += 1
+                    error_file.write(number, str(e), cells)
+                    continue
+
+                duplicate = self._duplicate_of(row)
+                if duplicate:
+                    self.duplicates += 1
+                    error_file.write(number, duplicate, cells)
+                    continue
+
+                pending[index] = (number, cells)
+                index += 1
+                yield row
+
+        async def after_chunk(result: BulkResult):
+            nonlocal handled_errors
+            for row_error in result.errors[handled_errors:]:
+                number, cells = pending.get(row_error.index, (0, []))
+                self.failed += 1
+                error_file.write(number, row_error.error, cells)
+            handled_errors = len(result.errors)
+            for index in [i for i in pending if i < result.total]:
+                del pending[index]
+            if progress is not None:
+                await progress(self, result)
+
+        try:
+            result = await write(rows(), after_chunk)
+        finally:
+            error_file.close()
+        return result, error_file
+
+
+# ==================== JOBS ====================
+
+@dataclass
+class ImportJob:
+    """One uploaded file and its progress"""
+
+    id: str
+    filename: str
+    path: str
+    organization_id: Optional[int] = None  # the tenant the rows go to; only it may see the job
+    size: int = 0
+    status: str = "queued"  # queued, running, completed, failed
+    processed: int = 0
+    written: int = 0
+    inserted: Optional[int] = None
+    updated: Optional[int] = None
+    invalid: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    ignored_columns: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    error_file: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return ((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "organization_id": self.organization_id,
+            "filename": self.filename,
+            "size_bytes": self.size,
+            "status": self.status,
+            "processed": self.processed,
+            "written": self.written,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "invalid": self.invalid,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "rejected": self.invalid + self.duplicates + self.failed,
+            "ignored_columns": self.ignored_columns,
+            "error": self.error,
+            "has_error_file": self.error_file is not None,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.processed / self.elapsed) if self.elapsed else 0,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+def _job_key(job_id: str) -> str:
+    return f"import:job:{job_id}"
+
+
+class ImportManager:
+    """
+    Spools uploads to disk and runs imports as background tasks
+
+    Job state lives on the worker that received the upload and is copied
+    to the cache after every chunk, so any worker can report progress.
+    Error files stay on the receiving worker's IMPORT_DIR (share it across
+    workers to serve downloads from anywhere).
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, ImportJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def directory(self) -> str:
+        path = settings.IMPORT_DIR or os.path.join(tempfile.gettempdir(), "omnicrm-imports")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    async def receive(self, chunks: AsyncIterator[bytes], filename: str,
+                      max_bytes: Optional[int] = None, organization_id: Optional[int] = None) -> ImportJob:
+        """Stream an upload to disk for organization_id; raises ImportFileTooLarge past the cap"""
+        max_bytes = max_bytes or settings.IMPORT_MAX_BYTES
+        self._expire()
+
+        job_id = uuid.uuid4().hex
+        path = os.path.join(self.directory, f"{job_id}.upload")
+        job = ImportJob(
+            id=job_id, filename=os.path.basename(filename or "upload"), path=path, organization_id=organization_id
+        )
+        try:
+            with open(path, "wb") as f:
+                async for chunk in chunks:
+                    job.size += len(chunk)
+                    if job.size > max_bytes:
+                        raise ImportFileTooLarge(f"Upload exceeds {max_bytes} bytes")
+                    f.write(chunk)
+        except BaseException:
+            self._remove(path)
+            raise
+
+        self.jobs[job_id] = job
+        await self._publish(job)
+        return job
+
+    def start(self, job: ImportJob, write: Writer, importer: CustomerImporter) -> asyncio.Task:
+        """Run the import in the background"""
+        task = asyncio.create_task(self._run(job, write, importer))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return task
+
+    async def _run(self, job: ImportJob, write: Writer, importer: CustomerImporter):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, settings.IMPORT_MAX_CONCURRENT))
+
+        async def progress(state: CustomerImporter, result: BulkResult):
+            self._update(job, state, result)
+            await self._publish(job)
+
+        async with self._semaphore:
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+            await self._publish(job)
+
+            error_path = os.path.join(self.directory, f"{job.id}-errors.csv")
+            try:
+                records = iter_records(job.path, detect_format(job.path, job.filename))
+                result, error_file = await importer.run(
+                    records, write, lambda header: ErrorFile(error_path, header), progress
+                )
+                self._update(job, importer, result)
+                job.error_file = error_file.path if error_file.count else None
+                job.status = "completed"
+                logger.info(
+                    f"📥 Import {job.id} ({job.filename}): {job.written}/{job.processed} rows written, "
+                    f"{job.invalid + job.duplicates + job.failed} rejected in {job.elapsed:.1f}s"
+                )
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "Cancelled (server shutting down)"
+                raise
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                job.error_file = error_path if os.path.exists(error_path) else None
+                logger.error(f"❌ Import {job.id} failed: {str(e)}")
+            finally:
+                job.finished_at = datetime.utcnow()
+                self._remove(job.path)
+                await self._publish(job)
+
+    @staticmethod
+    def _update(job: ImportJob, state: CustomerImporter, result: BulkResult):
+        job.processed = state.processed
+        job.invalid = state.invalid
+        job.duplicates = state.duplicates
+        job.failed = state.failed
+        job.ignored_columns = state.ignored_columns
+        job.written = result.written
+        job.inserted = result.inserted
+        job.updated = result.updated
+
+    async def _publish(self, job: ImportJob):
+        try:
+            await cache_manager.set(_job_key(job.id), job.to_dict(), ttl=settings.IMPORT_JOB_TTL)
+        except Exception as e:
+            logger.error(f"❌ Could not publish import job {job.id}: {str(e)}")
+
+    async def get(self, job_id: str, organization_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Job status from this worker, else from the cache; None for another
+        organization's job when organization_id is given
+        """
+        job = self.jobs.get(job_id)
+        status = job.to_dict() if job is not None else await cache_manager.get(_job_key(job_id))
+        if not isinstance(status, dict):
+            return None
+        if organization_id is not None and status.get("organization_id") != organization_id:
+            return None
+        return status
+
+    def error_file(self, job_id: str) -> Optional[str]:
+        """Path of the job's error CSV if it exists on this worker's IMPORT_DIR"""
+        if not re.fullmatch(r"[0-9a-f]{32}", job_id):
+            return None
+        path = os.path.join(self.directory, f"{job_id}-errors.csv")
+        return path if os.path.exists(path) else None
+
+    def _expire(self):
+        """Forget finished jobs (and their error files) older than IMPORT_JOB_TTL"""
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.IMPORT_JOB_TTL)
+        for job_id, job in list(self.jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                if job.error_file:
+                    self._remove(job.error_file)
+                del self.jobs[job_id]
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"❌ Could not remove {path}: {str(e)}")
+
+    async def stop(self):
+        """Cancel running imports (shutdown)"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+
+import_manager = ImportManager()
+
+
+def customer_importer() -> CustomerImporter:
+    """Importer configured from the Customer model's column sizes and enums"""
+    from app.models.customer import Customer, CustomerSource, CustomerStatus
+
+    max_lengths = {
+        c.name: c.type.length for c in Customer.__table__.columns if getattr(c.type, "length", None)
+    }
+    return CustomerImporter(
+        max_lengths=max_lengths,
+        choices={
+            "status": {s.value: s for s in CustomerStatus},
+            "source": {s.value: s for s in CustomerSource},
+        },
+    )
+
+
+def crm_writer(crm, organization_id: int, session_factory=None) -> Writer:
+    """Writer that upserts one organization's customers through CRMService on its own session"""
+    async def write(rows: AsyncIterator[Row], progress) -> BulkResult:
+        if session_factory is None:
+            from app.core.database import AsyncSessionLocal as factory
+        else:
+            factory = session_factory
+        async with factory() as db:
+            return await crm.bulk_upsert_customers(
+                db, rows, organization_id, keep_ids=False, progress=progress
+            )
+    return write
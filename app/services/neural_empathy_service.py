@@ -9,8 +9,13 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 import re
 
+from app.core.cache import cache_manager, cached
+
 logger = logging.getLogger(__name__)
 
+# Cache tag for the at-risk customer list
+AT_RISK_TAG = "at_risk"
+
 
 class NeuralEmpathyService:
     """
@@ -224,6 +229,7 @@ Respond in JSON format."""
             
             await db.execute(stmt)
             await db.commit()
+            await cache_manager.invalidate_tags(AT_RISK_TAG)
             
             logger.info(f"✅ Customer {customer_id} emotional state updated")
             return True
@@ -232,6 +238,12 @@ Respond in JSON format."""
             logger.error(f"Failed to sync emotional state: {str(e)}")
             return False
     
+    @cached(
+        prefix="at_risk",
+        ttl=300,
+        key_builder=lambda self, db, threshold=70: f"at_risk:{threshold}",
+        tags=[AT_RISK_TAG]
+    )
     async def get_at_risk_customers(self, db: Any, threshold: int = 70) -> List[Dict]:
         """Get list of customers with high stress levels"""
         try:
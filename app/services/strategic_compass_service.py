@@ -7,7 +7,10 @@ import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, and_, or_, lambda_stmt
+
+from app.core.cache import cached
+from app.services.crm_service import PIPELINE_TAG
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +40,12 @@ class StrategicCompassService:
         self.db = db
         logger.info("✅ Strategic Compass Service initialized")
     
+    @cached(
+        prefix="compass",
+        ttl=3600,
+        key_builder=lambda self, user_id=None, top_n=10: f"compass:priorities:{user_id or 'all'}:{top_n}",
+        tags=[PIPELINE_TAG]
+    )
     async def generate_daily_priorities(
         self, 
         user_id: Optional[str] = None,
@@ -98,12 +107,13 @@ class StrategicCompassService:
         try:
             from app.models.deal import Deal
             
-            query = select(Deal).where(
+            # Lambda statement: built and cache-keyed once, not per call
+            query = lambda_stmt(lambda: select(Deal).where(
                 Deal.stage.in_(['qualification', 'proposal', 'negotiation', 'closing'])
-            )
+            ))
             
             if user_id:
-                query = query.where(Deal.owner_id == user_id)
+                query += lambda s: s.where(Deal.owner_id == user_id)
             
             result = await self.db.execute(query)
             deals = result.scalars().all()
@@ -0,0 +1,45 @@
+"""
+Alembic Migration: Keyset Pagination Indexes
+Revision ID: 002_keyset_pagination_indexes
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+# revision identifiers
+revision = '002_keyset_pagination_indexes'
+down_revision = '001_add_multi_tenancy'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns) - each listing order is (sort key, id)
+INDEXES = [
+    ('idx_customers_created_at_id', 'customers', ['created_at', 'id']),
+    ('idx_customers_name_id', 'customers', ['name', 'id']),
+    ('idx_customers_status_created_at_id', 'customers', ['status', 'created_at', 'id']),
+    ('idx_deals_created_at_id', 'deals', ['created_at', 'id']),
+    ('idx_deals_amount_id', 'deals', ['amount', 'id']),
+    ('idx_deals_stage_created_at_id', 'deals', ['stage', 'created_at', 'id']),
+    ('idx_deals_customer_created_at_id', 'deals', ['customer_id', 'created_at', 'id']),
+]
+
+
+def upgrade():
+    """Create (sort key, id) indexes used by cursor pagination"""
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # CONCURRENTLY keeps large tables writable while the index builds
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    """Drop cursor pagination indexes"""
+
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table)
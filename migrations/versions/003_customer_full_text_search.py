@@ -0,0 +1,148 @@
+"""
+Alembic Migration: Customer Full-Text Search
+Revision ID: 003_customer_full_text_search
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+# revision identifiers
+revision = '003_customer_full_text_search'
+down_revision = '002_keyset_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+
+# Frozen copy of the search DDL as of this revision: app.core.search may
+# change, this migration must not
+
+# Alef/ya/taa-marbuta variants fold to one form; harakat and tatweel drop
+ARABIC_FOLD = [('أ', 'ا'), ('إ', 'ا'), ('آ', 'ا'), ('ٱ', 'ا'), ('ى', 'ي'), ('ة', 'ه')]
+ARABIC_STRIP = 'ًٌٍَُِّْـٰ'
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE OR REPLACE FUNCTION crm_search_normalize(value text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT translate(lower(coalesce(value, '')), 'أإآٱىةًٌٍَُِّْـٰ', 'اااايه')
+    $$
+    """,
+    """
+    ALTER TABLE customers ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple'::regconfig, crm_search_normalize(name)), 'A')
+        || setweight(to_tsvector('simple'::regconfig, crm_search_normalize(company)), 'B')
+        || setweight(to_tsvector('english'::regconfig,
+               coalesce(name, '') || ' ' || coalesce(company, '')), 'C')
+        || setweight(to_tsvector('arabic'::regconfig,
+               crm_search_normalize(name) || ' ' || crm_search_normalize(company)), 'C')
+        || setweight(to_tsvector('simple'::regconfig, coalesce(email, '')), 'D')
+    ) STORED
+    """,
+]
+
+POSTGRES_INDEXES = [
+    "CREATE INDEX {concurrently} IF NOT EXISTS idx_customers_search_vector "
+    "ON customers USING gin (search_vector)",
+    "CREATE INDEX {concurrently} IF NOT EXISTS idx_customers_email_trgm "
+    "ON customers USING gin (lower(email) gin_trgm_ops)",
+    "CREATE INDEX {concurrently} IF NOT EXISTS idx_customers_phone_digits_trgm "
+    "ON customers USING gin ((ltrim(regexp_replace(phone, '[^0-9]', '', 'g'), '0')) gin_trgm_ops)",
+]
+
+
+def _sqlite_normalize(expr):
+    for source, target in ARABIC_FOLD + [(ch, '') for ch in ARABIC_STRIP]:
+        expr = f"replace({expr}, '{source}', '{target}')"
+    return expr
+
+
+def _sqlite_digits(expr):
+    for ch in " -+().":
+        expr = f"replace({expr}, '{ch}', '')"
+    return expr
+
+
+SQLITE_WORDS = {
+    'name': _sqlite_normalize("coalesce({row}.name, '')"),
+    'company': _sqlite_normalize("coalesce({row}.company, '')"),
+    'email': "coalesce({row}.email, '')",
+}
+SQLITE_CONTACT = {
+    'email': "lower(coalesce({row}.email, ''))",
+    'phone': "ltrim(" + _sqlite_digits("coalesce({row}.phone, '')") + ", '0')",
+}
+
+
+def _fts_values(columns, row):
+    return ", ".join(expr.format(row=row) for expr in columns.values())
+
+
+def _fts_sync(fts, columns, row, delete=False):
+    names = ", ".join(columns)
+    if delete:
+        return (f"INSERT INTO {fts}({fts}, rowid, {names}) "
+                f"VALUES ('delete', {row}.id, {_fts_values(columns, row)});")
+    return f"INSERT INTO {fts}(rowid, {names}) VALUES ({row}.id, {_fts_values(columns, row)});"
+
+
+def _sqlite_ddl(backfill):
+    tables = [('customers_fts', SQLITE_WORDS), ('customers_contact_fts', SQLITE_CONTACT)]
+    insert = " ".join(_fts_sync(fts, cols, 'new') for fts, cols in tables)
+    delete = " ".join(_fts_sync(fts, cols, 'old', delete=True) for fts, cols in tables)
+    return [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5("
+        "name, company, email, content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS customers_contact_fts USING fts5("
+        "email, phone, content='', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS customers_search_ai AFTER INSERT ON customers BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS customers_search_ad AFTER DELETE ON customers BEGIN {delete} END",
+        "CREATE TRIGGER IF NOT EXISTS customers_search_au "
+        f"AFTER UPDATE OF name, company, email, phone ON customers BEGIN {delete} {insert} END",
+    ] + ([
+        f"INSERT INTO customers_fts(rowid, {', '.join(SQLITE_WORDS)}) "
+        f"SELECT c.id, {_fts_values(SQLITE_WORDS, 'c')} FROM customers c",
+        f"INSERT INTO customers_contact_fts(rowid, {', '.join(SQLITE_CONTACT)}) "
+        f"SELECT c.id, {_fts_values(SQLITE_CONTACT, 'c')} FROM customers c",
+    ] if backfill else [])
+
+
+def upgrade():
+    """
+    PostgreSQL: pg_trgm, generated search_vector column, GIN indexes
+    (needs PostgreSQL 13+ for the arabic text search config).
+    SQLite: FTS5 tables, sync triggers and a backfill.
+    """
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for statement in POSTGRES_DDL:
+            op.execute(statement)
+        # Adding the stored column rewrites customers; indexes build without blocking writes
+        with op.get_context().autocommit_block():
+            for statement in POSTGRES_INDEXES:
+                op.execute(statement.format(concurrently='CONCURRENTLY'))
+    elif dialect == 'sqlite':
+        # Backfill only a fresh index: the app may have installed search already
+        existed = op.get_bind().exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'customers_fts'"
+        ).first()
+        for statement in _sqlite_ddl(backfill=not existed):
+            op.execute(statement)
+
+
+def downgrade():
+    """Drop search indexes, triggers and columns"""
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS idx_customers_phone_digits_trgm")
+        op.execute("DROP INDEX IF EXISTS idx_customers_email_trgm")
+        op.execute("DROP INDEX IF EXISTS idx_customers_search_vector")
+        op.execute("ALTER TABLE customers DROP COLUMN IF EXISTS search_vector")
+        op.execute("DROP FUNCTION IF EXISTS crm_search_normalize(text)")
+    elif op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('customers_search_ai', 'customers_search_ad', 'customers_search_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS customers_contact_fts")
+        op.execute("DROP TABLE IF EXISTS customers_fts")
@@ -0,0 +1,53 @@
+"""
+Alembic Migration: Unique Customer Email
+Revision ID: 004_customer_email_unique
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '004_customer_email_unique'
+down_revision = '003_customer_full_text_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    Partial unique index on customers (organization_id, email) - the bulk
+    upsert conflict target. Organizations may share an email; only
+    duplicates within one organization block the upgrade.
+    """
+
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text(
+        "SELECT COUNT(*) FROM (SELECT organization_id, email FROM customers WHERE email IS NOT NULL "
+        "GROUP BY organization_id, email HAVING COUNT(*) > 1) d"
+    )).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} email(s) are shared by several customers of one organization; "
+            f"merge them before upgrading"
+        )
+
+    where = sa.text('email IS NOT NULL')
+    if bind.dialect.name == 'postgresql':
+        # CONCURRENTLY keeps customers writable while the index builds
+        with op.get_context().autocommit_block():
+            op.create_index(
+                'uq_customers_org_email', 'customers', ['organization_id', 'email'], unique=True,
+                postgresql_where=where, postgresql_concurrently=True, if_not_exists=True
+            )
+    else:
+        op.create_index(
+            'uq_customers_org_email', 'customers', ['organization_id', 'email'], unique=True,
+            sqlite_where=where
+        )
+
+
+def downgrade():
+    """Drop the unique email index"""
+
+    op.drop_index('uq_customers_org_email', 'customers')
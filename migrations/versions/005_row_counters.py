@@ -0,0 +1,200 @@
+"""
+Alembic Migration: Trigger-Maintained Row Counters
+Revision ID: 005_row_counters
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '005_row_counters'
+down_revision = '004_customer_email_unique'
+branch_labels = None
+depends_on = None
+
+
+# Frozen copy of the counter DDL as of this revision: app.core.counts may
+# change, this migration must not
+COUNTED_TABLES = ('users', 'customers', 'deals', 'messages', 'campaigns')
+COUNTER_SLOTS = 16
+TENANT_COLUMN = 'organization_id'
+
+POSTGRES_TABLE = """
+CREATE TABLE IF NOT EXISTS row_counts (
+    table_name varchar(63) NOT NULL,
+    organization_id integer NOT NULL DEFAULT 0,
+    slot smallint NOT NULL DEFAULT 0,
+    row_count bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, organization_id, slot)
+)
+"""
+
+SQLITE_TABLE = """
+CREATE TABLE IF NOT EXISTS row_counts (
+    table_name TEXT NOT NULL,
+    organization_id INTEGER NOT NULL DEFAULT 0,
+    slot INTEGER NOT NULL DEFAULT 0,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, organization_id, slot)
+)
+"""
+
+_PG_UPSERT = """
+        INSERT INTO row_counts (table_name, organization_id, slot, row_count)
+        SELECT TG_TABLE_NAME, {tenant}, v_slot, {sign}count(*) FROM {rows} GROUP BY 2
+        ON CONFLICT (table_name, organization_id, slot)
+        DO UPDATE SET row_count = row_counts.row_count + excluded.row_count;"""
+
+
+def _pg_count_function(name, tenant):
+    return f"""
+CREATE OR REPLACE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    v_slot smallint := floor(random() * {COUNTER_SLOTS});
+BEGIN
+    IF TG_OP = 'INSERT' THEN{_PG_UPSERT.format(tenant=tenant, sign='', rows='new_rows')}
+    ELSIF TG_OP = 'DELETE' THEN{_PG_UPSERT.format(tenant=tenant, sign='-', rows='old_rows')}
+    ELSIF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM row_counts WHERE table_name = TG_TABLE_NAME;
+    END IF;
+    RETURN NULL;
+END $$
+"""
+
+
+POSTGRES_FUNCTIONS = [
+    _pg_count_function('crm_count_rows', '0'),
+    _pg_count_function('crm_count_tenant_rows', f'coalesce({TENANT_COLUMN}, 0)'),
+    f"""
+CREATE OR REPLACE FUNCTION crm_count_tenant_move() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO row_counts (table_name, organization_id, slot, row_count)
+    VALUES (TG_TABLE_NAME, coalesce(OLD.{TENANT_COLUMN}, 0), 0, -1),
+           (TG_TABLE_NAME, coalesce(NEW.{TENANT_COLUMN}, 0), 0, 1)
+    ON CONFLICT (table_name, organization_id, slot)
+    DO UPDATE SET row_count = row_counts.row_count + excluded.row_count;
+    RETURN NULL;
+END $$
+""",
+]
+
+
+def _pg_triggers(table, tenant):
+    function = 'crm_count_tenant_rows' if tenant else 'crm_count_rows'
+    statements = [
+        f"DROP TRIGGER IF EXISTS {table}_count_insert ON {table}",
+        f"DROP TRIGGER IF EXISTS {table}_count_delete ON {table}",
+        f"DROP TRIGGER IF EXISTS {table}_count_truncate ON {table}",
+        f"DROP TRIGGER IF EXISTS {table}_count_move ON {table}",
+        f"CREATE TRIGGER {table}_count_insert AFTER INSERT ON {table} "
+        f"REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION {function}()",
+        f"CREATE TRIGGER {table}_count_delete AFTER DELETE ON {table} "
+        f"REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION {function}()",
+        f"CREATE TRIGGER {table}_count_truncate AFTER TRUNCATE ON {table} "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION {function}()",
+    ]
+    if tenant:
+        statements.append(
+            f"CREATE TRIGGER {table}_count_move AFTER UPDATE OF {TENANT_COLUMN} ON {table} FOR EACH ROW "
+            f"WHEN (OLD.{TENANT_COLUMN} IS DISTINCT FROM NEW.{TENANT_COLUMN}) "
+            f"EXECUTE FUNCTION crm_count_tenant_move()"
+        )
+    return statements
+
+
+def _sqlite_bump(table, tenant, delta):
+    return (
+        f"INSERT INTO row_counts (table_name, organization_id, slot, row_count) "
+        f"VALUES ('{table}', {tenant}, 0, {delta}) "
+        f"ON CONFLICT (table_name, organization_id, slot) DO UPDATE SET row_count = row_count + ({delta});"
+    )
+
+
+def _sqlite_triggers(table, tenant):
+    new = f"coalesce(NEW.{TENANT_COLUMN}, 0)" if tenant else "0"
+    old = f"coalesce(OLD.{TENANT_COLUMN}, 0)" if tenant else "0"
+    statements = [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_count_insert AFTER INSERT ON {table} "
+        f"BEGIN {_sqlite_bump(table, new, 1)} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_count_delete AFTER DELETE ON {table} "
+        f"BEGIN {_sqlite_bump(table, old, -1)} END",
+    ]
+    if tenant:
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_count_move AFTER UPDATE OF {TENANT_COLUMN} ON {table} "
+            f"WHEN OLD.{TENANT_COLUMN} IS NOT NEW.{TENANT_COLUMN} "
+            f"BEGIN {_sqlite_bump(table, old, -1)} {_sqlite_bump(table, new, 1)} END"
+        )
+    return statements
+
+
+def _backfill(table, tenant):
+    tenant_expr = f"coalesce({TENANT_COLUMN}, 0)" if tenant else "0"
+    group_by = f" GROUP BY {tenant_expr}" if tenant else ""
+    return [
+        f"DELETE FROM row_counts WHERE table_name = '{table}'",
+        f"INSERT INTO row_counts (table_name, organization_id, slot, row_count) "
+        f"SELECT '{table}', {tenant_expr}, 0, count(*) FROM {table}{group_by}",
+    ]
+
+
+def upgrade():
+    """
+    row_counts table, count triggers on users/customers/deals/messages/campaigns
+    and a backfill. On PostgreSQL each CREATE TRIGGER blocks writes to its
+    table until the migration commits; the backfill is one COUNT(*) per table.
+    """
+
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    if dialect not in ('postgresql', 'sqlite'):
+        return
+
+    inspector = sa.inspect(bind)
+    existing = set(inspector.get_table_names())
+
+    # Tables the app may have given counters already keep their counts
+    counted = set()
+    if 'row_counts' in existing:
+        if dialect == 'postgresql':
+            query = ("SELECT c.relname FROM pg_trigger t JOIN pg_class c ON c.oid = t.tgrelid "
+                     "WHERE t.tgname LIKE '%\\_count\\_insert'")
+        else:
+            query = ("SELECT tbl_name FROM sqlite_master WHERE type = 'trigger' "
+                     "AND name LIKE '%\\_count\\_insert' ESCAPE '\\'")
+        counted = {row[0] for row in bind.execute(sa.text(query))}
+
+    if dialect == 'postgresql':
+        op.execute(POSTGRES_TABLE)
+        for statement in POSTGRES_FUNCTIONS:
+            op.execute(statement)
+    else:
+        op.execute(SQLITE_TABLE)
+
+    for table in COUNTED_TABLES:
+        if table not in existing:
+            continue
+        tenant = TENANT_COLUMN in {c['name'] for c in inspector.get_columns(table)}
+        triggers = _pg_triggers(table, tenant) if dialect == 'postgresql' else _sqlite_triggers(table, tenant)
+        for statement in triggers:
+            op.execute(statement)
+        if table not in counted:
+            for statement in _backfill(table, tenant):
+                op.execute(statement)
+
+
+def downgrade():
+    """Drop count triggers, functions and the counter table"""
+
+    dialect = op.get_bind().dialect.name
+    for table in COUNTED_TABLES:
+        for trigger in ('count_insert', 'count_delete', 'count_truncate', 'count_move'):
+            if dialect == 'postgresql':
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_{trigger} ON {table}")
+            else:
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_{trigger}")
+    if dialect == 'postgresql':
+        for function in ('crm_count_rows', 'crm_count_tenant_rows', 'crm_count_tenant_move'):
+            op.execute(f"DROP FUNCTION IF EXISTS {function}()")
+    op.execute("DROP TABLE IF EXISTS row_counts")
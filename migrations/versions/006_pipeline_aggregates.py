@@ -0,0 +1,78 @@
+"""
+Alembic Migration: Pipeline Aggregates
+Revision ID: 006_pipeline_aggregates
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '006_pipeline_aggregates'
+down_revision = '005_row_counters'
+branch_labels = None
+depends_on = None
+
+
+# Frozen copy of the backfill as of this revision: app.core.pipeline_aggregates
+# may change, this migration must not. status follows from the stage (stored
+# as DealStage names, lower-cased here), so grouping by stage is enough.
+BACKFILL = """
+INSERT INTO pipeline_aggregates
+    (organization_id, stage, status, deal_count, value_sum, probability_sum)
+SELECT {tenant} AS organization_id,
+       lower(coalesce(CAST(deals.stage AS VARCHAR), '')) AS stage,
+       CASE WHEN lower(coalesce(CAST(deals.stage AS VARCHAR), '')) IN ('closed_won', 'won') THEN 'won'
+            WHEN lower(coalesce(CAST(deals.stage AS VARCHAR), '')) IN ('closed_lost', 'lost') THEN 'lost'
+            ELSE 'active'
+       END AS status,
+       count(*) AS deal_count,
+       coalesce(sum(deals.amount), 0) AS value_sum,
+       coalesce(sum(deals.probability), 0) AS probability_sum
+FROM deals
+WHERE deals.deleted_at IS NULL
+GROUP BY {group_by}lower(coalesce(CAST(deals.stage AS VARCHAR), ''))
+"""
+
+REQUIRED_COLUMNS = {'id', 'stage', 'amount', 'probability', 'deleted_at'}
+
+
+def upgrade():
+    """
+    pipeline_aggregates (organization_id, stage, status) -> deal count,
+    value and probability sums, filled with one GROUP BY over deals.
+    Deals written between this backfill and the new code rolling out are
+    picked up by the first reconciliation run.
+    """
+
+    bind = op.get_bind()
+    if bind.dialect.name not in ('postgresql', 'sqlite'):
+        return
+
+    inspector = sa.inspect(bind)
+    existing = set(inspector.get_table_names())
+    if 'deals' not in existing or 'pipeline_aggregates' in existing:
+        return
+    deal_columns = {c['name'] for c in inspector.get_columns('deals')}
+    if not REQUIRED_COLUMNS <= deal_columns:
+        return
+
+    op.create_table(
+        'pipeline_aggregates',
+        sa.Column('organization_id', sa.Integer, primary_key=True, server_default='0'),
+        sa.Column('stage', sa.String(50), primary_key=True),
+        sa.Column('status', sa.String(20), primary_key=True),
+        sa.Column('deal_count', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('value_sum', sa.Float, nullable=False, server_default='0'),
+        sa.Column('probability_sum', sa.Float, nullable=False, server_default='0'),
+    )
+    if 'organization_id' in deal_columns:
+        op.execute(BACKFILL.format(tenant='coalesce(organization_id, 0)', group_by='coalesce(organization_id, 0), '))
+    else:
+        op.execute(BACKFILL.format(tenant='0', group_by=''))
+
+
+def downgrade():
+    """Drop the pipeline aggregates table"""
+
+    op.execute("DROP TABLE IF EXISTS pipeline_aggregates")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Bulk Write Benchmark
+Loads customers-shaped rows three ways and reports rows/second:
+  - ORM: one Customer object per row, flushed in batches (the old bulk_insert)
+  - upsert (insert): BulkUpserter into an empty table
+  - upsert (update): the same rows again, every one hitting ON CONFLICT
+On PostgreSQL + asyncpg, chunks of BULK_COPY_MIN_ROWS or more use COPY.
+
+Usage: python scripts/benchmark_bulk.py [--rows 500000] [--url sqlite+aiosqlite:///bulk_bench.db]
+       (the url's database must be empty or disposable - bench_customers is recreated)
+"""
+
+import sys
+import os
+import time
+import asyncio
+import argparse
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+
+from app.core.bulk import BulkUpserter
+
+
+class BenchBase(DeclarativeBase):
+    pass
+
+
+class BenchCustomer(BenchBase):
+    __tablename__ = "bench_customers"
+    __table_args__ = (
+        Index("uq_bench_customers_email", "email", unique=True,
+              postgresql_where=text("email IS NOT NULL"), sqlite_where=text("email IS NOT NULL")),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(200), nullable=False)
+    email = Column(String(255))
+    phone = Column(String(20))
+    company = Column(String(200))
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+def make_rows(rows: int, suffix: str = ""):
+    for i in range(rows):
+        yield {
+            "name": f"Customer {i}{suffix}",
+            "email": f"customer{i}@example.com",
+            "phone": f"+9665{i % 100000000:08d}",
+            "company": f"Company {i % 500}",
+        }
+
+
+async def reset(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(BenchBase.metadata.drop_all)
+        await conn.run_sync(BenchBase.metadata.create_all)
+
+
+async def orm_load(engine, rows: int, batch: int = 5000):
+    async with AsyncSession(engine) as db:
+        for i, row in enumerate(make_rows(rows), start=1):
+            db.add(BenchCustomer(**row))
+            if i % batch == 0:
+                await db.commit()
+        await db.commit()
+
+
+async def bulk_load(engine, rows: int, suffix: str = ""):
+    upserter = BulkUpserter(
+        BenchCustomer, ["email"], conflict_where=text("email IS NOT NULL"), collect_ids=False
+    )
+    async with AsyncSession(engine) as db:
+        return await upserter.upsert(db, make_rows(rows, suffix))
+
+
+async def run(url: str, rows: int, orm_rows: int):
+    engine = create_async_engine(url)
+
+    print("=" * 60)
+    print(f"📦 Bulk write throughput ({engine.dialect.name})")
+    print("=" * 60)
+
+    await reset(engine)
+    started = time.perf_counter()
+    await orm_load(engine, orm_rows)
+    elapsed = time.perf_counter() - started
+    print(f"  {'ORM add_all':<18} {orm_rows:>9,} rows {elapsed:>8.1f}s {orm_rows / elapsed:>10,.0f} rows/s")
+
+    await reset(engine)
+    for label, suffix in (("upsert (insert)", ""), ("upsert (update)", " v2")):
+        result = await bulk_load(engine, rows, suffix)
+        print(f"  {label:<18} {result.total:>9,} rows {result.elapsed:>8.1f}s "
+              f"{result.rows_per_second:>10,.0f} rows/s  ({result.failed} failed)")
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--orm-rows", type=int, default=50000, help="the ORM path is slow; keep it smaller")
+    parser.add_argument("--url", default="sqlite+aiosqlite:///:memory:")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.rows, args.orm_rows))
+
+
+if __name__ == "__main__":
+    main()
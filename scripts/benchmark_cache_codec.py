@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Cache Codec Benchmark
+Compares bytes stored in Redis and encode/decode time of each cache codec
+against plain pickle, using payloads shaped like get_pipeline_stats and
+search_customers results.
+
+Usage: python scripts/benchmark_cache_codec.py [--iterations 2000]
+"""
+
+import sys
+import os
+import pickle
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.cache_codec import ValueSerializer, available_codecs
+
+
+def pipeline_stats_payload() -> dict:
+    """Shape of CRMService.get_pipeline_stats()"""
+    stages = ["lead", "qualified", "proposal", "negotiation", "won", "lost"]
+    return {
+        "stages": {
+            stage: {
+                "count": 120 + i * 17,
+                "total_value": 250000.0 + i * 12345.67,
+                "avg_probability": round(0.1 + i * 0.15, 2)
+            }
+            for i, stage in enumerate(stages)
+        },
+        "win_rate": 37.42,
+        "total_closed": 812,
+        "total_won": 304
+    }
+
+
+def search_customers_payload(count: int = 50) -> list:
+    """Shape of search_customers() results serialized via Customer.to_dict()"""
+    created = datetime(2025, 1, 1)
+    return [
+        {
+            "id": 100000 + i,
+            "name": f"Customer {i} - شركة النخبة",
+            "email": f"customer{i}@example.com",
+            "phone": f"+9665{i:08d}",
+            "company": f"Company {i % 7}",
+            "position": "Procurement Manager",
+            "status": "qualified",
+            "source": "website",
+            "tags": ["vip", "riyadh", "q3-campaign"],
+            "lead_score": i % 100,
+            "lifetime_value": 15000.0 + i,
+            "potential_value": 42000.0,
+            "city": "Riyadh",
+            "country": "Saudi Arabia",
+            "created_at": (created + timedelta(days=i)).isoformat(),
+            "last_contacted_at": None
+        }
+        for i in range(count)
+    ]
+
+
+def bench(name: str, encode, decode, value, iterations: int):
+    data = encode(value)
+    encode_us = timeit.timeit(lambda: encode(value), number=iterations) / iterations * 1e6
+    decode_us = timeit.timeit(lambda: decode(data), number=iterations) / iterations * 1e6
+    print(f"  {name:<22} {len(data):>8} B {encode_us:>10.1f} µs {decode_us:>10.1f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    payloads = {
+        "get_pipeline_stats": pipeline_stats_payload(),
+        "search_customers (50 rows)": search_customers_payload(),
+    }
+
+    print("=" * 64)
+    print("🗜️ Cache codec benchmark")
+    print("=" * 64)
+
+    for label, value in payloads.items():
+        print(f"\n{label}")
+        print(f"  {'codec':<22} {'bytes':>10} {'encode':>13} {'decode':>13}")
+        bench(
+            "pickle (baseline)",
+            lambda v: pickle.dumps(v),
+            pickle.loads,
+            value,
+            args.iterations
+        )
+        for codec in available_codecs():
+            for threshold, suffix in ((0, ""), (1024, " +zlib")):
+                serializer = ValueSerializer(codec=codec, compression_threshold=threshold)
+                bench(
+                    codec + suffix,
+                    serializer.encode,
+                    serializer.decode,
+                    value,
+                    args.iterations
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Customer Import Benchmark
+Writes a customers CSV (mixed phone spellings, ~1% bad rows, ~1% in-file
+duplicates) and runs the import pipeline - parse, normalize, validate,
+dedupe, chunked upsert - reporting rows/second for the parse-only and
+full pipeline.
+
+Usage: python scripts/benchmark_import.py [--rows 200000] [--url sqlite+aiosqlite:///import_bench.db]
+       (the url's database must be empty or disposable - bench_customers is recreated)
+"""
+
+import sys
+import os
+import csv
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+
+from app.core.bulk import BulkResult, BulkUpserter
+from app.services.import_service import CustomerImporter, ErrorFile, iter_records
+
+PHONE_FORMATS = ["05{0} {1} {2}", "+966 5{0} {1} {2}", "009665{0}{1}{2}", "5{0}-{1}-{2}"]
+
+
+class BenchBase(DeclarativeBase):
+    pass
+
+
+class BenchCustomer(BenchBase):
+    __tablename__ = "bench_customers"
+    __table_args__ = (
+        Index("uq_bench_customers_email", "email", unique=True,
+              postgresql_where=text("email IS NOT NULL"), sqlite_where=text("email IS NOT NULL")),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(200), nullable=False)
+    email = Column(String(255))
+    phone = Column(String(20))
+    company = Column(String(200))
+    city = Column(String(100))
+    tags = Column(String(500))
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+def write_csv(path: str, rows: int):
+    rng = random.Random(7)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Full Name", "Email", "Mobile", "Company", "City", "Tags"])
+        for i in range(rows):
+            n = rng.randrange(rows) if rng.random() < 0.01 else i  # in-file duplicate
+            email = f"Customer{n}@Example.com" if rng.random() > 0.01 else f"customer{n}@"  # bad email
+            phone = rng.choice(PHONE_FORMATS).format(
+                rng.randint(0, 9), rng.randint(100, 999), rng.randint(1000, 9999)
+            )
+            writer.writerow([f"Customer {n}", email, phone, f"Company {n % 700}", "Riyadh", "import; bench"])
+
+
+async def run(url: str, rows: int):
+    directory = tempfile.mkdtemp(prefix="import-bench-")
+    path = os.path.join(directory, "customers.csv")
+    write_csv(path, rows)
+    print(f"📄 {rows:,} rows, {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+    started = time.perf_counter()
+    importer = CustomerImporter(max_lengths={"name": 200, "email": 255, "phone": 20})
+    records = iter_records(path, "csv")
+    next(records)  # header
+    for _, cells in records:
+        try:
+            importer.normalize(dict(zip(["name", "email", "phone", "company", "city", "tags"], cells)))
+        except ValueError:
+            pass
+    elapsed = time.perf_counter() - started
+    print(f"  {'parse + normalize':<20} {elapsed:>7.2f}s {rows / elapsed:>10,.0f} rows/s")
+
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(BenchBase.metadata.drop_all)
+        await conn.run_sync(BenchBase.metadata.create_all)
+
+    async def write(stream, progress) -> BulkResult:
+        async with AsyncSession(engine) as db:
+            upserter = BulkUpserter(
+                BenchCustomer, ["email"], conflict_where=text("email IS NOT NULL"),
+                collect_ids=False, progress=progress,
+            )
+            return await upserter.upsert(db, stream)
+
+    started = time.perf_counter()
+    importer = CustomerImporter(max_lengths={"name": 200, "email": 255, "phone": 20})
+    result, error_file = await importer.run(
+        iter_records(path, "csv"), write, lambda header: ErrorFile(os.path.join(directory, "errors.csv"), header)
+    )
+    elapsed = time.perf_counter() - started
+    print(f"  {'full import':<20} {elapsed:>7.2f}s {rows / elapsed:>10,.0f} rows/s  "
+          f"({result.written:,} written, {importer.invalid:,} invalid, {importer.duplicates:,} duplicates)")
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--url", default="sqlite+aiosqlite:///:memory:")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.rows))
+
+
+if __name__ == "__main__":
+    main()
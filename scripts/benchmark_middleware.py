@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Middleware Overhead Benchmark
+Drives the ASGI middleware pipeline in-process against a trivial endpoint
+and reports per-request overhead for the bare app, each layer alone, and
+the stack built up one layer at a time. A pass-through BaseHTTPMiddleware
+is included as a reference point.
+
+Usage: python scripts/benchmark_middleware.py [--requests 5000]
+"""
+
+import sys
+import os
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.cache import cache_manager
+from app.core.cache_backends import MemoryBackend
+from app.middleware.pipeline import build_pipeline, default_layers
+
+
+async def trivial_app(scope, receive, send):
+    """Stand-in for a cheap endpoint such as /health"""
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json")]
+    })
+    await send({"type": "http.response.body", "body": b'{"status":"ok"}'})
+
+
+class PassThroughMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+def make_scope(i: int) -> dict:
+    # Rotate client IPs so the rate limiter keeps admitting
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/customers",
+        "raw_path": b"/api/customers",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"accept", b"application/json")],
+        "client": (f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}", 50000),
+        "server": ("localhost", 8000),
+        "state": {}
+    }
+
+
+async def measure(app, requests: int) -> list:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    samples = []
+    for i in range(requests):
+        scope = make_scope(i)
+        started = time.perf_counter()
+        await app(scope, receive, send)
+        samples.append((time.perf_counter() - started) * 1e6)
+    return samples
+
+
+def report(label: str, samples: list, baseline: float):
+    p50 = statistics.median(samples)
+    p99 = sorted(samples)[int(len(samples) * 0.99) - 1]
+    print(f"  {label:<36} {p50:>9.1f} µs {p99:>9.1f} µs {p50 - baseline:>+10.1f} µs")
+
+
+async def run(requests: int):
+    # Keep logging out of the measurement; use the in-process cache backend
+    logging.disable(logging.CRITICAL)
+    cache_manager.use_backend(MemoryBackend())
+
+    layers = default_layers(security=True)
+
+    print("=" * 78)
+    print("🧩 Middleware overhead benchmark")
+    print("=" * 78)
+    print(f"  {'stack':<36} {'p50':>12} {'p99':>12} {'vs bare':>13}")
+
+    # Warm up imports, caches and the event loop
+    await measure(build_pipeline(trivial_app, layers), 200)
+
+    bare = await measure(trivial_app, requests)
+    baseline = statistics.median(bare)
+    report("bare app", bare, baseline)
+    report("BaseHTTPMiddleware (pass-through)", await measure(PassThroughMiddleware(trivial_app), requests), baseline)
+
+    print("\nEach layer alone")
+    for layer in layers:
+        samples = await measure(build_pipeline(trivial_app, [layer]), requests)
+        report(layer[0].__name__, samples, baseline)
+
+    print("\nCumulative (outermost first)")
+    for depth in range(1, len(layers) + 1):
+        samples = await measure(build_pipeline(trivial_app, layers[:depth]), requests)
+        report(f"+ {layers[depth - 1][0].__name__}", samples, baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Pagination Depth Benchmark
+Fills a customers-shaped table and times fetching one page at increasing
+depths with LIMIT/OFFSET and with keyset cursors on (created_at, id).
+Offset cost grows with the page number; keyset cost should stay flat.
+
+Usage: python scripts/benchmark_pagination.py [--rows 200000] [--url sqlite+aiosqlite:///bench.db]
+"""
+
+import sys
+import os
+import time
+import asyncio
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+
+from app.core.pagination import encode_cursor, keyset_paginate
+
+PAGE_SIZE = 50
+DEPTHS = [1, 10, 100, 1000, 4000]
+
+
+class BenchBase(DeclarativeBase):
+    pass
+
+
+class BenchCustomer(BenchBase):
+    __tablename__ = "bench_customers"
+    __table_args__ = (Index("idx_bench_customers_created_at_id", "created_at", "id"),)
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(200), nullable=False)
+    email = Column(String(255))
+    created_at = Column(DateTime, nullable=False)
+
+
+async def fill(engine, rows: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(BenchBase.metadata.drop_all)
+        await conn.run_sync(BenchBase.metadata.create_all)
+        start = datetime(2024, 1, 1)
+        for offset in range(0, rows, 10000):
+            await conn.execute(BenchCustomer.__table__.insert(), [
+                {
+                    "id": i + 1,
+                    "name": f"Customer {i}",
+                    "email": f"customer{i}@example.com",
+                    "created_at": start + timedelta(seconds=i // 3),  # ties on created_at
+                }
+                for i in range(offset, min(offset + 10000, rows))
+            ])
+
+
+async def timed(engine, stmt, repeat: int) -> float:
+    samples = []
+    async with engine.connect() as conn:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            (await conn.execute(stmt)).all()
+            samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def run(url: str, rows: int, repeat: int):
+    engine = create_async_engine(url)
+    print(f"⏳ Inserting {rows:,} rows...")
+    await fill(engine, rows)
+
+    ordered = select(BenchCustomer).order_by(BenchCustomer.created_at.desc(), BenchCustomer.id.desc())
+    columns = [BenchCustomer.created_at, BenchCustomer.id]
+
+    print("=" * 60)
+    print(f"📑 Page fetch latency ({PAGE_SIZE} rows/page, median of {repeat})")
+    print("=" * 60)
+    print(f"  {'page':>6} {'offset':>14} {'keyset':>14}")
+
+    for depth in DEPTHS:
+        skip = (depth - 1) * PAGE_SIZE
+        if skip >= rows:
+            break
+
+        offset_ms = await timed(engine, ordered.limit(PAGE_SIZE).offset(skip), repeat)
+
+        # Cursor for the row that ended the previous page
+        cursor = None
+        if skip:
+            async with engine.connect() as conn:
+                last = (await conn.execute(ordered.offset(skip - 1).limit(1))).one()
+            cursor = encode_cursor("-created_at", [last.created_at, last.id])
+        keyset_stmt = keyset_paginate(select(BenchCustomer), columns, cursor, PAGE_SIZE, "created_at")
+        keyset_ms = await timed(engine, keyset_stmt, repeat)
+
+        print(f"  {depth:>6} {offset_ms:>11.2f} ms {keyset_ms:>11.2f} ms")
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--url", default="sqlite+aiosqlite:///:memory:")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.rows, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Customer Search Benchmark
+Fills a customers table (mixed Arabic / English names, emails, phones),
+installs the full-text search objects and compares the old four-column
+ILIKE '%q%' scan with the indexed search for typical queries.
+
+Usage: python scripts/benchmark_search.py [--rows 1000000] [--url sqlite+aiosqlite:///search_bench.db]
+       (the url's database must be empty or disposable - customers is recreated)
+"""
+
+import sys
+import os
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, DateTime, Integer, String, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+
+from app.core.search import apply_customer_search, install_customer_search, search_mode
+
+FIRST_NAMES = ["أحمد", "محمد", "فاطمة", "نورة", "عبدالله", "Sara", "John", "Omar", "Layla", "Khalid", "Maria", "Yousef"]
+LAST_NAMES = ["الشمري", "العتيبي", "القحطاني", "Smith", "Khan", "Haddad", "Garcia", "الدوسري", "Nasser", "Brown"]
+COMPANIES = ["شركة النور", "Contoso", "Fabrikam", "مؤسسة الأفق", "Northwind", "Tailspin", "دار الخليج", "Globex"]
+QUERIES = ["Khalid Haddad", "محمد", "احمد الشمري", "contoso", "Northw", "0551234", "@fabrikam", "zzzz-no-match"]
+
+
+class BenchBase(DeclarativeBase):
+    pass
+
+
+class BenchCustomer(BenchBase):
+    __tablename__ = "customers"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(200), nullable=False)
+    email = Column(String(255))
+    phone = Column(String(20))
+    company = Column(String(200))
+    created_at = Column(DateTime, nullable=False)
+
+
+def make_row(i: int, rng: random.Random) -> dict:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    company = rng.choice(COMPANIES)
+    return {
+        "id": i + 1,
+        "name": f"{first} {last}",
+        "email": f"user{i}@{company.split()[-1].lower()}.example",
+        "phone": f"+966 5{rng.randint(0, 9)} {rng.randint(100, 999)} {rng.randint(1000, 9999)}",
+        "company": company,
+        "created_at": datetime(2024, 1, 1),
+    }
+
+
+async def fill(engine, rows: int):
+    rng = random.Random(42)
+    async with engine.begin() as conn:
+        await conn.run_sync(BenchBase.metadata.drop_all)
+        await conn.run_sync(BenchBase.metadata.create_all)
+        for offset in range(0, rows, 20000):
+            await conn.execute(
+                BenchCustomer.__table__.insert(),
+                [make_row(i, rng) for i in range(offset, min(offset + 20000, rows))]
+            )
+
+
+def ilike_stmt(query: str):
+    pattern = f"%{query}%"
+    return select(func.count()).select_from(BenchCustomer).where(or_(
+        BenchCustomer.name.ilike(pattern),
+        BenchCustomer.email.ilike(pattern),
+        BenchCustomer.phone.ilike(pattern),
+        BenchCustomer.company.ilike(pattern),
+    ))
+
+
+def indexed_stmt(query: str, mode: str):
+    stmt, rank = apply_customer_search(select(BenchCustomer.id), BenchCustomer, query, mode)
+    return stmt.order_by(rank.desc(), BenchCustomer.id).limit(50)
+
+
+async def timed(db, stmt, repeat: int):
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = (await db.execute(stmt)).all()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+async def run(url: str, rows: int, repeat: int):
+    engine = create_async_engine(url)
+
+    started = time.perf_counter()
+    print(f"⏳ Inserting {rows:,} customers...")
+    await fill(engine, rows)
+    print(f"   {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.run_sync(install_customer_search)
+    print(f"🔎 Search indexes built in {time.perf_counter() - started:.1f}s")
+
+    async with AsyncSession(engine) as db:
+        mode = await search_mode(db)
+        print("=" * 72)
+        print(f"🔎 Customer search at {rows:,} rows ({mode}, median of {repeat})")
+        print("=" * 72)
+        print(f"  {'query':<18} {'ILIKE scan':>12} {'indexed':>12} {'speedup':>9} {'hits (top 50)':>14}")
+
+        for query in QUERIES:
+            scan_ms, _ = await timed(db, ilike_stmt(query), repeat)
+            indexed_ms, hits = await timed(db, indexed_stmt(query, mode), repeat)
+            print(f"  {query:<18} {scan_ms:>9.1f} ms {indexed_ms:>9.2f} ms "
+                  f"{scan_ms / max(indexed_ms, 1e-3):>8.0f}x {len(hits):>14}")
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--url", default="sqlite+aiosqlite:///:memory:")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.rows, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
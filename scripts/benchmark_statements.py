@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Statement Overhead Benchmark
+Python-side cost per query for the hot CRM reads, three ways:
+  - recompile: select() built per call, SQL compiled every time (no compiled cache)
+  - select(): built per call, compiled SQL reused via its cache key (the old code)
+  - lambda: lambda_stmt - construct and cache key reused, only parameters extracted
+Runs against a tiny in-memory SQLite database through a sync ORM Session so
+the driver round trip is negligible and the ORM overhead dominates.
+
+Usage: python scripts/benchmark_statements.py [--iterations 20000]
+"""
+
+import sys
+import os
+import time
+import argparse
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, DateTime, Float, Integer, String, and_, case, create_engine, func, lambda_stmt, select
+from sqlalchemy.orm import DeclarativeBase, Session
+
+
+class BenchBase(DeclarativeBase):
+    pass
+
+
+class Deal(BenchBase):
+    __tablename__ = "bench_deals"
+
+    id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, index=True)
+    owner_id = Column(Integer)
+    stage = Column(String(30))
+    status = Column(String(20))
+    value = Column(Float)
+    probability = Column(Integer)
+    updated_at = Column(DateTime)
+
+
+class Message(BenchBase):
+    __tablename__ = "bench_messages"
+
+    id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, index=True)
+    created_at = Column(DateTime)
+
+
+# ==================== QUERIES (as in CRMService / StrategicCompassService) ====================
+
+def pipeline_select():
+    return [
+        select(Deal.stage, func.count(Deal.id).label("count"), func.sum(Deal.value).label("total_value"),
+               func.avg(Deal.probability).label("avg_probability"))
+        .where(Deal.status == "active").group_by(Deal.stage),
+        select(func.count(Deal.id), func.sum(case((Deal.status == "won", 1), else_=0)))
+        .where(Deal.status.in_(["won", "lost"])),
+    ]
+
+
+def pipeline_lambda():
+    return [
+        lambda_stmt(lambda: (
+            select(Deal.stage, func.count(Deal.id).label("count"), func.sum(Deal.value).label("total_value"),
+                   func.avg(Deal.probability).label("avg_probability"))
+            .where(Deal.status == "active").group_by(Deal.stage)
+        )),
+        lambda_stmt(lambda: (
+            select(func.count(Deal.id), func.sum(case((Deal.status == "won", 1), else_=0)))
+            .where(Deal.status.in_(["won", "lost"]))
+        )),
+    ]
+
+
+def clv_select(customer_id):
+    return [select(func.sum(Deal.value)).where(and_(Deal.customer_id == customer_id, Deal.status == "won"))]
+
+
+def clv_lambda(customer_id):
+    return [lambda_stmt(lambda: (
+        select(func.sum(Deal.value)).where(and_(Deal.customer_id == customer_id, Deal.status == "won"))
+    ))]
+
+
+def engagement_select(customer_id):
+    cutoff_date = datetime.utcnow() - timedelta(days=30)
+    return [select(func.count(Message.id)).where(
+        and_(Message.customer_id == customer_id, Message.created_at >= cutoff_date)
+    )]
+
+
+def engagement_lambda(customer_id):
+    cutoff_date = datetime.utcnow() - timedelta(days=30)
+    return [lambda_stmt(lambda: (
+        select(func.count(Message.id)).where(
+            and_(Message.customer_id == customer_id, Message.created_at >= cutoff_date)
+        )
+    ))]
+
+
+def active_deals_select(user_id):
+    query = select(Deal).where(Deal.stage.in_(["qualification", "proposal", "negotiation", "closing"]))
+    if user_id:
+        query = query.where(Deal.owner_id == user_id)
+    return [query]
+
+
+def active_deals_lambda(user_id):
+    query = lambda_stmt(lambda: select(Deal).where(
+        Deal.stage.in_(["qualification", "proposal", "negotiation", "closing"])
+    ))
+    if user_id:
+        query += lambda s: s.where(Deal.owner_id == user_id)
+    return [query]
+
+
+QUERIES = (
+    ("get_pipeline_stats", lambda i: pipeline_select(), lambda i: pipeline_lambda()),
+    ("get_customer_lifetime_value", lambda i: clv_select(i % 50), lambda i: clv_lambda(i % 50)),
+    ("get_engagement_score", lambda i: engagement_select(i % 50), lambda i: engagement_lambda(i % 50)),
+    ("_get_active_deals", lambda i: active_deals_select(i % 5), lambda i: active_deals_lambda(i % 5)),
+)
+
+
+def seed(engine):
+    BenchBase.metadata.create_all(engine)
+    stages = ["qualification", "proposal", "negotiation", "closing", "won"]
+    with Session(engine) as db:
+        db.add_all(
+            Deal(customer_id=i % 50, owner_id=i % 5, stage=stages[i % 5],
+                 status=("active", "won", "lost")[i % 3], value=1000.0 * i, probability=i % 100,
+                 updated_at=datetime.utcnow())
+            for i in range(20)
+        )
+        db.add_all(Message(customer_id=i % 50, created_at=datetime.utcnow()) for i in range(20))
+        db.commit()
+
+
+def run_variant(db, build, iterations, options=None):
+    started = time.perf_counter()
+    for i in range(iterations):
+        for stmt in build(i):
+            result = db.execute(stmt, execution_options=options) if options else db.execute(stmt)
+            result.all()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    seed(engine)
+
+    print("=" * 78)
+    print(f"⚡ Python-side overhead per call ({args.iterations:,} calls each, µs)")
+    print("=" * 78)
+    print(f"  {'query':<30} {'recompile':>10} {'select()':>10} {'lambda':>10} {'saved':>8}")
+    with Session(engine) as db:
+        for name, build_select, build_lambda in QUERIES:
+            # Same rows either way (this also warms the compiled cache and lambda analysis)
+            for i in range(10):
+                expected = [db.execute(stmt).all() for stmt in build_select(i)]
+                assert [db.execute(stmt).all() for stmt in build_lambda(i)] == expected, name
+            run_variant(db, build_select, 100)
+            run_variant(db, build_lambda, 100)
+            recompile = run_variant(db, build_select, args.iterations // 4, {"compiled_cache": None})
+            classic = run_variant(db, build_select, args.iterations)
+            lambdas = run_variant(db, build_lambda, args.iterations)
+            print(f"  {name:<30} {recompile:>10.1f} {classic:>10.1f} {lambdas:>10.1f} "
+                  f"{(1 - lambdas / classic) * 100:>7.0f}%")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Shared test fixtures - Throwaway SQLite databases for the data-layer tests
+"""
+
+from contextlib import asynccontextmanager
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+
+@pytest_asyncio.fixture
+async def sqlite_engine(tmp_path_factory):
+    """
+    Factory for aiosqlite engines: await sqlite_engine(metadata=None, name="test.db")
+
+    Each engine gets a file (not :memory:), so separate connections see
+    the same data; the files sit in their own directory, leaving the
+    test's tmp_path to the test. Tables in metadata are created up front
+    and every engine is disposed when the test ends.
+    """
+    pytest.importorskip("aiosqlite")
+    directory = tmp_path_factory.mktemp("sqlite")
+    engines = []
+
+    async def make_engine(metadata=None, name: str = "test.db"):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory / name}")
+        engines.append(engine)
+        if metadata is not None:
+            async with engine.begin() as conn:
+                await conn.run_sync(metadata.create_all)
+        return engine
+
+    yield make_engine
+
+    for engine in engines:
+        await engine.dispose()
+
+
+@pytest.fixture
+def sqlite_sessions():
+    """engine -> session_context: a callable opening a fresh AsyncSession per use"""
+    def sessions(engine):
+        @asynccontextmanager
+        async def session_context(*args):
+            async with AsyncSession(engine) as db:
+                yield db
+        return session_context
+    return sessions
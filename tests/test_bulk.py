@@ -0,0 +1,204 @@
+"""
+Bulk Tests - Chunked upsert engine (SQLite path)
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, DateTime, Index, Integer, String, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import DeclarativeBase
+
+from app.core.bulk import BulkUpserter, bulk_upsert
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class _Customer(_Base):
+    __tablename__ = "customers"
+    __table_args__ = (
+        Index("uq_customers_email", "email", unique=True, sqlite_where=text("email IS NOT NULL")),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(200), nullable=False)
+    email = Column(String(255))
+    company = Column(String(200))
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class _TenantCustomer(_Base):
+    """Keyed like Customer: email is unique within an organization"""
+    __tablename__ = "tenant_customers"
+    __table_args__ = (
+        Index(
+            "uq_tenant_customers_org_email", "organization_id", "email", unique=True,
+            sqlite_where=text("email IS NOT NULL")
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    organization_id = Column(Integer, nullable=False)
+    name = Column(String(200), nullable=False)
+    email = Column(String(255))
+
+
+def _upserter(**options):
+    return BulkUpserter(_Customer, ["email"], conflict_where=text("email IS NOT NULL"), **options)
+
+
+async def _rows(engine):
+    async with AsyncSession(engine) as db:
+        result = await db.execute(select(_Customer.id, _Customer.name, _Customer.email).order_by(_Customer.id))
+        return [tuple(r) for r in result]
+
+
+@pytest.mark.asyncio
+async def test_upsert_inserts_then_updates_by_key(sqlite_engine):
+    """Existing emails are updated in place; new ones are inserted"""
+    engine = await sqlite_engine(_Base.metadata)
+
+    async with AsyncSession(engine) as db:
+        first = await _upserter().upsert(db, [
+            {"name": "Ahmed", "email": "ahmed@example.sa"},
+            {"name": "Sara", "email": "sara@example.com"},
+        ])
+    async with AsyncSession(engine) as db:
+        created = (await db.execute(select(_Customer.created_at).where(_Customer.id == 1))).scalar()
+        second = await _upserter().upsert(db, [
+            {"name": "Omar", "email": "omar@example.com"},
+            {"name": "Ahmed Ali", "email": "ahmed@example.sa"},
+        ])
+
+    assert first.written == 2 and first.ids == [1, 2]
+    assert second.written == 2 and second.ids == [3, 1]
+    assert await _rows(engine) == [
+        (1, "Ahmed Ali", "ahmed@example.sa"), (2, "Sara", "sara@example.com"), (3, "Omar", "omar@example.com")
+    ]
+    async with AsyncSession(engine) as db:
+        # Defaulted columns are not overwritten on conflict
+        assert (await db.execute(select(_Customer.created_at).where(_Customer.id == 1))).scalar() == created
+
+
+@pytest.mark.asyncio
+async def test_duplicate_keys_in_one_chunk_keep_last_row(sqlite_engine):
+    """A key repeated within a chunk is written once, last row wins"""
+    engine = await sqlite_engine(_Base.metadata)
+
+    async with AsyncSession(engine) as db:
+        result = await _upserter().upsert(db, [
+            {"name": "First", "email": "dup@example.com"},
+            {"name": "Other", "email": "other@example.com"},
+            {"name": "Last", "email": "dup@example.com"},
+        ])
+
+    assert result.written == 3 and result.failed == 0
+    assert result.ids[0] == result.ids[2]
+    assert await _rows(engine) == [(1, "Other", "other@example.com"), (2, "Last", "dup@example.com")]
+
+
+@pytest.mark.asyncio
+async def test_bad_rows_are_isolated_from_their_chunk(sqlite_engine):
+    """Constraint violations and unknown columns fail only their own row"""
+    engine = await sqlite_engine(_Base.metadata)
+
+    rows = [{"name": f"Customer {i}", "email": f"c{i}@example.com"} for i in range(10)]
+    rows[3] = {"name": None, "email": "broken@example.com"}
+    rows[7] = {"name": "Typo", "emial": "typo@example.com"}
+
+    async with AsyncSession(engine) as db:
+        result = await _upserter(chunk_size=5).upsert(db, rows)
+
+    assert result.total == 10 and result.written == 8 and result.chunks == 2
+    assert [e.index for e in result.errors] == [3, 7]
+    assert "NOT NULL" in result.errors[0].error
+    assert "emial" in result.errors[1].error
+    assert result.ids[3] is None and result.ids[7] is None
+    assert len(await _rows(engine)) == 8
+
+
+@pytest.mark.asyncio
+async def test_streams_async_rows_with_progress(sqlite_engine):
+    """Async iterables are consumed chunk by chunk with a progress callback"""
+    engine = await sqlite_engine(_Base.metadata)
+    progress = []
+
+    async def rows():
+        for i in range(25):
+            yield {"name": f"Customer {i}", "email": None if i % 5 == 0 else f"c{i}@example.com"}
+
+    async with AsyncSession(engine) as db:
+        result = await bulk_upsert(
+            db, _Customer, rows(), ["email"], conflict_where=text("email IS NOT NULL"),
+            chunk_size=10, progress=lambda r: progress.append((r.total, r.written)),
+        )
+
+    assert progress == [(10, 10), (20, 20), (25, 25)]
+    # ids follow input order, including rows inserted without a key
+    async with AsyncSession(engine) as db:
+        names = dict((await db.execute(select(_Customer.id, _Customer.name))).all())
+    assert [names[i] for i in result.ids] == [f"Customer {i}" for i in range(25)]
+
+
+@pytest.mark.asyncio
+async def test_tenant_key_keeps_organizations_apart(sqlite_engine):
+    """The same email in two organizations is two customers; each upsert updates its own"""
+    engine = await sqlite_engine(_Base.metadata)
+    upserter = BulkUpserter(
+        _TenantCustomer, ["organization_id", "email"], conflict_where=text("email IS NOT NULL")
+    )
+
+    async with AsyncSession(engine) as db:
+        first = await upserter.upsert(db, [
+            {"organization_id": 1, "name": "Ahmed (org 1)", "email": "ahmed@example.sa"},
+            {"organization_id": 2, "name": "Ahmed (org 2)", "email": "ahmed@example.sa"},
+        ])
+        second = await upserter.upsert(db, [
+            {"organization_id": 2, "name": "Ahmed Ali (org 2)", "email": "ahmed@example.sa"},
+        ])
+        rows = (await db.execute(
+            select(_TenantCustomer.id, _TenantCustomer.organization_id, _TenantCustomer.name)
+            .order_by(_TenantCustomer.id)
+        )).all()
+
+    assert first.ids == [1, 2] and second.ids == [2]
+    assert [tuple(r) for r in rows] == [(1, 1, "Ahmed (org 1)"), (2, 2, "Ahmed Ali (org 2)")]
+
+
+@pytest.mark.asyncio
+async def test_update_where_and_reject_keep_rows_unwritten(sqlite_engine):
+    """Rows reject() names and conflicts update_where excludes are errors; the rest are written"""
+    engine = await sqlite_engine(_Base.metadata)
+    async with AsyncSession(engine) as db:
+        await db.execute(_TenantCustomer.__table__.insert(), [
+            {"id": 1, "organization_id": 1, "name": "Ahmed", "email": "ahmed@example.sa"},
+            {"id": 2, "organization_id": 2, "name": "Sara", "email": "sara@example.com"},
+        ])
+        await db.commit()
+
+    async def reject(db, rows):
+        return {p: "Blocked name" for p, row in enumerate(rows) if row["name"] == "Blocked"}
+
+    upserter = BulkUpserter(
+        _TenantCustomer, ["id"], update_where=_TenantCustomer.organization_id == 1, reject=reject
+    )
+    async with AsyncSession(engine) as db:
+        result = await upserter.upsert(db, [
+            {"id": 1, "organization_id": 1, "name": "Ahmed Ali"},
+            {"id": 2, "organization_id": 1, "name": "Sara (taken over)"},
+            {"organization_id": 1, "name": "Blocked"},
+            {"organization_id": 1, "name": "Omar"},
+        ])
+        rows = (await db.execute(
+            select(_TenantCustomer.id, _TenantCustomer.organization_id, _TenantCustomer.name)
+            .order_by(_TenantCustomer.id)
+        )).all()
+
+    assert result.written == 2 and result.ids == [1, None, None, 3]
+    assert [(e.index, e.error) for e in result.errors] == [
+        (1, "Existing row may not be updated"), (2, "Blocked name")
+    ]
+    assert [tuple(r) for r in rows] == [(1, 1, "Ahmed Ali"), (2, 2, "Sara"), (3, 1, "Omar")]
@@ -0,0 +1,518 @@
+"""
+Cache Tests - In-process cache tier and cache manager behaviour
+"""
+
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+from app.core.cache import (
+    CacheManager, HybridRateLimiter, LOCK_UNAVAILABLE, LocalCache, MISS, NOT_FOUND, RateLimiter,
+    _background_refreshes, cache_manager, cached
+)
+from app.core import cache as cache_module
+from app.core.cache_backends import MemoryBackend, RedisBackend
+from app.core.cache_codec import ValueSerializer, CacheCodecError
+from app.core.cache_metrics import CacheMetrics
+
+
+# ==================== L1 (LOCAL) CACHE ====================
+
+def test_local_cache_hit_and_miss():
+    """L1 returns stored values and counts hits/misses"""
+    local = LocalCache(max_entries=10, default_ttl=30)
+    local.set("user:1", {"name": "Ali"})
+
+    assert local.get("user:1") == (True, {"name": "Ali"})
+    assert local.get("user:2") == (False, None)
+
+    stats = local.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_local_cache_evicts_least_recently_used():
+    """Oldest untouched entry is evicted once the size bound is hit"""
+    local = LocalCache(max_entries=2, default_ttl=30)
+    local.set("a", 1)
+    local.set("b", 2)
+    local.get("a")
+    local.set("c", 3)
+
+    assert local.get("b") == (False, None)
+    assert local.get("a") == (True, 1)
+    assert local.get_stats()["evictions"] == 1
+
+
+def test_local_cache_ttl_is_capped(monkeypatch):
+    """Entries never outlive the L1 TTL even with a longer Redis TTL"""
+    import app.core.cache as cache_module
+
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+
+    local = LocalCache(max_entries=10, default_ttl=5)
+    local.set("stats", 42, ttl=3600)
+
+    now[0] += 6
+    assert local.get("stats") == (False, None)
+
+
+def test_local_cache_delete_pattern():
+    """Glob patterns drop matching entries only"""
+    local = LocalCache()
+    local.set("customer:1", 1)
+    local.set("customer:2", 2)
+    local.set("deal:1", 3)
+
+    assert local.delete_pattern("customer:*") == 2
+    assert local.get("deal:1") == (True, 3)
+
+
+# ==================== VALUE CODEC ====================
+
+def test_serializer_round_trips_json_shaped_values():
+    """Dicts/lists use the fast codec and decode unchanged"""
+    serializer = ValueSerializer(codec="json")
+    value = {"stages": {"lead": {"count": 3, "total_value": 1500.5}}, "win_rate": 40.0}
+
+    assert serializer.decode(serializer.encode(value)) == value
+
+
+def test_serializer_falls_back_to_pickle():
+    """Values the fast codec cannot represent still round-trip"""
+    serializer = ValueSerializer(codec="json")
+    value = {"created_at": datetime(2025, 1, 1, 9, 30)}
+
+    assert serializer.decode(serializer.encode(value)) == value
+
+
+def test_serializer_keeps_tuples_and_non_str_keys():
+    """JSON would turn these into lists and str keys; they go to pickle instead"""
+    value = {"by_id": {1: "lead", 2: "won"}, "range": (0, 100), "rows": [{"key": ("a", 1)}]}
+
+    for codec in ("json", "orjson", "msgpack"):
+        serializer = ValueSerializer(codec=codec)
+        decoded = serializer.decode(serializer.encode(value))
+        assert decoded == value
+        assert isinstance(decoded["range"], tuple)
+        assert list(decoded["by_id"]) == [1, 2]
+
+    serializer = ValueSerializer(codec="json")
+    assert serializer.encode(value)[3] == serializer._fallback.codec_id
+    assert serializer.encode({"range": [0, 100]})[3] == serializer.codec.codec_id
+
+
+def test_serializer_compresses_large_values():
+    """Payloads above the threshold are stored compressed"""
+    serializer = ValueSerializer(codec="json", compression_threshold=128)
+    value = ["customer@example.com"] * 200
+
+    encoded = serializer.encode(value)
+    assert len(encoded) < len(serializer.codec.dumps(value))
+    assert serializer.decode(encoded) == value
+
+
+def test_serializer_rejects_other_schema_versions():
+    """Entries written by another schema version are not decoded"""
+    old = ValueSerializer(codec="json", schema_version=1)
+    new = ValueSerializer(codec="json", schema_version=2)
+
+    with pytest.raises(CacheCodecError):
+        new.decode(old.encode({"a": 1}))
+
+
+# ==================== INSTRUMENTATION ====================
+
+def test_cache_metrics_group_by_prefix():
+    """Counters are split by the first key segment"""
+    metrics = CacheMetrics()
+    metrics.record_get("clv:1", True, 0.0002, tier="l1")
+    metrics.record_get("clv:2", False, 0.002)
+    metrics.record_set("clv:2", 128, 0.001)
+    metrics.record_get("pipeline_stats", True, 0.001)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["clv"]["hits"] == 1
+    assert snapshot["clv"]["l1_hits"] == 1
+    assert snapshot["clv"]["misses"] == 1
+    assert snapshot["clv"]["bytes_written"] == 128
+    assert snapshot["pipeline_stats"]["hit_rate"] == 100.0
+    assert 'omnicrm_cache_hits_total{prefix="clv"} 1' in metrics.to_prometheus()
+
+
+# ==================== MEMORY BACKEND ====================
+
+@pytest.mark.asyncio
+async def test_memory_backend_evicts_by_memory_budget():
+    """Least recently used entries go once the byte budget is exceeded"""
+    backend = MemoryBackend(max_memory_bytes=3 * (MemoryBackend.ENTRY_OVERHEAD + 110))
+    for key in ("k:1", "k:2", "k:3"):
+        await backend.set(key, b"x" * 100, ttl=60)
+
+    await backend.get_with_ttl("k:1")  # k:2 becomes least recently used
+    await backend.set("k:4", b"x" * 100, ttl=60)
+
+    assert await backend.exists("k:1")
+    assert not await backend.exists("k:2")
+    assert backend.evictions == 1
+    assert backend.used_bytes <= backend.max_memory_bytes
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_incr_keeps_window_ttl():
+    """Counters are created with the TTL and later increments keep it"""
+    backend = MemoryBackend()
+
+    assert await backend.incr("rate:1", 1, ttl=60) == 1
+    assert await backend.incr("rate:1", 1, ttl=60) == 2
+    assert 0 < await backend.ttl("rate:1") <= 60
+    assert await backend.ttl("missing") == -2
+
+
+@pytest.mark.asyncio
+async def test_cache_manager_runs_on_memory_backend():
+    """The full CacheManager API works without Redis"""
+    manager = CacheManager()
+    manager.use_backend(MemoryBackend())
+
+    assert await manager.set("clv:1", {"value": 10}, ttl=60, tags=["customer:1"])
+    await manager.set_many({"clv:2": 20, "score:2": 0.5}, ttl=60)
+
+    assert await manager.get("clv:1") == {"value": 10}
+    assert await manager.get_many(["clv:2", "clv:3"]) == [20, MISS]
+
+    assert await manager.invalidate_tags("customer:1") == 1
+    assert await manager.get("clv:1") is None
+
+    assert await manager.delete_pattern("clv:*") == 1
+    assert await manager.get("score:2") == 0.5
+
+    token = await manager.acquire_lock("lock:clv:2", 1000)
+    assert token and await manager.acquire_lock("lock:clv:2", 1000) is None
+    assert await manager.release_lock("lock:clv:2", token)
+
+    stats = await manager.get_stats()
+    assert stats["backend"] == "memory"
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_on_memory_backend():
+    """Rate limiting keeps working without Redis"""
+    limiter = RateLimiter(MemoryBackend())
+
+    results = [await limiter.is_allowed("rate_limit:ip:1", 3, 60) for _ in range(4)]
+
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert results[2][1]["remaining"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_token_bucket_refills(monkeypatch):
+    """Denied requests report when a token frees up; tokens refill over time"""
+    import app.core.cache_backends as backends
+
+    now = [1000.0]
+    monkeypatch.setattr(backends.time, "monotonic", lambda: now[0])
+    limiter = RateLimiter(MemoryBackend())
+
+    for _ in range(5):
+        assert (await limiter.is_allowed("rate_limit:user:1", 5, 60))[0]
+
+    allowed, info = await limiter.is_allowed("rate_limit:user:1", 5, 60)
+    assert not allowed
+    assert info["reset"] == 12  # one token every 60 / 5 seconds
+
+    now[0] += 12
+    allowed, info = await limiter.is_allowed("rate_limit:user:1", 5, 60)
+    assert allowed and info["remaining"] == 0
+
+
+@pytest.mark.asyncio
+async def test_hybrid_rate_limiter_admits_locally_and_reconciles(monkeypatch):
+    """Most checks skip the backend; sync debits them from the shared bucket"""
+    import app.core.cache_backends as backends
+
+    monkeypatch.setattr(backends.time, "monotonic", lambda: 1000.0)
+    backend = MemoryBackend()
+    hybrid = HybridRateLimiter(RateLimiter(backend), local_fraction=0.1, sync_interval=60)
+
+    results = [await hybrid.is_allowed("rate_limit:user:1", 100, 60) for _ in range(20)]
+
+    assert all(allowed for allowed, _ in results)
+    assert hybrid.exact_checks == 2  # 1 exact check buys 9 local admits
+    assert hybrid.local_admits == 18
+
+    await hybrid.stop()
+    _, remaining, _ = await backend.take_token("rate_limit:user:1", 100, 60, cost=0)
+    assert remaining == 80
+
+
+@pytest.mark.asyncio
+async def test_hybrid_rate_limiter_stays_exact_when_exhausted(monkeypatch):
+    """With the shared bucket empty every check goes to the backend and is denied"""
+    import app.core.cache_backends as backends
+
+    monkeypatch.setattr(backends.time, "monotonic", lambda: 1000.0)
+    backend = MemoryBackend()
+    await backend.take_token("rate_limit:ip:1", 100, 60, cost=100)
+    hybrid = HybridRateLimiter(RateLimiter(backend), local_fraction=0.1)
+
+    results = [await hybrid.is_allowed("rate_limit:ip:1", 100, 60) for _ in range(3)]
+
+    assert not any(allowed for allowed, _ in results)
+    assert hybrid.local_admits == 0
+    await hybrid.stop()
+
+
+# ==================== BATCH OPERATIONS ====================
+
+@pytest.mark.asyncio
+async def test_batch_operations_on_memory_backend():
+    """Mixed hits and misses come back in input order; ttls overrides ttl per key"""
+    manager = CacheManager()
+    manager.use_backend(MemoryBackend())
+
+    assert await manager.get_many([]) == []
+    assert await manager.set_many({}) is False
+    assert await manager.delete_many([]) == 0
+
+    assert await manager.set_many({"a": 1, "b": {"x": 2}, "c": [3]}, ttl=600, ttls={"b": 5})
+    assert await manager.get_many(["c", "missing", "a", "b"]) == [[3], MISS, 1, {"x": 2}]
+    assert await manager.backend.ttl("a") > 5
+    assert 0 < await manager.backend.ttl("b") <= 5
+
+    assert await manager.delete_many(["a", "missing"]) == 1
+    assert await manager.get_many(["a", "c"]) == [MISS, [3]]
+
+
+@pytest.mark.asyncio
+async def test_batch_operations_through_l1_and_redis():
+    """L1 answers what it holds; the rest comes from Redis in one pipeline and refills L1"""
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeAsyncRedis()
+    manager = CacheManager()
+    manager.backend = RedisBackend(client)
+    manager.local = LocalCache(max_entries=100, default_ttl=30)
+
+    assert await manager.get_many([]) == []
+    assert await manager.set_many({"a": 1, "b": 2}, ttl=600, ttls={"b": 5})
+    assert 599 <= await client.ttl("a") <= 600  # whole seconds left, rounded down
+    assert 4 <= await client.ttl("b") <= 5
+    assert manager.local.get("a") == (True, 1)
+
+    # Redis path: L1 is cold, one pipeline serves hits and misses
+    manager.local.clear()
+    hits, misses = manager.l2_hits, manager.l2_misses
+    assert await manager.get_many(["a", "missing", "b"]) == [1, MISS, 2]
+    assert (manager.l2_hits - hits, manager.l2_misses - misses) == (2, 1)
+    assert manager.local.get("b") == (True, 2)
+
+    # L1 path: served locally without asking Redis
+    await client.delete("a")
+    hits = manager.l2_hits
+    assert await manager.get_many(["a"]) == [1]
+    assert manager.l2_hits == hits
+
+    # delete_many drops Redis and L1 copies alike
+    assert await manager.delete_many(["a", "b", "missing"]) == 1
+    assert await manager.get_many(["a", "b"]) == [MISS, MISS]
+    await client.aclose()
+
+
+# ==================== NEGATIVE CACHING ====================
+
+@pytest.mark.asyncio
+async def test_not_found_is_distinct_from_cached_none():
+    """Negative entries round-trip as NOT_FOUND and clear on delete"""
+    manager = CacheManager()
+    manager.use_backend(MemoryBackend())
+
+    await manager.set_not_found("missing:customer:42", ttl=30)
+    await manager.set("setting:empty", None, ttl=30)
+
+    assert await manager.get("missing:customer:42") is NOT_FOUND
+    assert await manager.get("setting:empty") is None
+
+    await manager.delete("missing:customer:42")
+    assert await manager.get("missing:customer:42") is None
+
+
+@pytest.mark.asyncio
+async def test_cached_negative_ttl_skips_repeat_lookups(monkeypatch):
+    """A None result is cached as NOT_FOUND when negative_ttl is set"""
+    monkeypatch.setattr(cache_manager, "backend", MemoryBackend())
+    monkeypatch.setattr(cache_manager, "local", None)
+    calls = []
+
+    @cached(prefix="test_negative", ttl=60, negative_ttl=30)
+    async def find_deal(deal_id: int):
+        calls.append(deal_id)
+        return None
+
+    assert await find_deal(404) is None
+    assert await find_deal(404) is None
+    assert calls == [404]
+
+
+# ==================== STAMPEDE PROTECTION ====================
+
+@pytest.mark.asyncio
+async def test_cached_coalesces_concurrent_misses():
+    """Concurrent misses for one key run the wrapped function once"""
+    calls = []
+
+    @cached(prefix="test_coalesce", ttl=60)
+    async def expensive(org_id: int):
+        calls.append(org_id)
+        await asyncio.sleep(0.05)
+        return {"org_id": org_id}
+
+    results = await asyncio.gather(*[expensive(7) for _ in range(20)])
+
+    assert len(calls) == 1
+    assert all(r == {"org_id": 7} for r in results)
+
+
+class _LockFailingBackend(MemoryBackend):
+    """A backend whose lock command errors (e.g. Redis connection lost)"""
+
+    async def acquire_lock(self, key, token, ttl_ms):
+        raise ConnectionError("lock backend down")
+
+
+@pytest.mark.asyncio
+async def test_distributed_lock_computes_at_once_when_lock_unavailable(monkeypatch):
+    """A failing or missing lock backend is not mistaken for a held lock"""
+    assert await CacheManager().acquire_lock("lock:any", 1000) is LOCK_UNAVAILABLE
+
+    monkeypatch.setattr(cache_manager, "backend", _LockFailingBackend())
+    monkeypatch.setattr(cache_manager, "local", None)
+    assert await cache_manager.acquire_lock("lock:any", 1000) is LOCK_UNAVAILABLE
+
+    @cached(prefix="test_lock_down", ttl=60, distributed_lock=True, lock_timeout=5)
+    async def stats(org_id: int):
+        return {"org_id": org_id}
+
+    started = asyncio.get_running_loop().time()
+    assert await stats(3) == {"org_id": 3}
+    assert asyncio.get_running_loop().time() - started < 1  # not lock_timeout
+    assert await cache_manager.get("test_lock_down:3") == {"org_id": 3}
+
+
+# ==================== STALE-WHILE-REVALIDATE ====================
+
+class _Session:
+    """Stands in for a request-scoped DB session"""
+
+    def __init__(self):
+        self.closed = False
+
+
+async def _drain_refreshes():
+    while _background_refreshes:
+        await asyncio.gather(*list(_background_refreshes))
+
+
+async def _age_entry(key: str, **changes):
+    """Push an envelope's soft expiry into the past (or change its recompute cost)"""
+    entry = await cache_manager.get(key)
+    entry.update(changes or {"soft_expires_at": time.time() - 1})
+    await cache_manager.set(key, entry, 60)
+
+
+def _swr_cache(monkeypatch, **options):
+    """A @cached loader whose background refreshes use their own session"""
+    monkeypatch.setattr(cache_manager, "backend", MemoryBackend())
+    monkeypatch.setattr(cache_manager, "local", None)
+    calls = {"request": 0, "refresh": 0}
+
+    async def reload(db, org_id):
+        calls["refresh"] += 1
+        await asyncio.sleep(0.01)
+        return {"org_id": org_id, "version": calls["refresh"]}
+
+    @cached(
+        prefix="test_swr", ttl=60, stale_ttl=300, key_builder=lambda db, org_id: f"test_swr:{org_id}",
+        refresher=options.pop("refresher", reload), **options
+    )
+    async def load(db, org_id):
+        assert not db.closed
+        calls["request"] += 1
+        return {"org_id": org_id, "version": 0}
+
+    return load, calls
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_served_while_refresher_reloads(monkeypatch):
+    """Past the soft TTL the old value returns at once; the refresh gets its own session"""
+    load, calls = _swr_cache(monkeypatch)
+    db = _Session()
+    assert await load(db, 1) == {"org_id": 1, "version": 0}
+    db.closed = True  # the request that filled the entry is long gone
+
+    await _age_entry("test_swr:1")
+    stale_serves = cache_manager.stale_serves
+    assert await load(db, 1) == {"org_id": 1, "version": 0}
+    assert cache_manager.stale_serves == stale_serves + 1
+
+    await _drain_refreshes()
+    assert await load(db, 1) == {"org_id": 1, "version": 1}
+    assert calls == {"request": 1, "refresh": 1}
+
+
+@pytest.mark.asyncio
+async def test_xfetch_refreshes_expensive_entries_early(monkeypatch):
+    """With early_refresh_beta an expensive entry refreshes before its soft TTL"""
+    load, calls = _swr_cache(monkeypatch, early_refresh_beta=1.0)
+    await load(_Session(), 2)
+
+    assert await load(_Session(), 2) == {"org_id": 2, "version": 0}
+    await _drain_refreshes()
+    assert calls["refresh"] == 0  # cheap and fresh: no early refresh
+
+    await _age_entry("test_swr:2", delta=100.0)  # 100s to recompute, 60s left
+    monkeypatch.setattr(cache_module.random, "random", lambda: 0.5)
+    early_refreshes = cache_manager.early_refreshes
+    assert await load(_Session(), 2) == {"org_id": 2, "version": 0}
+    await _drain_refreshes()
+
+    assert cache_manager.early_refreshes == early_refreshes + 1
+    assert calls["refresh"] == 1
+    assert (await cache_manager.get("test_swr:2"))["value"]["version"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_stale_hits_share_one_refresh(monkeypatch):
+    """Many callers seeing the same stale entry start a single refresh"""
+    load, calls = _swr_cache(monkeypatch)
+    await load(_Session(), 3)
+    await _age_entry("test_swr:3")
+
+    results = await asyncio.gather(*[load(_Session(), 3) for _ in range(20)])
+    await _drain_refreshes()
+
+    assert all(r["version"] == 0 for r in results)
+    assert calls == {"request": 1, "refresh": 1}
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_serving_stale_value(monkeypatch, caplog):
+    """A refresher error is logged; the stale entry stays until a refresh succeeds"""
+    async def broken(db, org_id):
+        raise RuntimeError("replica down")
+
+    load, calls = _swr_cache(monkeypatch, refresher=broken)
+    await load(_Session(), 4)
+    await _age_entry("test_swr:4")
+
+    assert await load(_Session(), 4) == {"org_id": 4, "version": 0}
+    await _drain_refreshes()
+
+    assert "Background cache refresh failed for test_swr:4" in caplog.text
+    assert await load(_Session(), 4) == {"org_id": 4, "version": 0}
+    await _drain_refreshes()
+    assert calls["request"] == 1
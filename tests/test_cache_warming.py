@@ -0,0 +1,102 @@
+"""
+Cache Warming Tests - Warmer registry, schedules and the readiness gate
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.cache_warming import CacheWarmer
+
+
+def _counter():
+    calls = []
+
+    async def warm():
+        calls.append(1)
+    return warm, calls
+
+
+@pytest.mark.asyncio
+async def test_register_and_decorator_add_warmers():
+    """Both registration forms show up in the report as pending"""
+    warmer = CacheWarmer()
+    warm, calls = _counter()
+    warmer.register("pipeline_stats", warm, critical=True, interval=50)
+
+    @warmer.warmer("at_risk", interval=270)
+    async def warm_at_risk():
+        pass
+
+    assert warm_at_risk.__name__ == "warm_at_risk"  # decorator hands the function back
+    report = warmer.get_report()
+    assert list(report["warmers"]) == ["pipeline_stats", "at_risk"]
+    assert report["warmers"]["pipeline_stats"]["critical"] is True
+    assert report["warmers"]["at_risk"]["interval"] == 270
+    assert all(w["status"] == "pending" and w["runs"] == 0 for w in report["warmers"].values())
+
+    report = await warmer.run(["at_risk"])
+    assert report["warmers"]["at_risk"]["status"] == "ok"
+    assert calls == []  # only the named warmer ran
+
+
+@pytest.mark.asyncio
+async def test_readiness_waits_for_critical_warmers_only():
+    """Non-critical warmers never gate readiness; critical ones do until they run"""
+    warmer = CacheWarmer()
+    warmer.register("optional", _counter()[0])
+    assert warmer.is_ready
+
+    warmer = CacheWarmer()
+    warmer.register("critical", _counter()[0], critical=True)
+    warmer.register("optional", _counter()[0])
+    assert not warmer.is_ready
+    assert await warmer.wait_until_ready(timeout=0.01) is False
+
+    await warmer.run(["critical"])
+    assert warmer.is_ready
+    assert await warmer.wait_until_ready(timeout=0) is True
+    assert warmer.get_report()["warmers"]["optional"]["status"] == "pending"
+
+
+@pytest.mark.asyncio
+async def test_failed_and_slow_warmers_are_reported_but_unblock_readiness():
+    """Errors and timeouts land in the report; serving cold beats never serving"""
+    warmer = CacheWarmer(timeout=0.05)
+
+    async def broken():
+        raise RuntimeError("replica down")
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    warmer.register("broken", broken, critical=True)
+    warmer.register("slow", slow, critical=True)
+    report = await warmer.run()
+
+    assert report["warmers"]["broken"]["status"] == "failed"
+    assert report["warmers"]["broken"]["error"] == "replica down"
+    assert report["warmers"]["slow"]["status"] == "timeout"
+    assert report["ready"] is True
+
+
+@pytest.mark.asyncio
+async def test_start_rewarms_on_interval_until_stopped():
+    """start() warms once, then again every interval; stop() cancels the schedule"""
+    warmer = CacheWarmer()
+    scheduled, scheduled_calls = _counter()
+    once, once_calls = _counter()
+    warmer.register("scheduled", scheduled, interval=0.02)
+    warmer.register("once", once, critical=True)
+
+    warmer.start()
+    assert await warmer.wait_until_ready(timeout=1)
+    await asyncio.sleep(0.1)
+    await warmer.stop()
+
+    runs = len(scheduled_calls)
+    assert runs >= 3
+    assert once_calls == [1]
+
+    await asyncio.sleep(0.05)
+    assert len(scheduled_calls) == runs
@@ -0,0 +1,109 @@
+"""
+Count Tests - Trigger-maintained counters and catalog estimates (SQLite)
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import counts
+from app.core.counts import count_rows, exact_counts, install_row_counters
+
+
+async def _make_engine(sqlite_engine):
+    # A file database: scans run concurrently on separate connections
+    engine = await sqlite_engine(name="counts.db")
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE customers (id INTEGER PRIMARY KEY, organization_id INTEGER, name TEXT)"))
+        await conn.execute(text("CREATE TABLE messages (id INTEGER PRIMARY KEY, body TEXT)"))
+        await conn.execute(
+            text("INSERT INTO customers (organization_id, name) VALUES (:org, :name)"),
+            [{"org": 1 if i < 3 else 2, "name": f"Customer {i}"} for i in range(5)],
+        )
+        await conn.execute(text("INSERT INTO messages (body) VALUES ('hello'), ('world')"))
+    return engine
+
+
+@pytest.mark.asyncio
+async def test_counters_are_backfilled_and_follow_writes(sqlite_engine, sqlite_sessions):
+    """Inserts, deletes and tenant moves keep exact counts without scanning"""
+    engine = await _make_engine(sqlite_engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(install_row_counters, ["customers", "messages", "missing_table"])
+        await conn.run_sync(install_row_counters, ["customers", "messages"])  # idempotent, no double count
+
+    sessions = sqlite_sessions(engine)
+    tables = ["customers", "messages"]
+    assert await count_rows(tables, session_context=sessions) == {"customers": 5, "messages": 2}
+    assert await count_rows(["customers"], organization_id=1, session_context=sessions) == {"customers": 3}
+
+    async with engine.begin() as conn:
+        await conn.execute(text("INSERT INTO customers (organization_id, name) VALUES (2, 'New'), (2, 'Newer')"))
+        await conn.execute(text("DELETE FROM messages"))
+        await conn.execute(text("UPDATE customers SET organization_id = 2 WHERE id = 1"))
+        await conn.execute(text("UPDATE customers SET name = 'Renamed' WHERE id = 2"))
+
+    assert await count_rows(tables, session_context=sessions) == {"customers": 7, "messages": 0}
+    assert await count_rows(["customers"], organization_id=1, session_context=sessions) == {"customers": 2}
+    assert await count_rows(["customers"], organization_id=2, session_context=sessions) == {"customers": 5}
+
+    # A rolled-back insert leaves the counter untouched
+    async with engine.connect() as conn:
+        await conn.execute(text("INSERT INTO customers (organization_id, name) VALUES (1, 'Gone')"))
+        await conn.rollback()
+    assert await count_rows(["customers"], mode="scan", session_context=sessions) == {"customers": 7}
+    assert await count_rows(["customers"], session_context=sessions) == {"customers": 7}
+
+
+@pytest.mark.asyncio
+async def test_approximate_counts_use_statistics_then_fall_back(sqlite_engine, sqlite_sessions):
+    """sqlite_stat1 answers after ANALYZE; tables it cannot answer are counted another way"""
+    engine = await _make_engine(sqlite_engine)
+    sessions = sqlite_sessions(engine)
+
+    # No statistics, no counters: scanned
+    assert await count_rows(["customers", "messages"], mode="approximate", session_context=sessions) == {
+        "customers": 5, "messages": 2
+    }
+
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE"))
+        await conn.execute(text("INSERT INTO customers (organization_id, name) VALUES (1, 'After analyze')"))
+
+    counts = await count_rows(["customers", "messages"], mode="approximate", session_context=sessions)
+    assert counts == {"customers": 5, "messages": 2}  # statistics lag until the next ANALYZE
+
+    with pytest.raises(ValueError):
+        await count_rows(["customers"], mode="fast", session_context=sessions)
+
+
+@pytest.mark.asyncio
+async def test_counter_detection_expires(sqlite_engine, monkeypatch):
+    """Missing counters are cached briefly, found ones longer; a failed read forgets them"""
+    clock = [1000.0]
+    monkeypatch.setattr(counts, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    monkeypatch.setattr(counts, "_installed", {})
+    engine = await _make_engine(sqlite_engine)
+    key = str(engine.url)
+
+    async with AsyncSession(engine) as db:
+        assert await exact_counts(db, ["customers"]) == {"customers": None}
+    assert counts._installed[key] == (1000.0 + counts.INSTALLED_RETRY_TTL, set())
+
+    async with engine.begin() as conn:
+        await conn.run_sync(install_row_counters, ["customers"])
+    async with AsyncSession(engine) as db:
+        assert await exact_counts(db, ["customers"]) == {"customers": 5}
+    assert counts._installed[key] == (1000.0 + counts.INSTALLED_TTL, {"customers"})
+
+    # Downgraded while cached: the read fails once, then counters are looked for again
+    async with engine.begin() as conn:
+        for trigger in ("insert", "delete", "move"):
+            await conn.execute(text(f"DROP TRIGGER customers_count_{trigger}"))
+        await conn.execute(text("DROP TABLE row_counts"))
+    async with AsyncSession(engine) as db:
+        with pytest.raises(Exception):
+            await exact_counts(db, ["customers"])
+        assert await exact_counts(db, ["customers"]) == {"customers": None}
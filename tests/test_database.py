@@ -0,0 +1,189 @@
+"""
+Database Tests - Read replica routing, connection pool telemetry
+"""
+
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import exc, text
+
+from app.core import pool_metrics
+from app.core.cache_backends import MemoryBackend
+from app.core.db_replicas import Replica, ReplicaRouter
+from app.core.pool_metrics import InstrumentedQueuePool, instrument_engine, track_request
+
+
+# ==================== REPLICA SELECTION ====================
+
+def test_replica_router_round_robins_healthy_replicas():
+    """Reads rotate across replicas and skip failed ones"""
+    replicas = [Replica("replica-1"), Replica("replica-2"), Replica("replica-3")]
+    router = ReplicaRouter(replicas)
+    router.mark_failed(replicas[1], "connection refused")
+
+    chosen = [router.choose().name for _ in range(4)]
+
+    assert chosen == ["replica-1", "replica-3", "replica-1", "replica-3"]
+
+
+def test_replica_router_falls_back_to_primary(monkeypatch):
+    """With every replica down reads use the primary until retry_after passes"""
+    import app.core.db_replicas as db_replicas
+
+    now = [1000.0]
+    monkeypatch.setattr(db_replicas.time, "monotonic", lambda: now[0])
+    replica = Replica("replica-1")
+    router = ReplicaRouter([replica], retry_after=30)
+    router.mark_failed(replica, "timeout")
+
+    assert router.choose() is None
+    assert router.primary_reads == 1
+
+    now[0] += 31
+    assert router.choose() is replica
+
+
+@pytest.mark.asyncio
+async def test_replica_health_check_skips_lagging_replicas():
+    """Replicas behind by more than max_lag are taken out of rotation"""
+    lags = {"replica-1": 0.2, "replica-2": 12.0}
+
+    async def probe(replica):
+        return lags[replica.name]
+
+    replicas = [Replica("replica-1"), Replica("replica-2")]
+    router = ReplicaRouter(replicas, max_lag=5.0, probe=probe)
+
+    await router.check_health()
+    assert [r.healthy for r in replicas] == [True, False]
+
+    lags["replica-2"] = 0.5
+    await router.check_health()
+    assert all(r.healthy for r in replicas)
+
+
+@pytest.mark.asyncio
+async def test_replica_health_check_marks_unreachable_replicas():
+    """A probe that raises or hangs marks the replica failed"""
+    async def probe(replica):
+        if replica.name == "replica-2":
+            await asyncio.sleep(10)
+        raise ConnectionError("refused")
+
+    replicas = [Replica("replica-1"), Replica("replica-2")]
+    router = ReplicaRouter(replicas, health_interval=0.05, probe=probe)
+
+    await router.check_health()
+
+    assert not any(r.healthy for r in replicas)
+    assert replicas[0].last_error == "refused"
+    assert replicas[1].last_error == "health check timed out"
+
+
+# ==================== READ-YOUR-WRITES ====================
+
+@pytest.mark.asyncio
+async def test_read_your_writes_pins_to_primary(monkeypatch):
+    """A client that just wrote reads from the primary for the window"""
+    import app.core.db_replicas as db_replicas
+
+    now = [1000.0]
+    monkeypatch.setattr(db_replicas.time, "monotonic", lambda: now[0])
+    router = ReplicaRouter([Replica("replica-1")], read_your_writes_window=5)
+
+    await router.record_write("auth:alice")
+
+    assert await router.is_pinned("auth:alice")
+    assert not await router.is_pinned("auth:bob")
+    assert router.choose(pinned=True) is None
+
+    now[0] += 6
+    assert not await router.is_pinned("auth:alice")
+
+
+@pytest.mark.asyncio
+async def test_read_your_writes_pins_are_shared_between_workers():
+    """Pins recorded by one worker are visible through the shared store"""
+    store = MemoryBackend()
+    writer = ReplicaRouter([Replica("replica-1")], pin_store=store)
+    reader = ReplicaRouter([Replica("replica-1")], pin_store=store)
+
+    await writer.record_write("ip:10.0.0.7")
+
+    assert await reader.is_pinned("ip:10.0.0.7")
+
+
+# ==================== POOL TELEMETRY ====================
+
+def _pooled_engine(tmp_path, **options):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    pytest.importorskip("aiosqlite")
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.3,
+    )
+    return engine, instrument_engine(engine, "test", **options)
+
+
+async def _hold_connection(engine, seconds: float):
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        await asyncio.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_pool_records_wait_hold_and_timeouts(tmp_path):
+    """Queuing for the only connection shows up as wait; pool_timeout as a timeout"""
+    engine, metrics = _pooled_engine(tmp_path, slow_wait_ms=50)
+
+    holder = asyncio.create_task(_hold_connection(engine, 0.15))
+    await asyncio.sleep(0.02)
+    await _hold_connection(engine, 0)  # queues behind the holder
+    await holder
+
+    assert metrics.checkouts == 2 and metrics.connects == 1
+    assert metrics.wait.percentile(1.0) >= 100
+    assert metrics.hold.percentile(1.0) >= 100
+    assert metrics.peak_checked_out == 1
+
+    holder = asyncio.create_task(_hold_connection(engine, 0.6))
+    await asyncio.sleep(0.02)
+    with pytest.raises(exc.TimeoutError):
+        await _hold_connection(engine, 0)
+    await holder
+
+    assert metrics.timeouts == 1
+    assert 'omnicrm_db_pool_timeouts_total{pool="test"} 1' in pool_metrics.to_prometheus()
+
+    await engine.dispose()
+    pool_metrics.pool_metrics.pop("test", None)
+
+
+@pytest.mark.asyncio
+async def test_pool_attributes_holds_to_call_sites_and_requests(tmp_path, monkeypatch):
+    """Hold time is summed per calling function and per request"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    monkeypatch.setattr(pool_metrics, "APP_ROOT", here)
+    monkeypatch.setattr(pool_metrics, "PROJECT_ROOT", os.path.dirname(here))
+    engine, metrics = _pooled_engine(tmp_path)
+
+    async def slow_report():
+        await _hold_connection(engine, 0.05)
+
+    async def request():
+        usage = track_request()
+        await slow_report()
+        await _hold_connection(engine, 0)
+        return usage
+
+    usage = await asyncio.create_task(request())
+
+    assert usage.checkouts == 2 and usage.hold_ms >= 50
+    top = metrics.top_sites()
+    assert "test_database.py:" in top[0]["site"] and top[0]["site"].endswith(" _hold_connection")
+    assert top[0]["checkouts"] == 2
+
+    await engine.dispose()
+    pool_metrics.pool_metrics.pop("test", None)
@@ -0,0 +1,171 @@
+"""
+Deal API Tests - Route responses mapped from the Deal model (SQLite)
+"""
+
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession
+
+pytest.importorskip("openai")  # crm_service pulls in the optional AI providers
+pytest.importorskip("anthropic")
+
+import httpx  # noqa: E402
+
+from app.api.routes.deals import router  # noqa: E402
+from app.core.cache import cache_manager  # noqa: E402
+from app.core.cache_backends import MemoryBackend  # noqa: E402
+from app.core.database import Base, get_read_db  # noqa: E402
+from app.models.customer import Customer  # noqa: E402
+from app.models.deal import Deal, DealStage  # noqa: E402
+from app.models.organization import Organization  # noqa: E402
+from app.models.user import User  # noqa: E402  (deals.owner_id references users)
+from app.services import crm_service  # noqa: E402
+from app.services.crm_service import CRMService, get_crm_service  # noqa: E402
+
+
+async def _make_app(sqlite_engine):
+    engine = await sqlite_engine(name="deals.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[
+            Organization.__table__, User.__table__, Customer.__table__, Deal.__table__
+        ])
+        await conn.execute(Customer.__table__.insert(), [
+            {"id": 1, "organization_id": 1, "name": "Ahmed"},
+            {"id": 2, "organization_id": 1, "name": "Sara"},
+            {"id": 3, "organization_id": 2, "name": "Omar"},
+        ])
+        await conn.execute(Deal.__table__.insert(), [
+            {"title": "Lead", "organization_id": 1, "customer_id": 1, "amount": 100.0, "currency": "SAR",
+             "stage": DealStage.LEAD, "probability": 20, "created_at": datetime(2026, 1, 1),
+             "actual_close_date": None},
+            {"title": "Won", "organization_id": 1, "customer_id": 1, "amount": 250.0, "currency": "SAR",
+             "stage": DealStage.CLOSED_WON, "probability": 100, "created_at": datetime(2026, 1, 2),
+             "actual_close_date": datetime(2026, 2, 1)},
+            {"title": "Lost", "organization_id": 1, "customer_id": 2, "amount": 75.0, "currency": "USD",
+             "stage": DealStage.CLOSED_LOST, "probability": 0, "created_at": datetime(2026, 1, 3),
+             "actual_close_date": None},
+        ])
+
+    async def read_db():
+        async with AsyncSession(engine) as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_read_db] = read_db
+    app.dependency_overrides[get_crm_service] = lambda: CRMService(None)
+    return app, engine
+
+
+@pytest.mark.asyncio
+async def test_list_deals_returns_model_columns(sqlite_engine):
+    """Pages carry amount as value and a status derived from the stage"""
+    app, _ = await _make_app(sqlite_engine)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/deals/", params={"limit": 2})
+        assert response.status_code == 200
+        page = response.json()
+        assert [d["title"] for d in page] == ["Lost", "Won"]
+        assert page[0]["value"] == 75.0
+        assert page[0]["stage"] == "closed_lost"
+        assert page[0]["status"] == "lost"
+        assert page[1]["status"] == "won"
+        assert page[1]["closed_at"] == "2026-02-01T00:00:00"
+        assert page[1]["tags"] == []
+
+        response = await client.get("/api/deals/", params={"limit": 2, "cursor": response.headers["X-Next-Cursor"]})
+        assert response.status_code == 200
+        assert [(d["title"], d["status"], d["value"]) for d in response.json()] == [("Lead", "active", 100.0)]
+
+
+@pytest.mark.asyncio
+async def test_failed_analytics_are_not_cached(sqlite_engine, monkeypatch):
+    """Errors propagate instead of caching {} / 0.0, so the next call recomputes"""
+    monkeypatch.setattr(cache_manager, "backend", MemoryBackend())
+    monkeypatch.setattr(cache_manager, "local", None)
+    app, engine = await _make_app(sqlite_engine)
+    empty = await sqlite_engine(name="empty.db")
+    crm = CRMService(None)
+
+    failures = [RuntimeError("aggregates unavailable")]
+    pipeline_totals = crm_service.pipeline_totals
+
+    async def flaky_totals(db, organization_id=None):
+        if failures:
+            raise failures.pop()
+        return await pipeline_totals(db, organization_id)
+
+    monkeypatch.setattr(crm_service, "pipeline_totals", flaky_totals)
+
+    async with AsyncSession(empty) as db:  # no deals table
+        with pytest.raises(Exception):
+            await crm.get_customer_lifetime_value(db, 1)
+    async with AsyncSession(engine) as db:
+        assert await crm.get_customer_lifetime_value(db, 1) == 250.0
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        assert (await client.get("/api/deals/pipeline/stats")).status_code == 500
+        response = await client.get("/api/deals/pipeline/stats")
+        assert response.status_code == 200
+        assert response.json()["total_won"] == 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_rejects_other_organizations_rows(sqlite_engine, monkeypatch):
+    """Another organization's deal ids and customers are errors; new rows get the caller's org"""
+    monkeypatch.setattr(cache_manager, "backend", MemoryBackend())
+    monkeypatch.setattr(cache_manager, "local", None)
+    _, engine = await _make_app(sqlite_engine)
+    crm = CRMService(None)
+
+    async with AsyncSession(engine) as db:
+        result = await crm.bulk_upsert_deals(db, [
+            {"id": 1, "title": "Taken over", "customer_id": 1},
+            {"title": "Foreign customer", "customer_id": 1},
+            {"title": "New", "customer_id": 2, "organization_id": 1},
+        ], organization_id=2)
+
+    assert result.written == 0
+    assert [(e.index, e.error) for e in result.errors] == [
+        (0, "Deal 1 not found"), (1, "Customer 1 not found"), (2, "Customer 2 not found")
+    ]
+
+    async with AsyncSession(engine) as db:
+        result = await crm.bulk_upsert_deals(db, [
+            {"title": "Expansion", "customer_id": 3, "organization_id": 1},
+        ], organization_id=2)
+        stored = (await db.execute(
+            Deal.__table__.select().where(Deal.id == result.ids[0])
+        )).one()
+        original = (await db.execute(Deal.__table__.select().where(Deal.id == 1))).one()
+
+    assert result.written == 1 and stored.organization_id == 2 and stored.customer_id == 3
+    assert (original.title, original.organization_id) == ("Lead", 1)
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_invalidates_previous_customer_and_missing_ids(sqlite_engine, monkeypatch):
+    """Moving a deal refreshes the customer it left; a cached miss for a written id is dropped"""
+    monkeypatch.setattr(cache_manager, "backend", MemoryBackend())
+    monkeypatch.setattr(cache_manager, "local", None)
+    _, engine = await _make_app(sqlite_engine)
+    crm = CRMService(None)
+
+    async with AsyncSession(engine) as db:
+        assert await crm.get_customer_lifetime_value(db, 1) == 250.0
+        assert await crm.get_deal(db, 99) is None
+        result = await crm.bulk_upsert_deals(db, [
+            {"id": 2, "title": "Won", "customer_id": 2},
+            {"id": 99, "title": "Imported", "customer_id": 2},
+        ], organization_id=1)
+        assert result.written == 2
+
+    async with AsyncSession(engine) as db:
+        assert await crm.get_customer_lifetime_value(db, 1) == 0.0
+        assert await crm.get_customer_lifetime_value(db, 2) == 250.0
+        assert (await crm.get_deal(db, 99)).title == "Imported"
@@ -0,0 +1,152 @@
+"""
+Export Tests - Streaming CSV / NDJSON export (SQLite)
+"""
+
+import csv
+import enum
+import io
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, DateTime, Enum, Integer, String
+from sqlalchemy.orm import DeclarativeBase
+
+from app.services.export_service import ExportBusy, ExportDataset, Exporter
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class _Channel(str, enum.Enum):
+    WHATSAPP = "whatsapp"
+    EMAIL = "email"
+
+
+class _Message(_Base):
+    __tablename__ = "messages"
+
+    id = Column(Integer, primary_key=True)
+    organization_id = Column(Integer, nullable=False)
+    customer_id = Column(Integer)
+    channel = Column(Enum(_Channel))
+    body = Column(String(500))
+    created_at = Column(DateTime, nullable=False)
+    deleted_at = Column(DateTime, nullable=True)
+
+
+DATASET = ExportDataset("messages", _Message, filters=("channel", "customer_id"))
+
+
+async def _make_engine(sqlite_engine, rows: int = 25):
+    engine = await sqlite_engine(_Base.metadata)
+    async with engine.begin() as conn:
+        await conn.execute(_Message.__table__.insert(), [
+            {
+                "id": i,
+                "organization_id": 2 if i == rows else 1,
+                "customer_id": i % 3,
+                "channel": _Channel.EMAIL if i % 5 == 0 else _Channel.WHATSAPP,
+                "body": f"مرحبا, \"{i}\"" if i == 1 else f"Message {i}",
+                "created_at": datetime(2024, 1, 1 + i % 28, 9, 30),
+                "deleted_at": datetime(2024, 3, 1) if i == 7 else None,
+            }
+            for i in range(1, rows + 1)
+        ])
+    return engine
+
+
+def _exporter(sessions, opened=None, **options):
+    @asynccontextmanager
+    async def session_context(consistency_key):
+        if opened is not None:
+            opened.append(consistency_key)
+        async with sessions() as db:
+            yield db
+    return Exporter(session_context, **options)
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+@pytest.mark.asyncio
+async def test_csv_streams_one_chunk_per_batch(sqlite_engine, sqlite_sessions):
+    """The header goes out before the query; then one chunk per cursor batch"""
+    engine = await _make_engine(sqlite_engine, 25)
+    opened = []
+    exporter = _exporter(sqlite_sessions(engine), opened, batch_size=10)
+    stream = exporter.stream(DATASET, "csv", DATASET.query(1), consistency_key="client")
+
+    header = await stream.__anext__()
+    assert header.startswith("\ufeff".encode("utf-8"))
+    assert opened == []  # first byte without touching the database
+
+    chunks = [header] + await _collect(stream)
+    assert len(chunks) == 4 and opened == ["client"]
+
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8-sig"))))
+    assert rows[0] == ["id", "organization_id", "customer_id", "channel", "body", "created_at", "deleted_at"]
+    assert rows[1] == ["1", "1", "1", "whatsapp", "مرحبا, \"1\"", "2024-01-02T09:30:00", ""]
+    assert [int(r[0]) for r in rows[1:]] == [i for i in range(1, 25) if i != 7]  # 25 is organization 2's
+
+
+@pytest.mark.asyncio
+async def test_ndjson_with_filters_and_resume(sqlite_engine, sqlite_sessions):
+    """Filters coerce query-string values; after_id resumes in id order"""
+    engine = await _make_engine(sqlite_engine, 25)
+
+    stmt = DATASET.query(1, after_id=10, filters={"channel": "email", "customer_id": "2"})
+    chunks = await _collect(_exporter(sqlite_sessions(engine)).stream(DATASET, "ndjson", stmt))
+    records = [json.loads(line) for line in b"".join(chunks).decode("utf-8").splitlines()]
+
+    assert records == [{
+        "id": 20, "organization_id": 1, "customer_id": 2, "channel": "email", "body": "Message 20",
+        "created_at": "2024-01-21T09:30:00", "deleted_at": None
+    }]
+
+    with pytest.raises(ValueError):
+        DATASET.query(1, filters={"body": "x"})
+    with pytest.raises(ValueError):
+        DATASET.query(1, filters={"channel": "fax"})
+
+
+@pytest.mark.asyncio
+async def test_soft_deleted_rows_only_on_request(sqlite_engine, sqlite_sessions):
+    """Only the organization's rows; deleted_at rows are left out unless include_deleted is passed"""
+    engine = await _make_engine(sqlite_engine, 10)
+
+    async def ids(stmt):
+        chunks = await _collect(_exporter(sqlite_sessions(engine)).stream(DATASET, "ndjson", stmt))
+        return [json.loads(line)["id"] for line in b"".join(chunks).decode("utf-8").splitlines()]
+
+    assert 7 not in await ids(DATASET.query(1))
+    assert await ids(DATASET.query(1, include_deleted=True)) == list(range(1, 10))
+    assert await ids(DATASET.query(2, include_deleted=True)) == [10]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_exports_are_capped(sqlite_engine, sqlite_sessions):
+    """check_capacity reserves a slot; the reserved stream gives it back"""
+    engine = await _make_engine(sqlite_engine, 5)
+    exporter = _exporter(sqlite_sessions(engine), max_concurrent=1)
+
+    exporter.check_capacity()
+    with pytest.raises(ExportBusy):  # reserved before the stream has started
+        exporter.check_capacity()
+
+    stream = exporter.stream(DATASET, "csv", DATASET.query(1), reserved=True)
+    await stream.__anext__()
+    assert exporter.active == 1
+    await stream.aclose()
+    assert exporter.active == 0
+
+    # Unreserved streams take their own slot
+    stream = exporter.stream(DATASET, "csv", DATASET.query(1))
+    await stream.__anext__()
+    with pytest.raises(ExportBusy):
+        exporter.check_capacity()
+    await stream.aclose()
+    assert exporter.active == 0
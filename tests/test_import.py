@@ -0,0 +1,207 @@
+"""
+Import Tests - Customer CSV/XLSX import pipeline (SQLite)
+"""
+
+import csv
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, DateTime, Index, Integer, String, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import DeclarativeBase
+
+from app.core.bulk import BulkUpserter
+from app.core.config import settings
+from app.services.import_service import (
+    CustomerImporter, ImportFileTooLarge, ImportManager, ErrorFile,
+    iter_records, map_columns, normalize_email, normalize_phone, normalize_tags
+)
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class _Customer(_Base):
+    __tablename__ = "customers"
+    __table_args__ = (
+        Index(
+            "uq_customers_org_email", "organization_id", "email", unique=True,
+            sqlite_where=text("email IS NOT NULL")
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    organization_id = Column(Integer, nullable=False)
+    name = Column(String(200), nullable=False)
+    email = Column(String(255))
+    phone = Column(String(20))
+    company = Column(String(200), nullable=False)  # NOT NULL so the database rejects some rows
+    status = Column(String(20), default="new")
+    tags = Column(String(500))
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+CSV_TEXT = (
+    "﻿Full Name;E-mail;Mobile;Company;Status;Tags;Favourite Colour\n"
+    "Ahmed Al-Shammari;Ahmed@Example.SA;050 123 4567;Noor Co;Qualified;vip, riyadh;blue\n"
+    "Sara Khan;sara@example.com;+44 20 7946 0958;Contoso;new;;green\n"
+    "Duplicate Ahmed;ahmed@example.sa;0551112222;Noor Co;;;red\n"
+    "Bad Email;not-an-email;;Globex;;;\n"
+    ";nobody@example.com;;Globex;;;\n"
+    "No Company;nocompany@example.com;٠٥٥٣٣٣٤٤٤٤;;;;\n"
+    "Omar;omar@example.com;00971 50 765 4321;Fabrikam;lost;;\n"
+)
+
+
+def _writer(engine, organization_id=1):
+    # As crm_writer: every row goes to one organization, keyed by (organization, email)
+    async def write(rows, progress):
+        async def scoped():
+            async for row in rows:
+                row["organization_id"] = organization_id
+                yield row
+
+        async with AsyncSession(engine) as db:
+            upserter = BulkUpserter(
+                _Customer, ["organization_id", "email"], conflict_where=text("email IS NOT NULL"),
+                chunk_size=2, progress=progress,
+            )
+            return await upserter.upsert(db, scoped())
+    return write
+
+
+def _importer():
+    return CustomerImporter(
+        max_lengths={"name": 200, "email": 255, "phone": 20, "company": 200},
+        choices={"status": {"new": "new", "qualified": "qualified", "lost": "lost"}},
+        default_country_code="966",
+    )
+
+
+def _read_errors(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.reader(f))
+
+
+def test_normalizers():
+    """Phones become E.164, emails lower-case, tags de-duplicated"""
+    assert normalize_phone("050 123 4567", "966") == "+966501234567"
+    assert normalize_phone("501234567", "966") == "+966501234567"
+    assert normalize_phone("(+1) 415-555-0100") == "+14155550100"
+    assert normalize_phone("00971507654321", "966") == "+971507654321"
+    assert normalize_phone("٠٥٠١٢٣٤٥٦٧", "966") == "+966501234567"
+    assert normalize_phone(966501234567.0, "966") == "+966501234567"
+    assert normalize_phone("  ") is None
+    with pytest.raises(ValueError):
+        normalize_phone("12345", "966")
+
+    assert normalize_email(" Sara@Example.COM ") == "sara@example.com"
+    assert normalize_email("mailto:a@b.co") == "a@b.co"
+    with pytest.raises(ValueError):
+        normalize_email("sara@example")
+
+    assert normalize_tags("vip; riyadh,vip") == "vip, riyadh"
+
+
+def test_headers_map_by_alias():
+    """English and Arabic header spellings map to columns; others are ignored"""
+    mapping, ignored = map_columns(["Full Name", "E-Mail", "رقم الجوال", "الشركة", "Score", None])
+    assert mapping == {0: "name", 1: "email", 2: "phone", 3: "company"}
+    assert ignored == ["Score"]
+
+
+@pytest.mark.asyncio
+async def test_pipeline_normalizes_validates_and_dedupes(sqlite_engine, tmp_path):
+    """Bad rows land in the error file with their file row number; the rest are upserted"""
+    engine = await sqlite_engine(_Base.metadata)
+    path = tmp_path / "customers.csv"
+    path.write_text(CSV_TEXT, encoding="utf-8")
+
+    importer = _importer()
+    result, error_file = await importer.run(
+        iter_records(str(path), "csv"), _writer(engine),
+        lambda header: ErrorFile(str(tmp_path / "errors.csv"), header),
+    )
+
+    assert (importer.processed, importer.invalid, importer.duplicates, importer.failed) == (7, 2, 1, 1)
+    assert result.written == 3
+    assert importer.ignored_columns == ["Favourite Colour"]
+
+    async with AsyncSession(engine) as db:
+        rows = (await db.execute(
+            select(_Customer.name, _Customer.email, _Customer.phone, _Customer.status, _Customer.tags)
+            .order_by(_Customer.id)
+        )).all()
+    assert [tuple(r) for r in rows] == [
+        ("Ahmed Al-Shammari", "ahmed@example.sa", "+966501234567", "qualified", "vip, riyadh"),
+        ("Sara Khan", "sara@example.com", "+442079460958", "new", None),
+        ("Omar", "omar@example.com", "+971507654321", "lost", None),
+    ]
+
+    errors = _read_errors(error_file.path)
+    assert errors[0][:3] == ["row", "error", "Full Name"]
+    assert [(row[0], row[1].split(":")[0]) for row in errors[1:]] == [
+        ("4", "Duplicate email in file"),
+        ("5", "Invalid email"),
+        ("6", "Missing name"),
+        ("7", "NOT NULL constraint failed"),
+    ]
+    assert errors[1][2] == "Duplicate Ahmed"
+
+
+@pytest.mark.asyncio
+async def test_manager_runs_upload_as_background_job(sqlite_engine, tmp_path, monkeypatch):
+    """An upload streamed in arbitrary chunks is spooled, imported and reported"""
+    monkeypatch.setattr(settings, "IMPORT_DIR", str(tmp_path))
+    engine = await sqlite_engine(_Base.metadata)
+    manager = ImportManager()
+    data = CSV_TEXT.encode("utf-8")
+
+    async def chunks(size):
+        for i in range(0, len(data), size):
+            yield data[i:i + size]
+
+    with pytest.raises(ImportFileTooLarge):
+        await manager.receive(chunks(16), "too-big.csv", max_bytes=100)
+    assert list(tmp_path.iterdir()) == []
+
+    job = await manager.receive(chunks(7), "customers.csv", organization_id=1)
+    await manager.start(job, _writer(engine), _importer())
+
+    assert await manager.get(job.id, organization_id=2) is None  # another tenant's job
+    status = await manager.get(job.id, organization_id=1)
+    assert status["status"] == "completed" and status["organization_id"] == 1
+    assert (status["processed"], status["written"], status["rejected"]) == (7, 3, 4)
+    assert status["has_error_file"]
+    assert len(_read_errors(manager.error_file(job.id))) == 5
+    assert manager.error_file("../../etc/passwd") is None
+
+
+@pytest.mark.asyncio
+async def test_xlsx_upload(sqlite_engine, tmp_path):
+    """The first worksheet of an XLSX file is imported like a CSV"""
+    openpyxl = pytest.importorskip("openpyxl")
+    engine = await sqlite_engine(_Base.metadata)
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Name", "Email", "Phone", "Company"])
+    sheet.append(["Layla", "LAYLA@example.com", 966551234567, "Tailspin"])
+    sheet.append([None, None, None, None])
+    sheet.append(["Khalid", "khalid@example.com", "0559876543", "Northwind"])
+    path = tmp_path / "customers.xlsx"
+    workbook.save(path)
+
+    importer = _importer()
+    result, error_file = await importer.run(
+        iter_records(str(path), "xlsx"), _writer(engine),
+        lambda header: ErrorFile(str(tmp_path / "errors.csv"), header),
+    )
+
+    assert result.written == 2 and error_file.count == 0
+    async with AsyncSession(engine) as db:
+        phones = (await db.execute(select(_Customer.email, _Customer.phone).order_by(_Customer.id))).all()
+    assert [tuple(p) for p in phones] == [
+        ("layla@example.com", "+966551234567"), ("khalid@example.com", "+966559876543")
+    ]
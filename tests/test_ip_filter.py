@@ -0,0 +1,69 @@
+"""
+IP Filter Tests - CIDR sets and hot-reloaded blocklists
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.ip_filter import IPBlocklist, IPNetworkSet
+
+
+def test_network_set_matches_addresses_and_ranges():
+    """Exact IPs, IPv4/IPv6 CIDRs and IPv4-mapped IPv6 addresses"""
+    networks = IPNetworkSet([
+        "192.0.2.1",
+        "198.51.100.0/24  # scanner range",
+        "2001:db8::/48",
+    ])
+
+    assert "192.0.2.1" in networks
+    assert "192.0.2.2" not in networks
+    assert "198.51.100.255" in networks
+    assert "::ffff:198.51.100.7" in networks
+    assert "2001:db8:0:ffff::1" in networks
+    assert "2001:db9::1" not in networks
+    assert "not-an-ip" not in networks
+
+
+def test_network_set_merges_ranges_and_skips_invalid():
+    """Adjacent and overlapping ranges collapse; bad lines are counted"""
+    networks = IPNetworkSet(["10.0.0.0/25", "10.0.0.128/25", "10.0.0.7", "bogus", ""])
+
+    assert len(networks) == 1
+    assert networks.invalid == 1
+    assert "10.0.0.200" in networks
+
+
+@pytest.mark.asyncio
+async def test_blocklist_reloads_when_file_changes(tmp_path):
+    """reload() swaps in a new set only when the file changed"""
+    path = tmp_path / "blocklist.txt"
+    path.write_text("203.0.113.0/24\n")
+    blocklist = IPBlocklist(str(path))
+
+    assert await blocklist.reload()
+    assert "203.0.113.50" in blocklist
+    assert not await blocklist.reload()
+
+    path.write_text("198.51.100.0/24\n")
+    assert await blocklist.reload(force=True)
+    assert "203.0.113.50" not in blocklist
+    assert "198.51.100.50" in blocklist
+
+
+@pytest.mark.asyncio
+async def test_blocklist_stop_cancels_reload_task(tmp_path):
+    """stop() cancels the reload task start() spawned"""
+    path = tmp_path / "blocklist.txt"
+    path.write_text("203.0.113.0/24\n")
+    blocklist = IPBlocklist(str(path), reload_interval=3600)
+
+    blocklist.start()
+    task = blocklist._task
+    await asyncio.sleep(0)
+    assert blocklist.started and not task.done()
+
+    await blocklist.stop()
+    assert task.cancelled()
+    assert not blocklist.started
@@ -0,0 +1,228 @@
+"""
+Middleware Tests - Pure-ASGI security / logging / error pipeline
+"""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.cache import cache_manager
+from app.core.cache_backends import MemoryBackend
+from app.middleware.error_handler import ErrorHandlerMiddleware
+from app.middleware.pipeline import build_pipeline, default_layers, install_pipeline
+from app.middleware.security import (
+    CSRFProtectionMiddleware,
+    IPFilterMiddleware,
+    RateLimitMiddleware,
+    RequestValidationMiddleware,
+)
+
+
+# ==================== FIXTURES ====================
+
+def make_app(layers) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.post("/api/items")
+    async def create_item():
+        return {"created": True}
+
+    @app.post("/api/upload")
+    async def upload(request: Request):
+        return {"bytes": len(await request.body())}
+
+    @app.get("/api/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    install_pipeline(app, layers)
+    return app
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    """Rate limiter shares the cache backend; use the in-process one"""
+    monkeypatch.setattr(cache_manager, "backend", MemoryBackend())
+    monkeypatch.setattr(cache_manager, "local", None)
+
+
+# ==================== PIPELINE ====================
+
+def test_pipeline_orders_layers_outermost_first():
+    """build_pipeline wraps so the first layer sees the request first"""
+    async def endpoint(scope, receive, send):
+        pass
+
+    app = build_pipeline(endpoint, default_layers(security=True))
+
+    order = []
+    while hasattr(app, "app"):
+        order.append(type(app).__name__)
+        app = app.app
+
+    assert order == [
+        "LoggingMiddleware",
+        "ErrorHandlerMiddleware",
+        "IPFilterMiddleware",
+        "RequestValidationMiddleware",
+        "RateLimitMiddleware",
+        "CSRFProtectionMiddleware",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_pipeline_passes_streaming_bodies_through(memory_cache):
+    """Chunks reach the server one by one instead of being buffered"""
+    async def chunks():
+        for i in range(3):
+            yield f"chunk-{i}\n"
+
+    async def endpoint(scope, receive, send):
+        await StreamingResponse(chunks())(scope, receive, send)
+
+    app = build_pipeline(endpoint, default_layers(security=True))
+    scope = {
+        "type": "http", "method": "GET", "path": "/api/export", "headers": [],
+        "query_string": b"", "client": ("10.0.0.1", 1234), "state": {}
+    }
+    sent = []
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()  # Client stays connected
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+
+    bodies = [m["body"] for m in sent if m["type"] == "http.response.body" and m.get("body")]
+    assert bodies == [b"chunk-0\n", b"chunk-1\n", b"chunk-2\n"]
+
+
+# ==================== LAYERS ====================
+
+def test_error_handler_returns_json_500():
+    """Unhandled exceptions become the JSON error body"""
+    client = TestClient(make_app([(ErrorHandlerMiddleware, {})]), raise_server_exceptions=False)
+
+    response = client.get("/api/boom")
+
+    assert response.status_code == 500
+    assert response.json()["message"] == "boom"
+
+
+@pytest.mark.asyncio
+async def test_ip_filter_blocks_cidr_ranges():
+    """Blacklisted ranges are denied; protected paths need a whitelisted range"""
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    app = IPFilterMiddleware(
+        endpoint,
+        whitelist=["10.0.0.0/8"],
+        blacklist=["203.0.113.0/24", "2001:db8::/32"]
+    )
+
+    async def status_for(ip: str, path: str = "/api/ping") -> int:
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": path, "headers": [], "client": (ip, 1)}
+        await app(scope, None, send)
+        return sent[0]["status"]
+
+    assert await status_for("203.0.113.9") == 403
+    assert await status_for("2001:db8::1") == 403
+    assert await status_for("198.51.100.1") == 200
+    assert await status_for("198.51.100.1", "/api/admin/users") == 403
+    assert await status_for("10.1.2.3", "/api/admin/users") == 200
+
+
+def test_rate_limit_sets_headers_and_rejects(memory_cache):
+    """Allowed responses carry X-RateLimit-* headers; the limit returns 429"""
+    app = make_app([(RateLimitMiddleware, {})])
+    client = TestClient(app)
+
+    first = client.get("/api/ping")
+    assert first.status_code == 200
+    assert first.headers["X-RateLimit-Limit"] == "100"
+
+    statuses = [client.get("/api/ping").status_code for _ in range(100)]
+    assert statuses[-1] == 429
+
+
+def test_csrf_requires_matching_tokens():
+    """State-changing requests need the header to match the cookie"""
+    client = TestClient(make_app([(CSRFProtectionMiddleware, {})]))
+
+    assert client.post("/api/items").status_code == 403
+
+    client.cookies.set("csrf_token", "abc")
+    assert client.post("/api/items", headers={"X-CSRF-Token": "abc"}).status_code == 200
+
+
+def streamed_request(chunks, content_type=b"application/json"):
+    """Scope/receive for a chunked upload with no Content-Length"""
+    scope = {
+        "type": "http", "method": "POST", "path": "/api/upload",
+        "headers": [(b"content-type", content_type)], "client": ("10.0.0.1", 1)
+    }
+    pulled = []
+
+    async def receive():
+        chunk = chunks[len(pulled)]
+        pulled.append(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": len(pulled) < len(chunks)}
+
+    return scope, receive, pulled
+
+
+@pytest.mark.asyncio
+async def test_body_limit_aborts_stream_without_buffering():
+    """The read that crosses the limit stops the upload with a 413"""
+    async def endpoint(scope, receive, send):
+        more_body = True
+        while more_body:
+            message = await receive()
+            more_body = message["more_body"]
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    app = RequestValidationMiddleware(endpoint, max_body_size=1000)
+    scope, receive, pulled = streamed_request([b"x" * 400] * 50)
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+
+    assert sent[0]["status"] == 413
+    assert len(pulled) == 3  # stopped at 1200 bytes, not 20000
+
+
+def test_body_limit_applies_inside_fastapi_routes():
+    """Routes reading the body get a 413, not FastAPI's generic 400"""
+    app = make_app([(RequestValidationMiddleware, {"max_body_size": 1000})])
+    client = TestClient(app)
+
+    def chunks(size):
+        for _ in range(size // 100):
+            yield b"x" * 100
+
+    headers = {"content-type": "application/json"}
+    assert client.post("/api/upload", content=chunks(500), headers=headers).json() == {"bytes": 500}
+    assert client.post("/api/upload", content=chunks(5000), headers=headers).status_code == 413
@@ -0,0 +1,89 @@
+"""
+Pagination Tests - Keyset cursors and page walking
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, String, select
+from sqlalchemy.orm import DeclarativeBase
+
+from app.core.pagination import (
+    InvalidCursor, build_page, decode_cursor, encode_cursor, keyset_paginate
+)
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class _Row(_Base):
+    __tablename__ = "rows"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+
+async def _make_engine(sqlite_engine):
+    engine = await sqlite_engine(_Base.metadata)
+    base = datetime(2026, 1, 1)
+    async with engine.begin() as conn:
+        # Pairs of rows share a timestamp so the id tiebreaker matters
+        await conn.execute(_Row.__table__.insert(), [
+            {"id": i, "name": f"row-{i % 7}", "created_at": base + timedelta(minutes=i // 2)}
+            for i in range(1, 51)
+        ])
+    return engine
+
+
+async def _walk(engine, sort, column, descending, limit=8):
+    seen, cursor, pages = [], None, 0
+    while True:
+        stmt = keyset_paginate(select(_Row), [column, _Row.id], cursor, limit, sort, descending)
+        async with engine.connect() as conn:
+            rows = (await conn.execute(stmt)).all()
+        page = build_page(rows, limit, sort, descending, key=lambda r: (getattr(r, sort), r.id))
+        seen.extend(r.id for r in page.items)
+        pages += 1
+        if not page.has_more:
+            return seen, pages
+        cursor = page.next_cursor
+
+
+def test_cursor_round_trips_datetimes():
+    """Cursor values decode to the types they were issued with"""
+    created = datetime(2026, 3, 1, 12, 30, 15, 250)
+    cursor = encode_cursor("-created_at", [created, 42])
+
+    assert decode_cursor(cursor, "-created_at", 2) == [created, 42]
+
+
+def test_cursor_is_bound_to_its_sort():
+    """Cursors from another sort order or garbage input are rejected"""
+    cursor = encode_cursor("-created_at", [datetime(2026, 1, 1), 1])
+
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "created_at", 2)
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor", "-created_at", 2)
+
+
+@pytest.mark.asyncio
+async def test_keyset_walk_visits_every_row_once(sqlite_engine):
+    """Walking all pages newest-first yields each row exactly once, in order"""
+    engine = await _make_engine(sqlite_engine)
+    seen, pages = await _walk(engine, "created_at", _Row.created_at, descending=True)
+
+    assert seen == list(range(50, 0, -1))
+    assert pages == 7
+
+
+@pytest.mark.asyncio
+async def test_keyset_walk_on_non_unique_sort_key(sqlite_engine):
+    """Duplicate sort values are split across pages without gaps or repeats"""
+    engine = await _make_engine(sqlite_engine)
+    seen, _ = await _walk(engine, "name", _Row.name, descending=False, limit=5)
+
+    assert sorted(seen) == list(range(1, 51))
+    assert seen == sorted(seen, key=lambda i: (f"row-{i % 7}", i))
@@ -0,0 +1,206 @@
+"""
+Pipeline Aggregate Tests - Incremental deltas and reconciliation (SQLite)
+"""
+
+import enum
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, DateTime, Enum, Float, Integer, String, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import DeclarativeBase
+
+from app.core import pipeline_aggregates
+from app.core.bulk import BulkUpserter
+from app.core.pipeline_aggregates import (
+    PipelineReconciler, add_deal, bulk_write_hooks, install_pipeline_aggregates, pipeline_totals,
+    reconcile_pipeline_aggregates, remove_deal
+)
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class _Stage(str, enum.Enum):
+    LEAD = "lead"
+    PROPOSAL = "proposal"
+    CLOSED_WON = "closed_won"
+    CLOSED_LOST = "closed_lost"
+
+
+class _Deal(_Base):
+    """The Deal model's aggregated columns (stage stored by enum name), plus the tenant column"""
+    __tablename__ = "deals"
+
+    id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, nullable=False)
+    organization_id = Column(Integer, nullable=False)
+    title = Column(String(200), nullable=False)
+    amount = Column(Float, default=0.0, nullable=False)
+    stage = Column(Enum(_Stage), default=_Stage.LEAD)
+    probability = Column(Integer, default=0)
+    deleted_at = Column(DateTime, nullable=True)
+
+
+SEED = [
+    {"organization_id": 1, "stage": _Stage.LEAD, "amount": 100.0, "probability": 20},
+    {"organization_id": 1, "stage": _Stage.LEAD, "amount": 300.0, "probability": 40},
+    {"organization_id": 1, "stage": _Stage.CLOSED_WON, "amount": 50.0, "probability": 100},
+    {"organization_id": 2, "stage": _Stage.PROPOSAL, "amount": 1000.0, "probability": 50},
+]
+
+
+async def _make_engine(sqlite_engine, install: bool = True):
+    engine = await sqlite_engine(_Base.metadata, name="pipeline.db")
+    async with engine.begin() as conn:
+        await conn.execute(_Deal.__table__.insert(), [
+            {"customer_id": 1, "title": f"Deal {i}", **row} for i, row in enumerate(SEED)
+        ])
+        if install:
+            await conn.run_sync(install_pipeline_aggregates)
+    return engine
+
+
+@pytest.mark.asyncio
+async def test_backfill_and_incremental_deltas(sqlite_engine):
+    """Create, stage change and delete move totals without regrouping deals"""
+    engine = await _make_engine(sqlite_engine)
+
+    async with AsyncSession(engine) as db:
+        assert await pipeline_totals(db) == {
+            (1, "lead", "active"): (2, 400.0, 60.0),
+            (1, "closed_won", "won"): (1, 50.0, 100.0),
+            (2, "proposal", "active"): (1, 1000.0, 50.0),
+        }
+
+        # Create
+        db.add(_Deal(id=10, customer_id=2, organization_id=1, title="New", amount=200.0, probability=20))
+        await db.flush()
+        assert await add_deal(db, 10)
+        # Stage change: out of the old group, into the new one
+        await remove_deal(db, 10)
+        deal = await db.get(_Deal, 10)
+        deal.stage, deal.probability = _Stage.CLOSED_LOST, 0
+        await db.flush()
+        await add_deal(db, 10)
+        await db.commit()
+
+        totals = await pipeline_totals(db, organization_id=1)
+        assert totals[(1, "lead", "active")] == (2, 400.0, 60.0)
+        assert totals[(1, "closed_lost", "lost")] == (1, 200.0, 0.0)
+
+        # Soft delete drops the deal from the totals; hard delete likewise
+        await remove_deal(db, 1)
+        await db.execute(text("UPDATE deals SET deleted_at = :now WHERE id = 1"), {"now": datetime.utcnow()})
+        await add_deal(db, 1)
+        await remove_deal(db, 2)
+        await db.execute(text("DELETE FROM deals WHERE id = 2"))
+        await db.commit()
+        assert (1, "lead", "active") not in await pipeline_totals(db, organization_id=1)
+
+        # A rollback takes the delta with it
+        await remove_deal(db, 3)
+        await db.rollback()
+        assert (await pipeline_totals(db, organization_id=1))[(1, "closed_won", "won")] == (1, 50.0, 100.0)
+
+        assert await reconcile_pipeline_aggregates(db) == 0
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_applies_deltas_per_chunk(sqlite_engine):
+    """Updates, inserts and rejected rows leave the totals matching the deals"""
+    engine = await _make_engine(sqlite_engine)
+    upserter = BulkUpserter(_Deal, ["id"], chunk_size=2, **bulk_write_hooks())
+
+    async with AsyncSession(engine) as db:
+        result = await upserter.upsert(db, [
+            {"id": 1, "customer_id": 1, "organization_id": 1, "title": "Deal 0", "stage": _Stage.PROPOSAL},
+            {"customer_id": 3, "organization_id": 2, "title": "Inserted", "amount": 10.0, "probability": 10},
+            {"id": 2, "customer_id": 1, "organization_id": 1, "title": None},  # NOT NULL: rejected
+            {"id": 3, "customer_id": 1, "organization_id": 1, "title": "Deal 2", "stage": _Stage.CLOSED_LOST},
+        ])
+        assert (result.written, result.failed, result.chunks) == (3, 1, 2)
+
+        assert await pipeline_totals(db) == {
+            (1, "proposal", "active"): (1, 100.0, 20.0),
+            (1, "lead", "active"): (1, 300.0, 40.0),
+            (1, "closed_lost", "lost"): (1, 50.0, 100.0),
+            (2, "proposal", "active"): (1, 1000.0, 50.0),
+            (2, "lead", "active"): (1, 10.0, 10.0),
+        }
+        assert await reconcile_pipeline_aggregates(db) == 0
+
+
+@pytest.mark.asyncio
+async def test_reconciliation_corrects_drift(sqlite_engine, sqlite_sessions):
+    """Writes that bypass the deltas are found and fixed by the reconciler"""
+    engine = await _make_engine(sqlite_engine)
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE deals SET stage = 'CLOSED_WON' WHERE organization_id = 2"))
+        await conn.execute(text("DELETE FROM deals WHERE stage = 'CLOSED_WON' AND organization_id = 1"))
+
+    reconciler = PipelineReconciler(sqlite_sessions(engine), interval=0)
+    assert await reconciler.run_once() == 3
+    assert reconciler.get_stats() == {"runs": 1, "corrected_groups": 3, "last_error": None}
+
+    async with AsyncSession(engine) as db:
+        assert await pipeline_totals(db) == {
+            (1, "lead", "active"): (2, 400.0, 60.0),
+            (2, "closed_won", "won"): (1, 1000.0, 50.0),
+        }
+        assert (await db.execute(text("SELECT count(*) FROM pipeline_aggregates"))).scalar() == 2
+
+    assert await reconciler.run_once() == 0
+
+
+@pytest.mark.asyncio
+async def test_totals_group_deals_without_aggregates(sqlite_engine):
+    """Not installed: deltas are no-ops and totals come from the deals table"""
+    engine = await _make_engine(sqlite_engine, install=False)
+
+    async with AsyncSession(engine) as db:
+        assert await add_deal(db, 1) is False
+        assert await pipeline_totals(db, organization_id=2) == {(2, "proposal", "active"): (1, 1000.0, 50.0)}
+        assert await reconcile_pipeline_aggregates(db) == 0
+
+
+@pytest.mark.asyncio
+async def test_install_skips_deals_without_aggregated_columns(sqlite_engine, caplog):
+    """A deals table without the model's columns is left alone instead of failing init"""
+    engine = await sqlite_engine(name="legacy.db")
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE deals (id INTEGER PRIMARY KEY, stage TEXT, value REAL)"))
+        await conn.run_sync(install_pipeline_aggregates)
+        tables = (await conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))).scalars().all()
+
+    assert tables == ["deals"]
+    assert "pipeline aggregates not installed" in caplog.text
+    async with AsyncSession(engine) as db:
+        assert await pipeline_totals(db) == {}
+
+
+@pytest.mark.asyncio
+async def test_detection_is_cached_for_a_while_and_misses_briefly(sqlite_engine, monkeypatch):
+    """An install found is trusted for STATE_TTL; a missing table is looked for again after STATE_RETRY_TTL"""
+    clock = [1000.0]
+    monkeypatch.setattr(pipeline_aggregates, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    monkeypatch.setattr(pipeline_aggregates, "_state", {})
+    engine = await _make_engine(sqlite_engine, install=False)
+
+    async with AsyncSession(engine) as db:
+        assert not await add_deal(db, 1)
+        async with engine.begin() as conn:
+            await conn.run_sync(pipeline_aggregates.pipeline_aggregates.create)
+        assert not await add_deal(db, 1)  # the miss is still cached
+
+        clock[0] += pipeline_aggregates.STATE_RETRY_TTL
+        assert await add_deal(db, 1)
+        await db.commit()
+
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP TABLE pipeline_aggregates"))
+    async with AsyncSession(engine) as db:
+        with pytest.raises(Exception):
+            await add_deal(db, 1)  # still cached as installed: the write fails and drops the entry
+        assert not await add_deal(db, 1)
@@ -0,0 +1,106 @@
+"""
+Search Tests - Customer full-text search (SQLite FTS5 path)
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, String, delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import DeclarativeBase
+
+from app.core.search import (
+    apply_customer_search, classify_query, install_customer_search, normalize_text, search_mode
+)
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class _Customer(_Base):
+    __tablename__ = "customers"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(200), nullable=False)
+    email = Column(String(255))
+    phone = Column(String(20))
+    company = Column(String(200))
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+CUSTOMERS = [
+    {"id": 1, "name": "أحمد الشمري", "email": "ahmed@example.sa", "phone": "+966 50 123 4567", "company": "شركة النور"},
+    {"id": 2, "name": "Mohammed Ali", "email": "m.ali@contoso.com", "phone": "055-987-6543", "company": "Contoso"},
+    {"id": 3, "name": "Sara Khan", "email": "sara@mohammed-trading.com", "phone": None, "company": "Mohammed Trading"},
+]
+
+
+async def _make_engine(sqlite_engine, install_first: bool = False):
+    """Customers table with search installed before or after the rows exist"""
+    engine = await sqlite_engine(_Base.metadata)
+    async with engine.begin() as conn:
+        if install_first:
+            await conn.run_sync(install_customer_search)
+        await conn.execute(_Customer.__table__.insert(), CUSTOMERS)
+        if not install_first:
+            await conn.run_sync(install_customer_search)
+    return engine
+
+
+async def _search(engine, query):
+    async with AsyncSession(engine) as db:
+        stmt, rank = apply_customer_search(select(_Customer.id), _Customer, query, await search_mode(db))
+        return list((await db.execute(stmt.order_by(rank.desc(), _Customer.id))).scalars())
+
+
+def test_query_classification_and_arabic_folding():
+    """Email/phone fragments are routed to trigram matching; Arabic forms fold"""
+    assert classify_query("Ali@Contoso") == ("email", "ali@contoso")
+    assert classify_query("050 123-45") == ("phone", "5012345")
+    assert classify_query("احمد 12") == ("words", "احمد 12")
+    assert normalize_text("أحمد مُحَمَّد") == normalize_text("احمد محمد")
+
+
+@pytest.mark.asyncio
+async def test_fts_matches_words_prefixes_and_arabic_variants(sqlite_engine):
+    """Backfilled rows are found by prefix, case and Arabic letter variants"""
+    engine = await _make_engine(sqlite_engine, install_first=False)
+
+    assert await _search(engine, "احمد") == [1]
+    assert await _search(engine, "النور") == [1]
+    assert await _search(engine, "MOHA") == [2, 3]
+    assert await _search(engine, "sara khan") == [3]
+
+
+@pytest.mark.asyncio
+async def test_fts_ranks_name_matches_above_other_fields(sqlite_engine):
+    """A name hit outranks a company/email hit for the same word"""
+    engine = await _make_engine(sqlite_engine, install_first=True)
+
+    assert await _search(engine, "mohammed") == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_contact_fragments_match_inside_emails_and_phones(sqlite_engine):
+    """Phone digits match regardless of formatting and trunk zero"""
+    engine = await _make_engine(sqlite_engine, install_first=True)
+
+    assert await _search(engine, "0501234567") == [1]
+    assert await _search(engine, "987 65") == [2]
+    assert await _search(engine, "@contoso") == [2]
+
+
+@pytest.mark.asyncio
+async def test_triggers_keep_index_in_sync(sqlite_engine):
+    """Updates and deletes are reflected in search results"""
+    engine = await _make_engine(sqlite_engine, install_first=True)
+
+    async with engine.begin() as conn:
+        await conn.execute(update(_Customer).where(_Customer.id == 2).values(name="Omar Ali"))
+        await conn.execute(delete(_Customer).where(_Customer.id == 1))
+
+    assert await _search(engine, "mohammed") == [3]
+    assert await _search(engine, "omar") == [2]
+    assert await _search(engine, "احمد") == []
+    assert await _search(engine, "0501234567") == []